@@ -0,0 +1,119 @@
+"""Benchmark streaming ``extract_items`` against the full-tree BeautifulSoup parse.
+
+Usage example:
+    python scripts/bench_extract_brand.py --repeat 5 --limit 10 lv.html 1.html
+
+For every saved page the previous implementation (a whole-document
+``BeautifulSoup(html, "lxml")`` tree followed by ``find_all``, kept here for
+comparison) and the streaming ``iter_items`` engine are timed with and
+without ``--limit``. Each measurement runs in a fresh subprocess so the
+reported peak RSS growth of the first run (``ru_maxrss`` after it minus
+before it) covers lxml's C allocations as well as Python objects.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urljoin
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from extract_brand import clean_text, iter_items, iter_text_chunks  # noqa: E402
+
+DEFAULT_PAGES = ["1.html", "lv.html", "chanel.html", "mercari_page.html"]
+BASE = "https://jp.mercari.com"
+
+
+def legacy_extract_items(html: str, *, base_url: str | None, limit: int | None) -> list[dict]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "lxml")
+    results: list[dict] = []
+    for node in soup.find_all("li", attrs={"data-testid": "item-cell"}):
+        link = node.find("a", attrs={"data-testid": "thumbnail-link"})
+        if not link:
+            continue
+        href = link.get("href") or ""
+        thumb = link.find("div", class_=lambda value: bool(value and "merItemThumbnail" in value.split()))
+        item_id = thumb.get("id") if thumb and thumb.get("id") else href.strip("/").split("/")[-1]
+        img = link.find("img")
+        title_tag = link.find(attrs={"data-testid": "thumbnail-item-name"})
+        price_span = link.find("span", class_=lambda val: bool(val and "number__" in val))
+        price_text = clean_text(price_span.get_text(" ", strip=True)) if price_span else ""
+        digits = re.sub(r"[^0-9]", "", price_text)
+        results.append({
+            "id": item_id,
+            "title": clean_text(title_tag.get_text(" ", strip=True)) if title_tag else "",
+            "href": urljoin(base_url, href) if base_url else href,
+            "price": int(digits) if digits else None,
+            "image": {"src": img.get("src") if img else ""},
+        })
+        if limit and len(results) >= limit:
+            break
+    return results
+
+
+def run_legacy(page: Path, limit: int | None) -> int:
+    return len(legacy_extract_items(page.read_text(encoding="utf-8"), base_url=BASE, limit=limit))
+
+
+def run_stream(page: Path, limit: int | None) -> int:
+    return sum(1 for _ in iter_items(iter_text_chunks(page), base_url=BASE, limit=limit))
+
+
+IMPLS = {"legacy-soup": run_legacy, "stream": run_stream}
+
+
+def child(impl: str, page: Path, limit: int | None, repeat: int) -> None:
+    import bs4  # noqa: F401  (import cost must not count as parse memory)
+
+    fn = IMPLS[impl]
+    page.read_bytes()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    count = fn(page, limit)
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(page, limit)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(json.dumps({"items": count, "seconds": elapsed, "rssKiB": rss_growth}))
+
+
+def measure(impl: str, page: Path, limit: int | None, repeat: int) -> dict:
+    # A fresh interpreter per run, otherwise ru_maxrss only reports the largest run so far.
+    cmd = [sys.executable, __file__, "--child", impl, "--repeat", str(repeat), "--limit", str(limit or 0), str(page)]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark brand item extraction")
+    parser.add_argument("pages", nargs="*", default=DEFAULT_PAGES, help="Saved HTML pages relative to the repo root")
+    parser.add_argument("--repeat", type=int, default=5, help="Iterations per page and implementation")
+    parser.add_argument("--limit", type=int, default=10, help="Item limit for the early-termination runs")
+    parser.add_argument("--child", choices=sorted(IMPLS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, ROOT / args.pages[0], args.limit or None, args.repeat)
+        return
+
+    print(f"{'page':<20} {'impl':<12} {'limit':>6} {'items':>6} {'ms':>8} {'peak RSS +KiB':>14}")
+    for page in args.pages:
+        for limit in (None, args.limit):
+            for impl in IMPLS:
+                result = measure(impl, ROOT / page, limit, args.repeat)
+                print(f"{page:<20} {impl:<12} {limit or '-':>6} {result['items']:>6} "
+                      f"{result['seconds'] * 1000:>8.1f} {result['rssKiB']:>14}")
+
+
+if __name__ == "__main__":
+    main()
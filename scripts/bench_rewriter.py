@@ -0,0 +1,98 @@
+"""Benchmark the streaming HTML rewriter against the legacy regex rewriter.
+
+Usage example:
+    python scripts/bench_rewriter.py --repeat 20 1.html lv.html
+
+For every saved page the legacy ``re.sub`` based ``_rewrite_html`` (kept
+here verbatim for comparison), the single-pass ``rewrite_html`` and the
+chunked ``rewrite_html_stream`` are timed, and their peak Python heap usage is
+measured with ``tracemalloc``. Throughput is reported in MB/s of input.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from web.backend.home.rewriter import rewrite_html, rewrite_html_stream, to_proxy_path  # noqa: E402
+
+DEFAULT_PAGES = ["1.html", "lv.html", "chanel.html", "mercari_page.html"]
+BASE = "https://jp.mercari.com"
+
+
+def legacy_rewrite_html(html: str, base: str) -> str:
+    lower = html.lower()
+    insert_tag = f"<base href=\"{base}\">"
+    if "<head" in lower and "<base" not in lower:
+        idx = lower.find("<head")
+        head_end = html.find('>', idx)
+        if head_end != -1:
+            html = html[:head_end+1] + insert_tag + html[head_end+1:]
+
+    def repl_attr(match):
+        attr = match.group(1)
+        quote = match.group(2)
+        val = match.group(3)
+        return f"{attr}={quote}{to_proxy_path.__wrapped__(base, val)}{quote}"
+
+    html = re.sub(r"\b(href|src|action)=(['\"])(.*?)(['\"])",
+                  lambda m: repl_attr((lambda a=m: a)()),
+                  html, flags=re.IGNORECASE)
+    return html
+
+
+def run_legacy(raw: bytes, chunk_size: int) -> int:
+    return len(legacy_rewrite_html(raw.decode("utf-8"), BASE).encode("utf-8"))
+
+
+def run_single_pass(raw: bytes, chunk_size: int) -> int:
+    return len(rewrite_html(raw.decode("utf-8"), BASE).encode("utf-8"))
+
+
+def run_stream(raw: bytes, chunk_size: int) -> int:
+    chunks = (raw[i:i + chunk_size] for i in range(0, len(raw), chunk_size))
+    return sum(len(part) for part in rewrite_html_stream(chunks, BASE))
+
+
+def measure(fn, raw: bytes, repeat: int, chunk_size: int) -> tuple[float, float]:
+    to_proxy_path.cache_clear()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        to_proxy_path.cache_clear()
+        fn(raw, chunk_size)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    to_proxy_path.cache_clear()
+    tracemalloc.start()
+    fn(raw, chunk_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark proxied HTML rewriting")
+    parser.add_argument("pages", nargs="*", default=DEFAULT_PAGES, help="Saved HTML pages relative to the repo root")
+    parser.add_argument("--repeat", type=int, default=10, help="Iterations per page and implementation")
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024, help="Chunk size for the streaming variant")
+    args = parser.parse_args()
+
+    impls = [("legacy-regex", run_legacy), ("single-pass", run_single_pass), ("stream", run_stream)]
+    print(f"{'page':<20} {'impl':<14} {'ms':>8} {'MB/s':>8} {'peak KiB':>10}")
+    for page in args.pages:
+        raw = (ROOT / page).read_bytes()
+        for name, fn in impls:
+            elapsed, peak = measure(fn, raw, args.repeat, args.chunk_size)
+            mbps = len(raw) / elapsed / 1e6 if elapsed else float("inf")
+            print(f"{page:<20} {name:<14} {elapsed * 1000:>8.2f} {mbps:>8.1f} {peak / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
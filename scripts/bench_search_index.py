@@ -0,0 +1,84 @@
+"""Benchmark the fallback keyword index against the legacy linear title scan.
+
+Usage example:
+    python scripts/bench_search_index.py --rows 20000 --repeat 200
+
+The shipped ``mercari_items.json`` is replicated (with a row suffix so titles
+stay distinct) up to ``--rows`` items. Each query is then answered both by the
+old ``keyword.lower() in title.lower()`` scan and by ``SearchIndex`` and the
+average latency per query is reported, along with the one-off index build cost.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from web.backend.home.item import Item  # noqa: E402
+from web.backend.home.search_index import SearchIndex  # noqa: E402
+
+DEFAULT_DATASET = ROOT / "web" / "frontend" / "src" / "data" / "mercari_items.json"
+DEFAULT_QUERIES = ["coach", "ワンピース", "ブラック", "シャネル", "日本製", "バッグ", "gucci", "zzz-no-hit"]
+
+
+def legacy_scan(items: list[Item], keyword: str, limit: int | None) -> list[Item]:
+    lowered = keyword.lower()
+    filtered = [item for item in items if lowered in (item.title or "").lower()]
+    return filtered[:limit] if limit else filtered
+
+
+def build_rows(dataset: Path, rows: int) -> list[Item]:
+    base = [item for item in json.loads(dataset.read_text(encoding="utf-8")) if isinstance(item, dict)]
+    out: list[Item] = []
+    n = 0
+    while len(out) < rows:
+        for item in base:
+            if len(out) >= rows:
+                break
+            clone = dict(item)
+            clone["title"] = f"{item.get('title', '')} #{n}"
+            out.append(Item.from_dict(clone))
+        n += 1
+    return out
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark SearchIndex against a linear scan")
+    parser.add_argument("--dataset", type=Path, default=DEFAULT_DATASET, help="Source JSON dataset")
+    parser.add_argument("--rows", type=int, default=20000, help="Number of catalog rows to simulate")
+    parser.add_argument("--repeat", type=int, default=50, help="Iterations per query")
+    parser.add_argument("--limit", type=int, default=60, help="Result limit passed to both implementations")
+    parser.add_argument("queries", nargs="*", default=DEFAULT_QUERIES, help="Keywords to benchmark")
+    args = parser.parse_args()
+
+    items = build_rows(args.dataset, args.rows)
+
+    start = time.perf_counter()
+    index = SearchIndex(items)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"rows={len(items)} index_build={build_ms:.1f}ms")
+    print(f"{'query':<14} {'hits':>6} {'scan(ms)':>10} {'index(ms)':>10} {'speedup':>8}")
+
+    for query in args.queries:
+        hits = len(index.search_positions(query))
+        scan = timed(lambda: legacy_scan(items, query, args.limit), args.repeat) * 1000
+        indexed = timed(lambda: index.search(query, args.limit), args.repeat) * 1000
+        speedup = scan / indexed if indexed else float("inf")
+        print(f"{query:<14} {hits:>6} {scan:>10.3f} {indexed:>10.3f} {speedup:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Compile the JSON item datasets into memory-mapped ``.mcat`` catalogs.
+
+Usage example:
+    python scripts/compile_catalog.py
+    python scripts/compile_catalog.py web/frontend/src/data/brands/chanel.json --check
+
+Without arguments every dataset under ``web/frontend/src/data`` is compiled
+(``mercari_items.json`` and ``brands/*.json``). Each ``<name>.json`` gets a
+``<name>.mcat`` next to it, which the home blueprint maps instead of parsing
+the JSON (``COMPILED_CATALOG_ENABLED``). Catalogs whose source is unchanged
+are skipped unless ``--force`` is given; after editing a JSON dataset re-run
+this script, otherwise the backend keeps using the JSON file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from web.backend.home.compiled_catalog import CompiledCatalog, compile_file, compiled_path, load  # noqa: E402
+
+DATA_DIR = ROOT / "web" / "frontend" / "src" / "data"
+
+
+def default_inputs() -> list[Path]:
+    return sorted([DATA_DIR / "mercari_items.json", *DATA_DIR.glob("brands/*.json")])
+
+
+def expand_inputs(patterns: list[str]) -> list[Path]:
+    files: list[Path] = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            files.extend(sorted(path.rglob("*.json")))
+        elif any(ch in pattern for ch in "*?["):
+            files.extend(sorted(Path().glob(pattern)))
+        else:
+            files.append(path)
+    seen = set()
+    return [f for f in files if not (f.resolve() in seen or seen.add(f.resolve()))]
+
+
+def check_round_trip(source: Path, target: Path) -> None:
+    with open(source, "r", encoding="utf-8") as fp:
+        expected = [item for item in json.load(fp) if item and isinstance(item, dict)]
+    catalog = CompiledCatalog(target)
+    try:
+        if len(catalog) != len(expected) or list(catalog) != expected:
+            raise SystemExit(f"{target}: items differ from {source}")
+        dumped = json.dumps(list(catalog), ensure_ascii=False)
+        if dumped != json.dumps(expected, ensure_ascii=False):
+            raise SystemExit(f"{target}: key order differs from {source}")
+    finally:
+        catalog.close()
+
+
+def timed_load(source: Path, target: Path) -> tuple[float, float]:
+    start = time.perf_counter()
+    with open(source, "r", encoding="utf-8") as fp:
+        json.load(fp)
+    json_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    catalog = CompiledCatalog(target)
+    catalog[0:1]
+    mcat_ms = (time.perf_counter() - start) * 1000
+    catalog.close()
+    return json_ms, mcat_ms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile JSON item datasets into .mcat catalogs")
+    parser.add_argument("inputs", nargs="*", help="JSON datasets, directories or glob patterns")
+    parser.add_argument("--force", action="store_true", help="Recompile even when the catalog is up to date")
+    parser.add_argument("--check", action="store_true", help="Verify every catalog reproduces its JSON exactly")
+    args = parser.parse_args()
+
+    sources = expand_inputs(args.inputs) if args.inputs else default_inputs()
+    if not sources:
+        raise SystemExit("No input datasets")
+
+    print(f"{'dataset':<48} {'items':>6} {'json KiB':>9} {'mcat KiB':>9} {'json ms':>8} {'open ms':>8}")
+    for source in sources:
+        if not source.is_file():
+            print(f"{str(source):<48} missing, skipped")
+            continue
+        target = compiled_path(source)
+        current = load(target) if target.exists() and not args.force else None
+        if current is None:
+            target, count = compile_file(source)
+            status = ""
+        else:
+            count = len(current)
+            current.close()
+            status = " (up to date)"
+        if args.check:
+            check_round_trip(source, target)
+        json_ms, mcat_ms = timed_load(source, target)
+        print(f"{str(source.relative_to(ROOT) if source.is_relative_to(ROOT) else source):<48} {count:>6} "
+              f"{source.stat().st_size / 1024:>9.1f} {target.stat().st_size / 1024:>9.1f} "
+              f"{json_ms:>8.2f} {mcat_ms:>8.2f}{status}")
+
+
+if __name__ == "__main__":
+    main()
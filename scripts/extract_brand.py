@@ -4,21 +4,35 @@ Usage example:
     python scripts/extract_brand.py chanel.html \
         web/frontend/src/data/brands/chanel.json --limit 40
 
-The script parses list data within ``li[data-testid="item-cell"]`` nodes,
-captures title, price, image and link information, and writes a JSON array
-compatible with the frontend fallback datasets.
+Batch mode regenerates many datasets at once, one ``<brand>.json`` per input
+file (named after the file stem):
+    python scripts/extract_brand.py --batch saved_pages/ "more/*.html" \
+        --out-dir web/frontend/src/data/brands --workers 4
+
+The script streams the page through an lxml pull parser, converting
+``li[data-testid="item-cell"]`` nodes as they close (title, price, image and
+link information), and writes a JSON array compatible with the frontend
+fallback datasets. Batch mode remembers input hashes in ``.extract_cache/``
+(``--cache-dir``, relative to the working directory) and only re-parses
+changed files.
 """
 
 from __future__ import annotations
 
 import argparse
+import glob
+import hashlib
 import json
+import os
 import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
 from urllib.parse import urljoin
 
-from bs4 import BeautifulSoup
+from lxml import etree
 
 
 def clean_text(value: str | None) -> str:
@@ -27,92 +41,368 @@ def clean_text(value: str | None) -> str:
     return re.sub(r"\s+", " ", value).strip()
 
 
-def extract_items(html: str, *, base_url: str | None, limit: int | None) -> list[dict]:
-    """Parse raw HTML and return a list of product dictionaries."""
-
-    soup = BeautifulSoup(html, "lxml")
-    results: list[dict] = []
-
-    def _class_contains(target: str) -> callable:
-        return lambda value: bool(value and target in value.split())
-
-    nodes: Iterable = soup.find_all("li", attrs={"data-testid": "item-cell"})
-
-    for node in nodes:
-        link = node.find("a", attrs={"data-testid": "thumbnail-link"})
-        if not link:
-            continue
+_CHUNK_CHARS = 64 * 1024
 
-        href = link.get("href") or ""
-        full_href = urljoin(base_url, href) if base_url else href
 
-        thumb = link.find("div", class_=_class_contains("merItemThumbnail"))
-        item_id = thumb.get("id") if thumb and thumb.get("id") else None
-        if not item_id and href:
-            candidate = href.strip("/").split("/")[-1]
-            if candidate:
-                item_id = candidate
+def _attr_has_class(el, target: str) -> bool:
+    return target in (el.get("class") or "").split()
 
-        img = link.find("img")
-        image_src = img.get("src") if img else ""
-        image_alt = img.get("alt") if img else ""
 
-        title_tag = link.find(attrs={"data-testid": "thumbnail-item-name"})
-        title = clean_text(title_tag.get_text(" ", strip=True)) if title_tag else ""
+def _find(root, tag: str, predicate) -> "etree._Element | None":
+    for el in root.iter(tag):
+        if el is not root and predicate(el):
+            return el
+    return None
 
-        price_span = link.find("span", class_=lambda val: bool(val and "number__" in val))
-        price_text_raw = clean_text(price_span.get_text(" ", strip=True)) if price_span else ""
-        price_value = None
-        if price_text_raw:
-            digits = re.sub(r"[^0-9]", "", price_text_raw)
-            if digits:
-                price_value = int(digits)
 
-        if not any([title, price_text_raw, image_src]):
+def _text(el) -> str:
+    """``BeautifulSoup.get_text(" ", strip=True)`` for an lxml element."""
+    parts = []
+    for node in el.iter():
+        if not isinstance(node.tag, str):
+            # Comments and processing instructions: skip their text but keep the tail.
+            if node is not el and node.tail and node.tail.strip():
+                parts.append(node.tail.strip())
             continue
+        if node.text and node.text.strip():
+            parts.append(node.text.strip())
+        if node is not el and node.tail and node.tail.strip():
+            parts.append(node.tail.strip())
+    return " ".join(parts)
+
+
+def _item_from_cell(node, base_url: str | None) -> dict | None:
+    link = _find(node, "a", lambda el: el.get("data-testid") == "thumbnail-link")
+    if link is None:
+        return None
+
+    href = link.get("href") or ""
+    full_href = urljoin(base_url, href) if base_url else href
+
+    thumb = _find(link, "div", lambda el: _attr_has_class(el, "merItemThumbnail"))
+    item_id = thumb.get("id") if thumb is not None and thumb.get("id") else None
+    if not item_id and href:
+        candidate = href.strip("/").split("/")[-1]
+        if candidate:
+            item_id = candidate
+
+    img = _find(link, "img", lambda el: True)
+    image_src = img.get("src") if img is not None else ""
+    image_alt = img.get("alt") if img is not None else ""
+
+    title_tag = _find(link, etree.Element, lambda el: el.get("data-testid") == "thumbnail-item-name")
+    title = clean_text(_text(title_tag)) if title_tag is not None else ""
+
+    price_span = _find(link, "span", lambda el: "number__" in (el.get("class") or ""))
+    price_text_raw = clean_text(_text(price_span)) if price_span is not None else ""
+    price_value = None
+    if price_text_raw:
+        digits = re.sub(r"[^0-9]", "", price_text_raw)
+        if digits:
+            price_value = int(digits)
+
+    if not any([title, price_text_raw, image_src]):
+        return None
+
+    item: dict = {
+        "id": item_id or title or image_src,
+        "title": title or clean_text(image_alt) or "商品",
+        "href": full_href or href,
+    }
+
+    if price_value is not None:
+        item["price"] = price_value
+        item["priceText"] = f"¥{price_value:,}"
+    elif price_text_raw:
+        item["priceText"] = price_text_raw
+
+    if image_src:
+        item["image"] = {"src": image_src}
+        if image_alt:
+            item["image"]["alt"] = clean_text(image_alt)
+    return item
+
+
+def iter_items(chunks: Iterable[str], *, base_url: str | None, limit: int | None) -> Iterator[dict]:
+    """Stream product dictionaries out of HTML text chunks.
+
+    The page is fed to an lxml pull parser; each ``li[data-testid=item-cell]``
+    is converted as soon as it is closed and every finished subtree outside
+    an item cell is discarded, so memory stays bounded by the largest cell
+    rather than the page. Input is no longer read once ``limit`` items have
+    been produced.
+    """
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    open_cells = 0
+    produced = 0
+
+    def drain() -> Iterator[dict]:
+        nonlocal open_cells, produced
+        for event, el in parser.read_events():
+            is_cell = el.tag == "li" and el.get("data-testid") == "item-cell"
+            if event == "start":
+                open_cells += is_cell
+                continue
+            if is_cell:
+                open_cells -= 1
+                item = _item_from_cell(el, base_url)
+                if item is not None:
+                    produced += 1
+                    yield item
+            if open_cells:
+                continue
+            # Nothing still open below this element needs it any more.
+            el.clear(keep_tail=False)
+            parent = el.getparent()
+            if parent is not None:
+                while el.getprevious() is not None:
+                    del parent[0]
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        for item in drain():
+            yield item
+            if limit and produced >= limit:
+                return
+    parser.close()
+    for item in drain():
+        yield item
+        if limit and produced >= limit:
+            return
+
+
+def iter_text_chunks(path: Path, size: int = _CHUNK_CHARS) -> Iterator[str]:
+    with path.open("r", encoding="utf-8") as fp:
+        for chunk in iter(lambda: fp.read(size), ""):
+            yield chunk
 
-        item: dict = {
-            "id": item_id or title or image_src,
-            "title": title or clean_text(image_alt) or "商品",
-            "href": full_href or href,
-        }
 
-        if price_value is not None:
-            item["price"] = price_value
-            item["priceText"] = f"¥{price_value:,}"
-        elif price_text_raw:
-            item["priceText"] = price_text_raw
-
-        if image_src:
-            item["image"] = {"src": image_src}
-            if image_alt:
-                item["image"]["alt"] = clean_text(image_alt)
-
-        results.append(item)
-        if limit and len(results) >= limit:
-            break
-
-    return results
+def extract_items(html: str, *, base_url: str | None, limit: int | None) -> list[dict]:
+    """Parse raw HTML and return a list of product dictionaries."""
+    chunks = (html[i:i + _CHUNK_CHARS] for i in range(0, len(html), _CHUNK_CHARS))
+    return list(iter_items(chunks, base_url=base_url, limit=limit))
+
+
+MANIFEST_VERSION = 1
+
+_BLOB_RE = re.compile(r"[0-9a-f]{64}\.json")
+
+
+def brand_slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "brand"
+
+
+def _file_mode() -> int:
+    """Mode a plain ``open()`` would create files with (``mkstemp`` always uses 0600)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Write ``text`` to ``path`` via a temp file + rename so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fp:
+            fp.write(text)
+        os.chmod(tmp, _file_mode())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fp:
+        for block in iter(lambda: fp.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def expand_inputs(patterns: list[str]) -> list[Path]:
+    """Resolve directories (``*.html`` inside) and glob patterns into a sorted, unique file list."""
+    found: dict[Path, None] = {}
+    for pattern in patterns:
+        candidate = Path(pattern)
+        if candidate.is_dir():
+            matches = sorted(candidate.glob("*.html"))
+        else:
+            matches = sorted(Path(p) for p in glob.glob(pattern, recursive=True))
+        for match in matches:
+            if match.is_file():
+                found.setdefault(match.resolve(), None)
+    return list(found)
+
+
+def prune_cache(cache_dir: Path, keep: set[str]) -> int:
+    """Delete cached parse results whose content hash is not in ``keep``; returns how many."""
+    pruned = 0
+    if not cache_dir.is_dir():
+        return pruned
+    for blob in cache_dir.iterdir():
+        if _BLOB_RE.fullmatch(blob.name) and blob.name[:-len(".json")] not in keep:
+            try:
+                blob.unlink()
+                pruned += 1
+            except FileNotFoundError:
+                pass
+    return pruned
+
+
+def _parse_file(path: str, base_url: str | None, limit: int | None) -> tuple[str, list[dict], float]:
+    """Process-pool task: parse one saved page."""
+    started = time.perf_counter()
+    items = list(iter_items(iter_text_chunks(Path(path)), base_url=base_url, limit=limit))
+    return path, items, time.perf_counter() - started
+
+
+def run_batch(args: argparse.Namespace) -> dict:
+    """Parse changed inputs in parallel, dedupe by id across files and write every output atomically.
+
+    Raw (pre-dedupe) results are cached per input content hash in the cache
+    directory, so unchanged files are not parsed again but still take part in
+    the cross-file de-duplication; the first file in sorted order keeps a
+    shared item. Cached results the new manifest no longer references are
+    deleted at the end of the run.
+    """
+    started = time.perf_counter()
+    inputs = expand_inputs(args.batch)
+    out_dir: Path = args.out_dir
+    cache_dir: Path = args.cache_dir
+    manifest_path: Path = args.manifest or cache_dir / "manifest.json"
+    params = {"baseUrl": args.base_url, "limit": args.limit}
+
+    manifest = {"version": MANIFEST_VERSION, "params": params, "files": {}}
+    if manifest_path.exists() and not args.force:
+        try:
+            previous = json.loads(manifest_path.read_text(encoding="utf-8"))
+            if previous.get("version") == MANIFEST_VERSION and previous.get("params") == params:
+                manifest["files"] = previous.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    hashes = {path: file_sha256(path) for path in inputs}
+    raw: dict[Path, list[dict]] = {}
+    timings: dict[Path, float] = {}
+    to_parse = []
+    for path in inputs:
+        entry = manifest["files"].get(str(path))
+        cached = cache_dir / f"{hashes[path]}.json"
+        if entry and entry.get("sha256") == hashes[path] and cached.exists():
+            raw[path] = json.loads(cached.read_text(encoding="utf-8"))
+        else:
+            to_parse.append(path)
+
+    parse_started = time.perf_counter()
+    if to_parse:
+        workers = max(1, min(args.workers or os.cpu_count() or 1, len(to_parse)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_parse_file, str(p), args.base_url, args.limit) for p in to_parse]
+            for fut in futures:
+                path_str, items, elapsed = fut.result()
+                path = Path(path_str)
+                raw[path] = items
+                timings[path] = elapsed
+                atomic_write_text(cache_dir / f"{hashes[path]}.json", json.dumps(items, ensure_ascii=False))
+    parse_seconds = time.perf_counter() - parse_started
+
+    seen: set[str] = set()
+    report_files = []
+    outputs: dict[Path, Path] = {}
+    for path in inputs:
+        output = out_dir / f"{brand_slug(path.stem)}.json"
+        if output in outputs.values():
+            raise SystemExit(f"{path} and another input both map to {output}")
+        outputs[path] = output
+        kept = []
+        for item in raw[path]:
+            item_id = str(item.get("id") or "")
+            if item_id and item_id in seen:
+                continue
+            seen.add(item_id)
+            kept.append(item)
+        text = json.dumps(kept, ensure_ascii=False, indent=args.indent)
+        written = not output.exists() or output.read_text(encoding="utf-8") != text
+        if written:
+            atomic_write_text(output, text)
+        manifest["files"][str(path)] = {"sha256": hashes[path], "output": str(output), "items": len(kept)}
+        report_files.append({
+            "input": str(path),
+            "output": str(output),
+            "status": "parsed" if path in timings else "skipped",
+            "written": written,
+            "items": len(raw[path]),
+            "kept": len(kept),
+            "duplicates": len(raw[path]) - len(kept),
+            "parseMs": round(timings[path] * 1000, 1) if path in timings else None,
+        })
+
+    manifest["files"] = {k: v for k, v in manifest["files"].items() if Path(k) in hashes}
+    atomic_write_text(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2))
+    pruned = prune_cache(cache_dir, {entry["sha256"] for entry in manifest["files"].values()})
+
+    parsed_items = sum(len(raw[p]) for p in timings)
+    return {
+        "files": report_files,
+        "parsed": len(timings),
+        "skipped": len(inputs) - len(timings),
+        "items": sum(f["kept"] for f in report_files),
+        "duplicates": sum(f["duplicates"] for f in report_files),
+        "prunedCacheFiles": pruned,
+        "parseSeconds": round(parse_seconds, 3),
+        "itemsPerSecond": round(parsed_items / parse_seconds, 1) if timings and parse_seconds else None,
+        "wallSeconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"{'input':<32} {'status':<8} {'items':>6} {'kept':>6} {'dups':>5} {'parse ms':>9}  output")
+    for f in report["files"]:
+        parse_ms = f"{f['parseMs']:.1f}" if f["parseMs"] is not None else "-"
+        print(f"{Path(f['input']).name:<32} {f['status']:<8} {f['items']:>6} {f['kept']:>6} {f['duplicates']:>5} "
+              f"{parse_ms:>9}  {f['output']}{'' if f['written'] else ' (unchanged)'}")
+    rate = report["itemsPerSecond"]
+    print(f"{report['parsed']} parsed, {report['skipped']} skipped, {report['items']} items kept, "
+          f"{report['duplicates']} duplicates dropped, {rate if rate is not None else '-'} items/s, "
+          f"{report['prunedCacheFiles']} stale cache files removed, {report['wallSeconds']:.2f}s total")
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Extract brand dataset from HTML")
-    parser.add_argument("html_path", type=Path, help="Input HTML file path")
-    parser.add_argument("output_path", type=Path, help="Destination JSON file path")
+    parser.add_argument("html_path", type=Path, nargs="?", help="Input HTML file path")
+    parser.add_argument("output_path", type=Path, nargs="?", help="Destination JSON file path")
     parser.add_argument("--base-url", default="https://jp.mercari.com", help="Base URL used to normalise item links")
     parser.add_argument("--limit", type=int, default=None, help="Maximum number of items to keep")
     parser.add_argument("--indent", type=int, default=2, help="JSON indentation")
+    parser.add_argument("--batch", nargs="+", metavar="DIR_OR_GLOB", help="Batch mode: HTML directories or glob patterns")
+    parser.add_argument("--out-dir", type=Path, default=Path("web/frontend/src/data/brands"),
+                        help="Batch mode: directory for <brand>.json outputs")
+    parser.add_argument("--workers", type=int, default=None, help="Batch mode: parser processes (default: CPU count)")
+    parser.add_argument("--cache-dir", type=Path, default=Path(".extract_cache"),
+                        help="Batch mode: directory for cached parse results (kept out of the frontend sources)")
+    parser.add_argument("--manifest", type=Path, default=None,
+                        help="Batch mode: content hash manifest (default: <cache-dir>/manifest.json)")
+    parser.add_argument("--force", action="store_true", help="Batch mode: re-parse inputs even if unchanged")
+    parser.add_argument("--report", type=Path, default=None, help="Batch mode: also write the summary as JSON")
 
     args = parser.parse_args()
 
-    html = args.html_path.read_text(encoding="utf-8")
-    items = extract_items(html, base_url=args.base_url, limit=args.limit)
+    if args.batch:
+        report = run_batch(args)
+        print_report(report)
+        if args.report:
+            atomic_write_text(args.report, json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    if args.html_path is None or args.output_path is None:
+        parser.error("html_path and output_path are required unless --batch is given")
+
+    items = list(iter_items(iter_text_chunks(args.html_path), base_url=args.base_url, limit=args.limit))
 
-    args.output_path.parent.mkdir(parents=True, exist_ok=True)
-    args.output_path.write_text(
-        json.dumps(items, ensure_ascii=False, indent=args.indent),
-        encoding="utf-8",
-    )
+    atomic_write_text(args.output_path, json.dumps(items, ensure_ascii=False, indent=args.indent))
 
     print(f"Extracted {len(items)} items -> {args.output_path}")
 
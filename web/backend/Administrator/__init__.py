@@ -1,9 +1,9 @@
 from flask import Blueprint, request, jsonify
-from ..auth import require_admin
+from ..auth import require_admin, revoke_user_tokens
 from ..extensions import db
 from ..models import User, PointTransaction
 from ..db_init import ensure_database_initialized
-from werkzeug.security import generate_password_hash, check_password_hash
+from ..passwords import hash_password, verify_password
 from ..phone import normalize_jp_phone
 
 admin_bp = Blueprint("admin", __name__)
@@ -62,9 +62,21 @@ def reject_user():
         return jsonify({"error": "ユーザーが見つかりません"}), 404
     user.status = "rejected"
     db.session.commit()
+    revoke_user_tokens(user.id)
     return jsonify({"message": "却下しました"})
 
 
+@admin_bp.post("/users/revoke-tokens")
+@require_admin
+def revoke_user_sessions():
+    payload = request.get_json(silent=True) or {}
+    user_id = payload.get("userId")
+    if not user_id:
+        return jsonify({"error": "userId を指定してください"}), 400
+    revoked = revoke_user_tokens(int(user_id))
+    return jsonify({"message": "ログイン状態を無効化しました", "userId": int(user_id), "revoked": revoked})
+
+
 @admin_bp.post("/users/reset-password")
 @require_admin
 def reset_user_password():
@@ -81,16 +93,17 @@ def reset_user_password():
         return jsonify({"error": "ユーザーが見つかりません"}), 404
 
     admin_account = User.query.filter_by(email="admin@local").first()
-    if not admin_account or not check_password_hash(admin_account.password_hash, admin_password):
+    if not admin_account or not verify_password(admin_account.password_hash, admin_password):
         return jsonify({"error": "管理者パスワードが正しくありません"}), 403
 
     try:
-        user.password_hash = generate_password_hash("123456")
+        user.password_hash = hash_password("123456")
         db.session.commit()
     except Exception:
         db.session.rollback()
         raise
 
+    revoke_user_tokens(user.id)
     return jsonify({"message": "パスワードをリセットしました", "userId": user.id})
 
 
@@ -106,7 +119,7 @@ def create_user():
         return jsonify({"error": "日本の電話番号の形式が正しくありません"}), 400
     if User.query.filter_by(email=phone).first():
         return jsonify({"error": "既に存在します"}), 409
-    user = User(email=phone, display_name=display_name, password_hash=generate_password_hash(password), status="approved")
+    user = User(email=phone, display_name=display_name, password_hash=hash_password(password), status="approved")
     db.session.add(user)
     db.session.commit()
     return jsonify({"message": "作成しました", "userId": user.id})
@@ -1 +1,6 @@
-from .app import create_app 
\ No newline at end of file
+def __getattr__(name):
+    # Imported lazily so that stdlib-only submodules (used by scripts/) load without the Flask app.
+    if name == "create_app":
+        from .app import create_app
+        return create_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,6 +4,16 @@ from flask_cors import CORS
 from .config import AppConfig
 from .extensions import db, redis_client
 from .db_init import ensure_database_initialized
+from .home.asset_cache import AssetCache
+from .home.catalog import CatalogRefresher
+from .home.dataset_cache import DatasetCache
+from .upstream import UpstreamClient
+from .async_upstream import AsyncUpstreamClient
+from .circuit import CircuitRegistry
+from .token_cache import TokenCache
+from .signed_token import RevocationSet
+from .traffic import TrafficLimiter
+from .passwords import PasswordHasher
 
 STATIC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../frontend/dist"))
 
@@ -15,6 +25,21 @@ def create_app() -> Flask:
     # Initialize extensions
     CORS(app, resources={r"/api/*": {"origins": "*"}})
     db.init_app(app)
+    app.dataset_cache = DatasetCache(
+        max_entries=app.config["DATASET_CACHE_MAX_ENTRIES"],
+        ttl=app.config["DATASET_CACHE_TTL"],
+        max_bytes=app.config["DATASET_CACHE_MAX_BYTES"],
+    )
+    app.upstream = AsyncUpstreamClient.from_config(app.config) or UpstreamClient.from_config(app.config)
+    app.circuits = CircuitRegistry.from_app(app)
+    app.asset_cache = AssetCache.from_config(app.config)
+    PasswordHasher.from_app(app).init_app(app)
+    app.token_cache = TokenCache.from_app(app)
+    app.token_revocations = RevocationSet.from_app(app)
+    # Registered first so shed requests skip every other before_request hook
+    app.traffic = TrafficLimiter.from_app(app)
+    if app.traffic is not None:
+        app.traffic.init_app(app)
 
     # Auto DB init
     with app.app_context():
@@ -28,11 +53,13 @@ def create_app() -> Flask:
     def _ensure_redis_connected():
         if not hasattr(app, "redis"):
             app.redis = redis_client(app.config)
+        if app.catalog_refresher is not None:
+            app.catalog_refresher.ensure_started()
 
     from .login import login_bp
     from .register import register_bp
     from .user import user_bp
-    from .home import home_bp
+    from .home import home_bp, fetch_catalog_feed, catalog_feed_value
     from .Administrator import admin_bp
 
     app.register_blueprint(login_bp, url_prefix="/api/auth")
@@ -40,6 +67,7 @@ def create_app() -> Flask:
     app.register_blueprint(user_bp, url_prefix="/api/user")
     app.register_blueprint(home_bp, url_prefix="/api/home")
     app.register_blueprint(admin_bp, url_prefix="/api/admin")
+    app.catalog_refresher = CatalogRefresher.from_app(app, fetch_catalog_feed, normalize=catalog_feed_value)
 
     @app.route("/")
     def index():
@@ -55,7 +83,14 @@ def create_app() -> Flask:
 
     @app.get("/api/health")
     def health_check():
-        return {"status": "ok"}
+        return {
+            "status": "ok",
+            "circuits": app.circuits.snapshot(),
+            "tokenCache": app.token_cache.snapshot() if app.token_cache is not None else None,
+            "tokenRevocations": app.token_revocations.snapshot() if app.token_revocations is not None else None,
+            "traffic": app.traffic.snapshot() if app.traffic is not None else None,
+            "passwordHashing": app.password_hasher.snapshot(),
+        }
 
     return app
 
@@ -0,0 +1,9 @@
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError as exc:  # optional, see the commented entries in requirements.txt
+    raise ImportError("The ASGI entry point needs asgiref: pip install asgiref") from exc
+
+from .app import create_app
+
+# ASGI entry point, e.g. ``uvicorn web.backend.asgi:app`` (requires asgiref).
+app = WsgiToAsgi(create_app())
@@ -0,0 +1,341 @@
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import zlib
+from concurrent.futures import Future
+from typing import Any, Awaitable, Dict, Iterator, Mapping, Optional, Sequence, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+    import aiohttp
+except ImportError:  # optional, the requests based UpstreamClient is used instead
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+_RETRY_STATUSES = (502, 503, 504)
+
+# request key -> UpstreamResponse or requests exception, see AsyncUpstreamClient.prefetch
+_PREFETCHED: "contextvars.ContextVar[Optional[Dict[str, Any]]]" = contextvars.ContextVar("upstream_prefetched",
+                                                                                          default=None)
+
+# (url, kind, params, headers) of one GET
+Request = Tuple[str, str, Optional[Dict], Optional[Dict]]
+
+
+def request_key(url: str, params: Optional[Mapping] = None) -> str:
+    return json.dumps([url, sorted((str(k), str(v)) for k, v in (params or {}).items())], ensure_ascii=False)
+
+
+@contextlib.contextmanager
+def using_prefetched(responses: Mapping[str, Any]):
+    """Let :meth:`AsyncUpstreamClient.get` calls in this context take the matching prefetched response."""
+    token = _PREFETCHED.set(responses)
+    try:
+        yield
+    finally:
+        _PREFETCHED.reset(token)
+
+
+def _requests_error(exc: BaseException) -> BaseException:
+    """The ``requests`` exception the blocking API raises for an aiohttp/asyncio error."""
+    if isinstance(exc, asyncio.TimeoutError):
+        return requests.Timeout(str(exc) or "upstream timed out")
+    if aiohttp is not None and isinstance(exc, aiohttp.ClientConnectionError):
+        return requests.ConnectionError(str(exc))
+    if aiohttp is not None and isinstance(exc, aiohttp.ClientError):
+        return requests.RequestException(str(exc))
+    return exc
+
+
+class _ContentDecoder:
+    """Incremental gzip/deflate decoder (the only encodings we ask upstream for)."""
+
+    def __init__(self, content_encoding: str):
+        enc = (content_encoding or "").strip().lower()
+        self._deflate = enc == "deflate"
+        if enc in ("gzip", "x-gzip"):
+            self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self._deflate:
+            self._obj = zlib.decompressobj()
+        else:
+            self._obj = None
+
+    def decompress(self, data: bytes) -> bytes:
+        if self._obj is None or not data:
+            return data
+        try:
+            return self._obj.decompress(data)
+        except zlib.error:
+            if not self._deflate:
+                raise
+            # Some servers send raw deflate without the zlib header.
+            self._deflate = False
+            self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._obj.decompress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush() if self._obj is not None else b""
+
+
+class UpstreamResponse:
+    """The subset of ``requests.Response`` the blueprints use, backed by aiohttp.
+
+    Non-streamed responses are read completely on the event loop. Streamed
+    ones pull one chunk per loop round trip from the calling thread, so
+    ``iter_content``/``iter_raw`` can stop early and ``close`` drops the
+    connection instead of downloading the rest.
+    """
+
+    def __init__(self, client: "AsyncUpstreamClient", resp, body: Optional[bytes] = None):
+        self._client = client
+        self._resp = resp
+        self._raw_body = body
+        self._content: Optional[bytes] = None
+        self.status_code = resp.status
+        self.reason = resp.reason
+        self.url = str(resp.url)
+        self.headers = CaseInsensitiveDict(resp.headers)
+        self.encoding = get_encoding_from_headers(self.headers)
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} {self.reason} for url: {self.url}", response=self)
+
+    def iter_raw(self, chunk_size: int) -> Iterator[bytes]:
+        """Undecoded body chunks, as sent by upstream."""
+        if self._raw_body is not None:
+            for start in range(0, len(self._raw_body), chunk_size):
+                yield self._raw_body[start:start + chunk_size]
+            return
+        while True:
+            chunk = self._client.bridge(self._resp.content.read(chunk_size))
+            if not chunk:
+                break
+            yield chunk
+        self.close()
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        decoder = _ContentDecoder(self.headers.get("Content-Encoding", ""))
+        for chunk in self.iter_raw(chunk_size):
+            data = decoder.decompress(chunk)
+            if data:
+                yield data
+        tail = decoder.flush()
+        if tail:
+            yield tail
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            if self._raw_body is None:
+                self._raw_body = self._client.bridge(self._resp.read())
+                self.close()
+            decoder = _ContentDecoder(self.headers.get("Content-Encoding", ""))
+            self._content = decoder.decompress(self._raw_body) + decoder.flush()
+        return self._content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def close(self) -> None:
+        resp, self._resp = self._resp, None
+        if resp is None or resp.closed:
+            return
+        # Fully read bodies hand the connection back to the pool; partial ones drop it.
+        finish = resp.release if resp.content.at_eof() else resp.close
+        self._client.loop.call_soon_threadsafe(finish)
+
+
+class AsyncUpstreamClient:
+    """asyncio/aiohttp upstream engine with a synchronous bridge.
+
+    One event loop runs in a daemon thread per process and owns a single
+    ``aiohttp.ClientSession`` whose connector allows up to ``limit``
+    concurrent connections (``limit_per_host`` per upstream host). All socket
+    I/O happens on that loop, so the number of in-flight upstream requests is
+    bounded by the connector, not by worker threads: fan-outs run as one loop
+    call (:meth:`prefetch`, or :meth:`run` on a coroutine that awaits
+    :meth:`get_async`, as the hedged API race does), and Flask views use
+    :meth:`get`, which mirrors ``UpstreamClient.get`` and returns a
+    requests-like :class:`UpstreamResponse`. Cookies are never stored.
+    """
+
+    def __init__(
+        self,
+        limit: int = 1000,
+        limit_per_host: int = 256,
+        retries: int = 1,
+        backoff: float = 0.2,
+        connect_timeout: float = 3.05,
+        read_timeouts: Dict[str, float] = None,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.connect_timeout = connect_timeout
+        self.read_timeouts = dict(read_timeouts or {})
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> Optional["AsyncUpstreamClient"]:
+        if config.get("UPSTREAM_ENGINE", "requests") != "async":
+            return None
+        if aiohttp is None:
+            logger.warning("UPSTREAM_ENGINE=async needs aiohttp; falling back to requests")
+            return None
+        return cls(
+            limit=config.get("UPSTREAM_ASYNC_LIMIT", 1000),
+            limit_per_host=config.get("UPSTREAM_ASYNC_LIMIT_PER_HOST", 256),
+            retries=config.get("UPSTREAM_RETRIES", 1),
+            backoff=config.get("UPSTREAM_BACKOFF", 0.2),
+            connect_timeout=config.get("UPSTREAM_CONNECT_TIMEOUT", 3.05),
+            read_timeouts={
+                "api": config.get("UPSTREAM_API_TIMEOUT", 10),
+                "search": config.get("UPSTREAM_SEARCH_TIMEOUT", 15),
+                "proxy": config.get("UPSTREAM_PROXY_TIMEOUT", 12),
+            },
+        )
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="upstream-async", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def submit(self, coro: Awaitable) -> Future:
+        """Schedule ``coro`` on the engine loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Run ``coro`` on the engine loop and block the calling thread for its result."""
+        return self.submit(coro).result(timeout)
+
+    def bridge(self, coro: Awaitable) -> Any:
+        """:meth:`run` for the requests-compatible API: aiohttp errors become ``requests`` exceptions."""
+        try:
+            return self.run(coro)
+        except (asyncio.TimeoutError, aiohttp.ClientError) as exc:
+            raise _requests_error(exc) from exc
+
+    def prefetch(self, reqs: Sequence[Request], timeout: float) -> Dict[str, Any]:
+        """GET all ``reqs`` concurrently in one loop call, waiting at most ``timeout`` seconds.
+
+        Returns :func:`request_key` -> :class:`UpstreamResponse` (body read) or
+        the ``requests`` exception it failed with; requests still running at
+        the deadline are cancelled and left out. Hand the result to
+        :func:`using_prefetched` so the blocking code paths pick it up.
+        """
+        async def _all():
+            tasks: Dict[str, asyncio.Future] = {}
+            for url, kind, params, headers in reqs:
+                key = request_key(url, params)
+                if key not in tasks:
+                    tasks[key] = asyncio.ensure_future(self.get_async(url, kind=kind, params=params, headers=headers))
+            if not tasks:
+                return {}
+            done, pending = await asyncio.wait(list(tasks.values()), timeout=max(0.0, timeout))
+            for task in pending:
+                task.cancel()
+            out: Dict[str, Any] = {}
+            for key, task in tasks.items():
+                if task in done:
+                    exc = task.exception()
+                    out[key] = _requests_error(exc) if exc is not None else task.result()
+            return out
+
+        return self.run(_all())
+
+    def timeout(self, kind: str):
+        return aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeouts.get(kind, 10))
+
+    def _session_for_loop(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             ttl_dns_cache=300)
+            # Bodies are decoded by UpstreamResponse so the proxy can relay them undecoded.
+            self._session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar(),
+                                                  auto_decompress=False)
+        return self._session
+
+    async def fetch(self, url: str, *, kind: str = "api", params: Optional[Dict] = None,
+                    headers: Optional[Dict] = None):
+        """Send a GET and return the ``aiohttp.ClientResponse`` once headers arrived.
+
+        Connection errors and 502/503/504 answers are retried ``retries``
+        times with exponential backoff, like the urllib3 policy of the sync
+        client.
+        """
+        session = self._session_for_loop()
+        req_headers = {"Accept-Encoding": "gzip, deflate"}
+        req_headers.update(headers or {})
+        attempt = 0
+        while True:
+            try:
+                resp = await session.get(url, params=params, headers=req_headers, timeout=self.timeout(kind),
+                                         allow_redirects=True)
+            except aiohttp.ClientConnectionError:
+                if attempt >= self.retries:
+                    raise
+            else:
+                if resp.status not in _RETRY_STATUSES or attempt >= self.retries:
+                    return resp
+                resp.release()
+            attempt += 1
+            await asyncio.sleep(self.backoff * (2 ** (attempt - 1)))
+
+    async def get_async(self, url: str, *, kind: str = "api", params: Optional[Dict] = None,
+                        headers: Optional[Dict] = None, stream: bool = False) -> UpstreamResponse:
+        resp = await self.fetch(url, kind=kind, params=params, headers=headers)
+        if stream:
+            return UpstreamResponse(self, resp)
+        try:
+            body = await resp.read()
+        finally:
+            resp.release()
+        return UpstreamResponse(self, resp, body)
+
+    def get(self, url: str, *, kind: str = "api", params: Optional[Dict] = None, headers: Optional[Dict] = None,
+            stream: bool = False) -> UpstreamResponse:
+        """Blocking ``GET`` with the same calling convention as ``UpstreamClient.get``.
+
+        Inside :func:`using_prefetched`, a matching prefetched response (or its
+        error) is returned instead of going upstream again; its body is
+        already read, so every matching call can iterate it.
+        """
+        prefetched = _PREFETCHED.get()
+        if prefetched:
+            outcome = prefetched.get(request_key(url, params))
+            if isinstance(outcome, BaseException):
+                raise outcome
+            if outcome is not None:
+                return outcome
+        return self.bridge(self.get_async(url, kind=kind, params=params, headers=headers, stream=stream))
+
+    def close(self) -> None:
+        if self._loop is None:
+            return
+        if self._session is not None:
+            self.run(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -1,12 +1,15 @@
 import functools
+import math
 import secrets
+import threading
 import time
-from typing import Callable, Optional, Tuple
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
 from flask import current_app, request, g, jsonify
+from . import signed_token
 
 
 _TOKEN_FALLBACK = {}
-_RATE_FALLBACK = {}  # key -> (count, expire_ts)
 
 # Login rate limit policy
 _MAX_ATTEMPTS_PER_IP = 20          # per window
@@ -15,61 +18,219 @@ _MAX_ATTEMPTS_PER_USER = 5         # per window
 _USER_WINDOW_SECS = 15 * 60
 _LOCK_DURATION_SECS = 15 * 60
 
-
-def _now() -> int:
-    return int(time.time())
-
-
-def _fallback_incr(key: str, window_secs: int) -> int:
-    now = _now()
-    count, exp = _RATE_FALLBACK.get(key, (0, 0))
-    if exp <= now:
-        count = 0
-    count += 1
-    _RATE_FALLBACK[key] = (count, now + window_secs)
-    return count
+# Sliding-window counters: each rule has KEYS current window, previous window,
+# lock. ARGV: now_ms, cost, then limit, window_ms, lock_ms per rule. The
+# previous window's count is weighted by how much of it still overlaps the
+# sliding window. Returns {allowed, retry_after_ms, count...}.
+_SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local n = #KEYS / 3
+local counts = {}
+local retry = 0
+local denied = false
+for i = 1, n do
+    local limit = tonumber(ARGV[3 * i])
+    local window = tonumber(ARGV[3 * i + 1])
+    local lock = tonumber(ARGV[3 * i + 2])
+    local pttl = redis.call('PTTL', KEYS[3 * i])
+    if pttl > 0 then
+        denied = true
+        retry = math.max(retry, pttl)
+    end
+    local cur = tonumber(redis.call('GET', KEYS[3 * i - 2]) or '0')
+    local prev = tonumber(redis.call('GET', KEYS[3 * i - 1]) or '0')
+    local elapsed = now % window
+    counts[i] = math.floor(prev * (window - elapsed) / window) + cur
+    if lock == 0 and cost > 0 and counts[i] + cost > limit then
+        denied = true
+        local wait = window - elapsed
+        if cur + cost <= limit and prev > 0 then
+            wait = math.ceil(window * (1 - (limit - cur - cost) / prev)) - elapsed
+        end
+        retry = math.max(retry, wait, 1)
+    end
+end
+if denied then
+    return {0, retry, unpack(counts)}
+end
+if cost > 0 then
+    for i = 1, n do
+        local limit = tonumber(ARGV[3 * i])
+        local window = tonumber(ARGV[3 * i + 1])
+        local lock = tonumber(ARGV[3 * i + 2])
+        redis.call('INCRBY', KEYS[3 * i - 2], cost)
+        redis.call('PEXPIRE', KEYS[3 * i - 2], window * 2)
+        counts[i] = counts[i] + cost
+        if lock > 0 and counts[i] >= limit then
+            redis.call('SET', KEYS[3 * i], '1', 'PX', lock)
+        end
+    end
+end
+return {1, 0, unpack(counts)}
+"""
+
+
+class RateRule(NamedTuple):
+    """One sliding-window limit on ``key``.
+
+    With ``lock_secs`` 0 the rule throttles: a hit that would exceed
+    ``limit`` within ``window_secs`` is refused and not counted. With
+    ``lock_secs`` > 0 it counts events (e.g. failed logins) and, once
+    ``limit`` is reached, locks ``key`` for ``lock_secs``.
+    """
+
+    key: str
+    limit: int
+    window_secs: float
+    lock_secs: float = 0
+
+
+class RateResult(NamedTuple):
+    allowed: bool
+    retry_after: float  # seconds
+    counts: Tuple[int, ...]
+
+
+class _LocalWindows:
+    """In-process stand-in for the Lua script while Redis is unreachable.
+
+    Bounded: expired entries are dropped as they are met and the least
+    recently used ones once ``max_entries`` is exceeded.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()  # key -> (value, expires_ms)
+        self._lock = threading.Lock()
+
+    def _get(self, key: str, now_ms: int) -> Tuple[int, int]:
+        val = self._data.get(key)
+        if val is None:
+            return 0, 0
+        if val[1] <= now_ms:
+            del self._data[key]
+            return 0, 0
+        self._data.move_to_end(key)
+        return val
+
+    def _set(self, key: str, value: int, expires_ms: int) -> None:
+        self._data[key] = (value, expires_ms)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def evaluate(self, keys: List[str], rules: Sequence[RateRule], cost: int, now_ms: int) -> RateResult:
+        with self._lock:
+            counts, retry, denied = [], 0, False
+            for i, rule in enumerate(rules):
+                cur_key, prev_key, lock_key = keys[3 * i:3 * i + 3]
+                window, limit = int(rule.window_secs * 1000), rule.limit
+                _, lock_until = self._get(lock_key, now_ms)
+                if lock_until:
+                    denied, retry = True, max(retry, lock_until - now_ms)
+                cur, prev = self._get(cur_key, now_ms)[0], self._get(prev_key, now_ms)[0]
+                elapsed = now_ms % window
+                counts.append(prev * (window - elapsed) // window + cur)
+                if not rule.lock_secs and cost > 0 and counts[-1] + cost > limit:
+                    denied = True
+                    wait = window - elapsed
+                    if cur + cost <= limit and prev > 0:
+                        wait = math.ceil(window * (1 - (limit - cur - cost) / prev)) - elapsed
+                    retry = max(retry, wait, 1)
+            if denied:
+                return RateResult(False, retry / 1000, tuple(counts))
+            if cost > 0:
+                for i, rule in enumerate(rules):
+                    cur_key, _, lock_key = keys[3 * i:3 * i + 3]
+                    window = int(rule.window_secs * 1000)
+                    self._set(cur_key, self._get(cur_key, now_ms)[0] + cost, now_ms + 2 * window)
+                    counts[i] += cost
+                    if rule.lock_secs and counts[i] >= rule.limit:
+                        self._set(lock_key, 1, now_ms + int(rule.lock_secs * 1000))
+            return RateResult(True, 0.0, tuple(counts))
+
+    def delete(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+_RATE_FALLBACK = _LocalWindows()
+_RATE_SCRIPTS = {}  # id(redis client) -> registered Script
+
+
+def _window_keys(rule: RateRule, now_ms: int) -> List[str]:
+    window = int(rule.window_secs * 1000)
+    cur = now_ms // window
+    return [f"{rule.key}:{cur}", f"{rule.key}:{cur - 1}", f"{rule.key}:lock"]
+
+
+def check_rate(rules: Sequence[RateRule], cost: int = 1) -> RateResult:
+    """Evaluate ``rules`` atomically in one Redis call; ``cost=0`` only inspects.
+
+    A hit is counted against every rule or, if any rule refuses it or any
+    lock is held, against none.
+    """
+    now_ms = int(time.time() * 1000)
+    keys, args = [], [now_ms, cost]
+    for rule in rules:
+        keys += _window_keys(rule, now_ms)
+        args += [int(rule.limit), int(rule.window_secs * 1000), int(rule.lock_secs * 1000)]
+    try:
+        r = current_app.redis
+        script = _RATE_SCRIPTS.get(id(r))
+        if script is None:
+            script = _RATE_SCRIPTS[id(r)] = r.register_script(_SLIDING_WINDOW_SCRIPT)
+        res = script(keys=keys, args=args)
+        return RateResult(bool(int(res[0])), int(res[1]) / 1000, tuple(int(c) for c in res[2:]))
+    except Exception:
+        return _RATE_FALLBACK.evaluate(keys, rules, cost, now_ms)
 
 
-def _fallback_get(key: str) -> Optional[int]:
-    now = _now()
-    val = _RATE_FALLBACK.get(key)
-    if not val:
+def _parse_rate(value) -> Optional[Tuple[int, float]]:
+    """``"60/60"`` (requests/seconds) -> ``(60, 60.0)``; empty or ``0`` disables."""
+    if not value:
         return None
-    count, exp = val
-    if exp <= now:
+    count, _, secs = str(value).partition("/")
+    try:
+        limit, window = int(count), float(secs or 60)
+    except ValueError:
         return None
-    return count
+    return (limit, window) if limit > 0 and window > 0 else None
 
 
-def _fallback_setex(key: str, ttl: int, value: str) -> None:
-    # store as count, expiry with value encoded in count (not used for reads except existence)
-    _RATE_FALLBACK[key] = (1 if value else 0, _now() + ttl)
+def too_many_requests(retry_after: float):
+    return jsonify({"error": "リクエストが多すぎます。しばらくしてから再度お試しください"}), 429, \
+        {"Retry-After": str(max(1, math.ceil(retry_after)))}
 
 
-def _redis_incr_with_exp(key: str, window_secs: int) -> int:
-    try:
-        pipe = current_app.redis.pipeline()
-        pipe.incr(key)
-        pipe.expire(key, window_secs)
-        res = pipe.execute()
-        return int(res[0])
-    except Exception:
-        return _fallback_incr(key, window_secs)
+def charge_rate(name: str, config_key: str, cost: int = 1, ident: Optional[str] = None) -> Optional[float]:
+    """Count ``cost`` hits of client ``ident`` (default: its IP) against the ``config_key`` limit.
 
+    Returns the seconds to wait when refused, ``None`` when allowed.
+    """
+    rate = _parse_rate(current_app.config.get(config_key))
+    if rate is None or cost <= 0:
+        return None
+    result = check_rate([RateRule(f"rl:{name}:{ident or get_client_ip()}", rate[0], rate[1])], cost)
+    return None if result.allowed else result.retry_after
 
-def _redis_get(key: str) -> Optional[str]:
-    try:
-        return current_app.redis.get(key)
-    except Exception:
-        c = _fallback_get(key)
-        return "1" if c is not None else None
 
+def rate_limit(name: str, config_key: str, key_func: Optional[Callable[[], str]] = None):
+    """Throttle a view per client IP (or ``key_func()``) with the ``config_key`` limit, e.g. ``"60/60"``."""
 
-def _redis_setex(key: str, ttl: int, value: str) -> None:
-    try:
-        current_app.redis.setex(key, ttl, value)
-    except Exception:
-        _fallback_setex(key, ttl, value)
+    def decorator(view_func: Callable):
+        @functools.wraps(view_func)
+        def wrapper(*args, **kwargs):
+            retry_after = charge_rate(name, config_key, ident=key_func() if key_func else None)
+            if retry_after is not None:
+                return too_many_requests(retry_after)
+            return view_func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
 
 
 def get_client_ip() -> str:
@@ -80,37 +241,70 @@ def get_client_ip() -> str:
     return request.remote_addr or "0.0.0.0"
 
 
-def is_login_locked(identifier: str) -> bool:
-    lock_key = f"login:lock:user:{identifier}"
-    return _redis_get(lock_key) is not None
+def _login_rules(identifier: str, ip: Optional[str]) -> List[RateRule]:
+    rules = [RateRule(f"login:user:{identifier}", _MAX_ATTEMPTS_PER_USER, _USER_WINDOW_SECS, _LOCK_DURATION_SECS)]
+    if ip:
+        rules.append(RateRule(f"login:ip:{ip}", _MAX_ATTEMPTS_PER_IP, _IP_WINDOW_SECS, _LOCK_DURATION_SECS))
+    return rules
+
+
+def is_login_locked(identifier: str, ip: Optional[str] = None) -> bool:
+    return not check_rate(_login_rules(identifier, ip), cost=0).allowed
 
 
 def register_login_failure(identifier: str, ip: str) -> Tuple[int, int]:
     # returns tuple of (user_attempts, ip_attempts)
-    user_key = f"login:user:{identifier}"
-    ip_key = f"login:ip:{ip}"
-    user_attempts = _redis_incr_with_exp(user_key, _USER_WINDOW_SECS)
-    ip_attempts = _redis_incr_with_exp(ip_key, _IP_WINDOW_SECS)
-
-    if user_attempts >= _MAX_ATTEMPTS_PER_USER:
-        _redis_setex(f"login:lock:user:{identifier}", _LOCK_DURATION_SECS, "1")
-    if ip_attempts >= _MAX_ATTEMPTS_PER_IP:
-        _redis_setex(f"login:lock:ip:{ip}", _LOCK_DURATION_SECS, "1")
-    return user_attempts, ip_attempts
+    counts = check_rate(_login_rules(identifier, ip)).counts
+    return counts[0], counts[1]
 
 
 def reset_login_counters(identifier: str, ip: str) -> None:
-    # best-effort reset (works only on redis; fallback will expire naturally)
+    # clears the failure counters, not an active lock
+    now_ms = int(time.time() * 1000)
+    keys = [key for rule in _login_rules(identifier, ip) for key in _window_keys(rule, now_ms)[:2]]
+    _RATE_FALLBACK.delete(keys)
     try:
-        current_app.redis.delete(f"login:user:{identifier}")
-        current_app.redis.delete(f"login:ip:{ip}")
+        current_app.redis.delete(*keys)
     except Exception:
         pass
 
 
+def _token_cache():
+    return getattr(current_app, "token_cache", None)
+
+
+def _signing_key() -> bytes:
+    cfg = current_app.config
+    return (cfg.get("AUTH_TOKEN_SIGNING_KEY") or cfg["SECRET_KEY"]).encode("utf-8")
+
+
+def _signed_mode() -> bool:
+    return current_app.config.get("AUTH_TOKEN_MODE") == "signed"
+
+
+def _signed_claims(token: str) -> Optional[dict]:
+    """Claims of a valid, unrevoked signed token; ``None`` otherwise."""
+    claims = signed_token.verify(_signing_key(), token)
+    if claims is None:
+        return None
+    revocations = getattr(current_app, "token_revocations", None)
+    if revocations is not None and revocations.is_revoked(claims):
+        return None
+    return claims
+
+
+def token_ttl_seconds() -> int:
+    return int(current_app.config.get("AUTH_TOKEN_TTL", 60 * 60 * 2))
+
+
 def _set_token(token: str, user_id: int, ttl_seconds: int) -> None:
     try:
-        current_app.redis.set(f"auth:token:{token}", str(user_id), ex=ttl_seconds)
+        pipe = current_app.redis.pipeline()
+        pipe.set(f"auth:token:{token}", str(user_id), ex=ttl_seconds)
+        # per-user index so every session of a user can be revoked at once
+        pipe.sadd(f"auth:user:{user_id}:tokens", token)
+        pipe.expire(f"auth:user:{user_id}:tokens", ttl_seconds)
+        pipe.execute()
     except Exception:
         _TOKEN_FALLBACK[token] = str(user_id)
 
@@ -128,23 +322,93 @@ def _get_user_id(token: str) -> Optional[int]:
         return None
 
 
-def issue_token(user_id: int) -> str:
+def issue_token(user_id: int, role: str = "user") -> str:
+    if _signed_mode():
+        return signed_token.mint(_signing_key(), user_id, role, token_ttl_seconds())
     token = secrets.token_urlsafe(32)
-    ttl_seconds = 60 * 60 * 2  # 2 hours
-    _set_token(token, user_id, ttl_seconds)
+    _set_token(token, user_id, token_ttl_seconds())
+    cache = _token_cache()
+    if cache is not None:
+        cache.put(token, user_id)
     return token
 
 
 def get_user_id_from_token(token: str) -> Optional[int]:
-    return _get_user_id(token)
+    if signed_token.is_signed(token):
+        if not _signed_mode():
+            return None
+        claims = _signed_claims(token)
+        return int(claims["sub"]) if claims else None
+    cache = _token_cache()
+    if cache is None:
+        return _get_user_id(token)
+    return cache.get(token, _get_user_id)
+
+
+def _revoke(tokens, user_id: Optional[int] = None) -> None:
+    tokens = [t for t in tokens if t]
+    for token in tokens:
+        _TOKEN_FALLBACK.pop(token, None)
+    try:
+        pipe = current_app.redis.pipeline()
+        for token in tokens:
+            pipe.delete(f"auth:token:{token}")
+        if user_id is not None:
+            pipe.delete(f"auth:user:{user_id}:tokens")
+        pipe.execute()
+    except Exception:
+        pass
+    cache = _token_cache()
+    if cache is not None:
+        cache.revoke(tokens)
+
+
+def revoke_token(token: str) -> None:
+    """Log ``token`` out in Redis and in the local token cache of every process."""
+    if signed_token.is_signed(token):
+        if not _signed_mode():
+            return
+        claims = signed_token.verify(_signing_key(), token)
+        revocations = getattr(current_app, "token_revocations", None)
+        if claims is not None and revocations is not None:
+            revocations.revoke([f"t:{claims['jti']}"])
+        return
+    user_id = _get_user_id(token)
+    if user_id is not None:
+        try:
+            current_app.redis.srem(f"auth:user:{user_id}:tokens", token)
+        except Exception:
+            pass
+    _revoke([token])
+
+
+def revoke_user_tokens(user_id: int) -> int:
+    """Revoke every token issued to ``user_id``; returns how many stored tokens were found.
+
+    Signed tokens cannot be enumerated; all of the user's signed tokens issued
+    so far are revoked at once.
+    """
+    revocations = getattr(current_app, "token_revocations", None)
+    if revocations is not None:
+        revocations.revoke([f"u:{user_id}"])
+    try:
+        tokens = list(current_app.redis.smembers(f"auth:user:{user_id}:tokens"))
+    except Exception:
+        tokens = [t for t, uid in _TOKEN_FALLBACK.items() if uid == str(user_id)]
+    _revoke(tokens, user_id)
+    return len(tokens)
+
+
+def bearer_token() -> Optional[str]:
+    auth_header = request.headers.get("Authorization", "")
+    parts = auth_header.split()
+    return parts[1] if len(parts) == 2 and parts[0].lower() == "bearer" else None
 
 
 def require_auth(view_func: Callable):
     @functools.wraps(view_func)
     def wrapper(*args, **kwargs):
-        auth_header = request.headers.get("Authorization", "")
-        parts = auth_header.split()
-        token = parts[1] if len(parts) == 2 and parts[0].lower() == "bearer" else None
+        token = bearer_token()
         if not token:
             return jsonify({"error": "認証が必要です"}), 401
         user_id = get_user_id_from_token(token)
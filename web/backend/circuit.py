@@ -0,0 +1,241 @@
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_KEY_PREFIX = "cb:"
+
+# KEYS[1] state hash, KEYS[2] probe lock; ARGV: threshold, opened_until, key ttl
+_FAILURE_SCRIPT = """
+local n = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if state == 'half_open' or n >= tonumber(ARGV[1]) then
+    redis.call('HSET', KEYS[1], 'state', 'open', 'opened_until', ARGV[2], 'failures', 0)
+    redis.call('DEL', KEYS[2])
+    state = 'open'
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {state, redis.call('HGET', KEYS[1], 'opened_until') or '0'}
+"""
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker for one upstream endpoint.
+
+    State lives in a Redis hash so every worker sees the same circuit; each
+    process keeps a local copy refreshed at most every ``sync_secs``, which is
+    what makes an open circuit reject in microseconds. After ``cooldown``
+    seconds a single caller (guarded by a Redis NX key) is let through as the
+    half-open probe; its success closes the circuit and its failure re-opens it.
+    Without Redis the breaker keeps working per process.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis_getter: Callable[[], Any],
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        sync_secs: float = 1.0,
+    ):
+        self.name = name
+        self._redis_getter = redis_getter
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown = float(cooldown)
+        self.sync_secs = float(sync_secs)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_until = 0.0
+        self._probe_until = 0.0
+        self._synced_at = 0.0
+        self.short_circuited = 0
+
+    @property
+    def _key(self) -> str:
+        return f"{_KEY_PREFIX}{self.name}"
+
+    def _redis(self):
+        return self._redis_getter()
+
+    def _sync(self, now: float) -> None:
+        if now - self._synced_at < self.sync_secs:
+            return
+        self._synced_at = now
+        try:
+            data = self._redis().hgetall(self._key)
+        except Exception:
+            return
+        self._state = data.get("state") or CLOSED
+        self._opened_until = float(data.get("opened_until") or 0)
+        self._failures = int(data.get("failures") or 0)
+
+    def _try_probe(self, now: float) -> bool:
+        try:
+            r = self._redis()
+            if not r.set(f"{self._key}:probe", "1", nx=True, ex=max(1, int(self.cooldown))):
+                return False
+            r.hset(self._key, "state", HALF_OPEN)
+            return True
+        except Exception:
+            if self._probe_until > now:
+                return False
+            self._probe_until = now + self.cooldown
+            return True
+
+    def allow(self) -> bool:
+        now = time.time()
+        with self._lock:
+            self._sync(now)
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and now < self._opened_until:
+                self.short_circuited += 1
+                return False
+            if self._try_probe(now):
+                self._state = HALF_OPEN
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == CLOSED and self._failures == 0:
+                return
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_until = 0.0
+            try:
+                r = self._redis()
+                pipe = r.pipeline()
+                pipe.delete(self._key)
+                pipe.delete(f"{self._key}:probe")
+                pipe.execute()
+            except Exception:
+                pass
+
+    def record_failure(self) -> None:
+        now = time.time()
+        opened_until = now + self.cooldown
+        with self._lock:
+            try:
+                state, until = self._redis().eval(
+                    _FAILURE_SCRIPT,
+                    2,
+                    self._key,
+                    f"{self._key}:probe",
+                    self.failure_threshold,
+                    opened_until,
+                    max(60, int(self.cooldown * 4)),
+                )
+                self._state = state
+                self._opened_until = float(until)
+                self._synced_at = now
+            except Exception:
+                self._failures += 1
+                if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                    self._state = OPEN
+                    self._opened_until = opened_until
+                    self._failures = 0
+            if self._state == OPEN:
+                logger.warning("Circuit %s opened for %.0fs", self.name, self.cooldown)
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` through the breaker; any exception counts as a failure."""
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        try:
+            result = fn()
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    async def call_async(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """:meth:`call` for a coroutine function."""
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        try:
+            result = await fn()
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def rejecting(self) -> bool:
+        """Whether the circuit is open and still cooling down, without claiming a probe."""
+        now = time.time()
+        with self._lock:
+            self._sync(now)
+            return self._state == OPEN and now < self._opened_until
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._sync(time.time())
+            return {
+                "state": self._state,
+                "failures": self._failures,
+                "openedUntil": self._opened_until or None,
+                "shortCircuited": self.short_circuited,
+            }
+
+
+class CircuitRegistry:
+    """Lazily created breakers keyed by upstream endpoint name."""
+
+    def __init__(self, redis_getter: Callable[[], Any], failure_threshold: int = 5, cooldown: float = 30.0,
+                 sync_secs: float = 1.0, enabled: bool = True):
+        self._redis_getter = redis_getter
+        self._options = {"failure_threshold": failure_threshold, "cooldown": cooldown, "sync_secs": sync_secs}
+        self.enabled = enabled
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_app(cls, app) -> "CircuitRegistry":
+        cfg = app.config
+        return cls(
+            lambda: app.redis,
+            failure_threshold=cfg.get("CIRCUIT_FAILURE_THRESHOLD", 5),
+            cooldown=cfg.get("CIRCUIT_COOLDOWN_SECS", 30),
+            sync_secs=cfg.get("CIRCUIT_SYNC_SECS", 1.0),
+            enabled=cfg.get("CIRCUIT_ENABLED", True),
+        )
+
+    def get(self, name: str) -> Optional[CircuitBreaker]:
+        if not self.enabled:
+            return None
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = self._breakers[name] = CircuitBreaker(name, self._redis_getter, **self._options)
+        return breaker
+
+    def call(self, name: str, fn: Callable[[], Any]) -> Any:
+        breaker = self.get(name)
+        return breaker.call(fn) if breaker is not None else fn()
+
+    async def call_async(self, name: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        breaker = self.get(name)
+        return await (breaker.call_async(fn) if breaker is not None else fn())
+
+    def rejecting(self, name: str) -> bool:
+        breaker = self.get(name)
+        return breaker is not None and breaker.rejecting()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: b.snapshot() for name, b in list(self._breakers.items())}
@@ -1,5 +1,7 @@
 import os
 
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
 
 class AppConfig:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
@@ -29,6 +31,60 @@ class AppConfig:
     REDIS_DB = int(os.getenv("REDIS_DB", "0"))
     REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
 
+    # Auth tokens: "redis" (opaque token stored in Redis) or "signed" (HMAC-signed, verified without I/O)
+    AUTH_TOKEN_MODE = os.getenv("AUTH_TOKEN_MODE", "redis")
+    AUTH_TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", str(2 * 60 * 60)))
+    AUTH_TOKEN_SIGNING_KEY = os.getenv("AUTH_TOKEN_SIGNING_KEY")  # defaults to SECRET_KEY
+    # Revoked signed tokens: Redis sorted set mirrored into a per-process Bloom filter
+    AUTH_REVOCATION_BLOOM_BITS = int(os.getenv("AUTH_REVOCATION_BLOOM_BITS", str(1 << 20)))
+    AUTH_REVOCATION_BLOOM_HASHES = int(os.getenv("AUTH_REVOCATION_BLOOM_HASHES", "7"))
+    AUTH_REVOCATION_SYNC_SECS = float(os.getenv("AUTH_REVOCATION_SYNC_SECS", "2"))
+
+    # Per-process cache of auth tokens in front of Redis (seconds); evicted on logout via pub/sub
+    AUTH_TOKEN_CACHE_ENABLED = os.getenv("AUTH_TOKEN_CACHE_ENABLED", "1") not in ("0", "false", "False")
+    AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "30"))
+    AUTH_TOKEN_CACHE_NEGATIVE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_NEGATIVE_TTL", "5"))
+    AUTH_TOKEN_CACHE_MAX = int(os.getenv("AUTH_TOKEN_CACHE_MAX", "10000"))
+
+    # Per-client-IP sliding-window limits, "<requests>/<seconds>" (empty or 0 disables)
+    RATE_LIMIT_SEARCH = os.getenv("RATE_LIMIT_SEARCH", "60/60")
+    RATE_LIMIT_PROXY = os.getenv("RATE_LIMIT_PROXY", "1200/60")
+
+    # Password hashing: werkzeug method and pbkdf2 iterations (stored hashes with other
+    # parameters are upgraded on the next successful login), run on a process pool
+    # (0 workers = inline) with a bounded queue and a timeout in seconds
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256")
+    PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "260000"))
+    PASSWORD_HASH_SALT_LENGTH = int(os.getenv("PASSWORD_HASH_SALT_LENGTH", "16"))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "5"))
+
+    # Per-process load shedding by endpoint: token bucket per client IP (rate/s, burst) -> 429,
+    # in-flight caps for the endpoint (-> 503) and per client IP (-> 429); 0 disables a check
+    TRAFFIC_LIMIT_ENABLED = os.getenv("TRAFFIC_LIMIT_ENABLED", "1") not in ("0", "false", "False")
+    TRAFFIC_LIMITS = {
+        "home.mercari_proxy": {
+            "rate": float(os.getenv("TRAFFIC_PROXY_RATE", "30")),
+            "burst": int(os.getenv("TRAFFIC_PROXY_BURST", "120")),
+            "max_inflight": int(os.getenv("TRAFFIC_PROXY_MAX_INFLIGHT", "64")),
+            "max_inflight_per_ip": int(os.getenv("TRAFFIC_PROXY_MAX_INFLIGHT_PER_IP", "16")),
+        },
+        "home.mercari_search": {
+            "rate": float(os.getenv("TRAFFIC_SEARCH_RATE", "2")),
+            "burst": int(os.getenv("TRAFFIC_SEARCH_BURST", "10")),
+            "max_inflight": int(os.getenv("TRAFFIC_SEARCH_MAX_INFLIGHT", "16")),
+            "max_inflight_per_ip": int(os.getenv("TRAFFIC_SEARCH_MAX_INFLIGHT_PER_IP", "4")),
+        },
+        # Every home page render goes through /batch; its searches are charged to the /search bucket.
+        "home.home_batch": {
+            "rate": float(os.getenv("TRAFFIC_BATCH_RATE", "0")),
+            "burst": int(os.getenv("TRAFFIC_BATCH_BURST", "0")),
+            "max_inflight": int(os.getenv("TRAFFIC_BATCH_MAX_INFLIGHT", "32")),
+            "max_inflight_per_ip": int(os.getenv("TRAFFIC_BATCH_MAX_INFLIGHT_PER_IP", "8")),
+        },
+    }
+
     # CORS
     CORS_ALLOW_ORIGINS = os.getenv("CORS_ALLOW_ORIGINS", "*")
 
@@ -36,4 +92,75 @@ class AppConfig:
     ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "change-admin-key")
 
     # External services
-    MERCARI_BASE = os.getenv("MERCARI_BASE", "https://jp.mercari.com") 
\ No newline at end of file
+    MERCARI_BASE = os.getenv("MERCARI_BASE", "https://jp.mercari.com")
+
+    # Upstream HTTP client (shared keep-alive pools per host)
+    UPSTREAM_POOL_CONNECTIONS = int(os.getenv("UPSTREAM_POOL_CONNECTIONS", "8"))
+    UPSTREAM_POOL_MAXSIZE = int(os.getenv("UPSTREAM_POOL_MAXSIZE", "32"))
+    UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "1"))
+    UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.2"))
+    UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3.05"))
+    UPSTREAM_API_TIMEOUT = float(os.getenv("UPSTREAM_API_TIMEOUT", "10"))
+    UPSTREAM_SEARCH_TIMEOUT = float(os.getenv("UPSTREAM_SEARCH_TIMEOUT", "15"))
+    UPSTREAM_PROXY_TIMEOUT = float(os.getenv("UPSTREAM_PROXY_TIMEOUT", "12"))
+    PROXY_CHUNK_SIZE = int(os.getenv("PROXY_CHUNK_SIZE", str(64 * 1024)))
+    # "requests" (thread per in-flight call) or "async" (aiohttp event loop, needs aiohttp)
+    UPSTREAM_ENGINE = os.getenv("UPSTREAM_ENGINE", "requests")
+    UPSTREAM_ASYNC_LIMIT = int(os.getenv("UPSTREAM_ASYNC_LIMIT", "1000"))
+    UPSTREAM_ASYNC_LIMIT_PER_HOST = int(os.getenv("UPSTREAM_ASYNC_LIMIT_PER_HOST", "256"))
+
+    # Background catalog refresher: comma separated feeds "default", "brand:<name>",
+    # "category:<id>", "keyword:<text>" fetched every interval (+/- jitter fraction)
+    CATALOG_REFRESH_ENABLED = os.getenv("CATALOG_REFRESH_ENABLED", "0") not in ("0", "false", "False")
+    CATALOG_REFRESH_FEEDS = os.getenv("CATALOG_REFRESH_FEEDS", "default,brand:chanel,brand:gucci,brand:hermes,brand:louis-vuitton")
+    CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "600"))
+    CATALOG_REFRESH_JITTER = float(os.getenv("CATALOG_REFRESH_JITTER", "0.2"))
+    CATALOG_REFRESH_CONCURRENCY = int(os.getenv("CATALOG_REFRESH_CONCURRENCY", "4"))
+    CATALOG_REFRESH_LIMIT = int(os.getenv("CATALOG_REFRESH_LIMIT", "60"))
+    CATALOG_REFRESH_TTL = int(os.getenv("CATALOG_REFRESH_TTL", "3600"))
+
+    # Shared response cache for /api/home/feed, /items and /search (seconds)
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") not in ("0", "false", "False")
+    RESPONSE_CACHE_TTLS = {
+        "feed": int(os.getenv("RESPONSE_CACHE_TTL_FEED", "60")),
+        "items": int(os.getenv("RESPONSE_CACHE_TTL_ITEMS", "300")),
+        "search": int(os.getenv("RESPONSE_CACHE_TTL_SEARCH", "120")),
+    }
+    RESPONSE_CACHE_STALE_TTL = int(os.getenv("RESPONSE_CACHE_STALE_TTL", "600"))
+    RESPONSE_CACHE_FALLBACK_MAX = int(os.getenv("RESPONSE_CACHE_FALLBACK_MAX", "512"))
+
+    # Circuit breakers for upstream Mercari hosts (shared through Redis)
+    CIRCUIT_ENABLED = os.getenv("CIRCUIT_ENABLED", "1") not in ("0", "false", "False")
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_COOLDOWN_SECS = float(os.getenv("CIRCUIT_COOLDOWN_SECS", "30"))
+    CIRCUIT_SYNC_SECS = float(os.getenv("CIRCUIT_SYNC_SECS", "1"))
+
+    # Hedged requests across the two Mercari search APIs
+    HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1") not in ("0", "false", "False")
+    HEDGE_DELAY_SECS = float(os.getenv("HEDGE_DELAY_SECS", "0.8"))
+    HEDGE_MAX_WORKERS = int(os.getenv("HEDGE_MAX_WORKERS", "16"))
+
+    # Single-flight coalescing of identical upstream fetches (seconds)
+    SINGLEFLIGHT_WAIT = float(os.getenv("SINGLEFLIGHT_WAIT", "20"))
+    SINGLEFLIGHT_RESULT_TTL = float(os.getenv("SINGLEFLIGHT_RESULT_TTL", "5"))
+    SINGLEFLIGHT_POLL = float(os.getenv("SINGLEFLIGHT_POLL", "0.05"))
+
+    # On-disk cache for proxied static assets
+    ASSET_CACHE_ENABLED = os.getenv("ASSET_CACHE_ENABLED", "1") not in ("0", "false", "False")
+    ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", os.path.join(_PROJECT_ROOT, ".asset_cache"))
+    ASSET_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    ASSET_CACHE_MAX_OBJECT_BYTES = int(os.getenv("ASSET_CACHE_MAX_OBJECT_BYTES", str(16 * 1024 * 1024)))
+    ASSET_CACHE_DEFAULT_TTL = int(os.getenv("ASSET_CACHE_DEFAULT_TTL", "3600"))
+
+    # POST /api/home/batch
+    BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "20"))
+    BATCH_MAX_SEARCHES = int(os.getenv("BATCH_MAX_SEARCHES", "5"))
+    BATCH_DEADLINE_SECS = float(os.getenv("BATCH_DEADLINE_SECS", "3"))
+    BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "16"))
+
+    # Static item datasets (mercari_items.json, brands/*.json)
+    DATASET_CACHE_MAX_ENTRIES = int(os.getenv("DATASET_CACHE_MAX_ENTRIES", "32"))
+    DATASET_CACHE_TTL = float(os.getenv("DATASET_CACHE_TTL", "5"))
+    DATASET_CACHE_MAX_BYTES = int(os.getenv("DATASET_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    # Prefer compiled .mcat catalogs (scripts/compile_catalog.py) next to the JSON datasets
+    COMPILED_CATALOG_ENABLED = os.getenv("COMPILED_CATALOG_ENABLED", "1") not in ("0", "false", "False")
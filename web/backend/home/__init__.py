@@ -1,15 +1,35 @@
 from urllib.parse import urljoin, urlparse, urlencode, parse_qs
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, g
 import requests
 import re
 import json
-from bs4 import BeautifulSoup
+from werkzeug.datastructures import Headers
 import logging
+import time
 from pathlib import Path
-from typing import Optional, List, Dict
+from functools import partial
+from typing import Callable, Optional, List, Dict, Sequence, Tuple
 import base64
 
+from ..async_upstream import AsyncUpstreamClient, using_prefetched
+from ..auth import charge_rate, rate_limit, too_many_requests
 from ..auth_crypto import decrypt_payload
+from ..circuit import CircuitOpenError
+from ..upstream import iter_raw
+from . import compiled_catalog
+from .item import Item, as_items, dumps, parse_price
+from .listing import ListingQuery, PriceIndex, paginate, parse_query
+from .product_extractor import extract_products
+from .response_cache import cache_key, cached_payload, has_entry
+from .response_cache import stats as response_cache_stats
+from .rewriter import rewrite_css as _rewrite_css
+from .rewriter import rewrite_html_stream
+from .rewriter import to_proxy_path as _to_proxy_path
+from .search_index import SearchIndex, normalize_text
+from .search_page import StageTimer, read_next_data, server_timing_header
+from . import batch, hedge, product_extractor, search_page, singleflight
+from .hedge import first_non_empty
+from .singleflight import flight_key
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +37,16 @@ home_bp = Blueprint("home", __name__)
 
 
 MERCARI_API_ENDPOINT = "https://api.mercari.jp/search/index"
+MERCARI_WWW_ENDPOINT = "https://www.mercari.com/jp/api/search/items/"
+
+# Circuit breaker names, one per upstream host
+_CIRCUIT_API = "api.mercari.jp"
+_CIRCUIT_WWW = "www.mercari.com"
+_CIRCUIT_WEB = "jp.mercari.com"
+
+# Items scraped per search when paging with min_price/max_price/sort/cursor;
+# live-search cursors end after this many items.
+_LISTING_WINDOW = 120
 
 
 def _normalize_path(raw: str) -> str:
@@ -30,172 +60,207 @@ def _normalize_path(raw: str) -> str:
     return raw
 
 
-def _to_proxy_path(base: str, url: str) -> str:
-    if not url or url.startswith("javascript:") or url.startswith("#"):
-        return url
-    if url.startswith("//"):
-        url = "https:" + url
-    parsed = urlparse(url)
-    base_host = urlparse(base).netloc
-    if parsed.scheme in ("http", "https"):
-        if parsed.netloc and base_host.split(':')[0] not in parsed.netloc:
-            return url
-        pathq = parsed.path or "/"
-        if parsed.query:
-            pathq += "?" + parsed.query
-        return f"/api/home/proxy?" + urlencode({"path": pathq})
-    if url.startswith("/"):
-        return f"/api/home/proxy?" + urlencode({"path": url})
-    return url
-
-
-def _rewrite_html(html: str, base: str) -> str:
-    lower = html.lower()
-    insert_tag = f"<base href=\"{base}\">"
-    if "<head" in lower and "<base" not in lower:
-        idx = lower.find("<head")
-        head_end = html.find('>', idx)
-        if head_end != -1:
-            html = html[:head_end+1] + insert_tag + html[head_end+1:]
-
-    def repl_attr(match):
-        attr = match.group(1)
-        quote = match.group(2)
-        val = match.group(3)
-        return f"{attr}={quote}{_to_proxy_path(base, val)}{quote}"
-
-    html = re.sub(r"\b(href|src|action)=(['\"])(.*?)(['\"])",
-                  lambda m: repl_attr((lambda a=m: a)()),
-                  html, flags=re.IGNORECASE)
-    return html
-
-
-def _rewrite_css(text_css: str, base: str) -> str:
-    def repl_url(m):
-        raw = m.group(1).strip('"\'')
-        return f"url({_to_proxy_path(base, raw)})"
-    return re.sub(r"url\((.*?)\)", repl_url, text_css, flags=re.IGNORECASE)
-
-
-def _extract_products_from_json(obj, base, max_items=60):
-    results = []
-    stack = [obj]
-    while stack and len(results) < max_items:
-        current = stack.pop()
-        if isinstance(current, dict):
-            if ("name" in current and ("price" in current or "priceLabel" in current or "price_label" in current)
-                    and ("thumbnails" in current or "images" in current or "image" in current)):
-                thumb = current.get("thumbnails") or current.get("images") or [current.get("image")]
-                if isinstance(thumb, list) and thumb:
-                    img = thumb[0]
-                    if isinstance(img, dict):
-                        img = img.get("url")
-                else:
-                    img = thumb
-                link = current.get("url") or current.get("link") or current.get("itemUrl") or current.get("item_url")
-                price_val = current.get("price") or current.get("priceLabel") or current.get("price_label")
-                if price_val is not None:
-                    price = f"{price_val}円" if isinstance(price_val, (int, float, str)) else str(price_val)
-                else:
-                    price = ""
-                if link and img and current.get("name"):
-                    results.append({
-                        "title": current.get("name"),
-                        "price": price,
-                        "image": _to_proxy_path(base, img),
-                        "link": _to_proxy_path(base, link),
-                    })
-                    continue
-            for value in current.values():
-                stack.append(value)
-        elif isinstance(current, list):
-            stack.extend(current)
-    return results
+def _fetch_merch_api(path: str, limit: int):
+    """Query the Mercari search APIs, coalescing identical concurrent calls."""
+    return as_items(singleflight.do(flight_key("merch_api", path, limit), lambda: _query_merch_api(path, limit)))
 
 
-def _fetch_merch_api(path: str, limit: int):
-    query = urlparse(path).query
-    params = parse_qs(query)
+def _api_jp_payload(params: Dict, limit: int) -> Dict:
+    keyword = params.get("keyword", [""])[0]
     payload = {
         "page": 1,
         "limit": limit,
         "sort": params.get("sort", ["category"])[0],
         "order": params.get("order", ["desc"])[0],
     }
+    if keyword:
+        payload["keyword"] = keyword
+    if "category_id" in params:
+        payload["category_id"] = params["category_id"][0]
+    return payload
+
+
+def _api_jp_items(data: Dict, base: str, limit: int) -> List[Item]:
+    items = []
+    for product in data.get("items", [])[:limit]:
+        thumb = product.get("thumbnails") or product.get("images") or []
+        img_url = thumb[0].get("url") if thumb and isinstance(thumb[0], dict) else thumb[0] if thumb else ""
+        items.append(Item(
+            title=product.get("name", ""),
+            price=parse_price(product.get("price")),
+            image=_to_proxy_path(base, img_url or ""),
+            href=_to_proxy_path(base, product.get("url", "")),
+            id=str(product.get("id") or ""),
+            status=str(product.get("status") or ""),
+        ))
+    return items
+
+
+def _query_api_jp(client, base: str, params: Dict, headers: Dict, limit: int) -> List[Item]:
+    resp = client.get(MERCARI_API_ENDPOINT, kind="api", params=_api_jp_payload(params, limit), headers=headers)
+    resp.raise_for_status()
+    return _api_jp_items(resp.json(), base, limit)
+
+
+def _api_www_payload(params: Dict, limit: int) -> Dict:
     keyword = params.get("keyword", [""])[0]
+    payload = {
+        "page": 1,
+        "limit": limit,
+        "status": "on_sale",
+        "sort": params.get("sort", ["sort" if keyword else "category"])[0],
+        "order": params.get("order", ["desc"])[0],
+    }
     if keyword:
         payload["keyword"] = keyword
     if "category_id" in params:
         payload["category_id"] = params["category_id"][0]
+    return payload
+
+
+def _api_www_items(data: Dict, base: str, limit: int) -> List[Item]:
+    items_data = data.get("items") or data.get("data", {}).get("items", [])
+    items = []
+    for product in items_data[:limit]:
+        thumb = product.get("thumbnails") or product.get("images") or []
+        img_url = thumb[0].get("url") if thumb and isinstance(thumb[0], dict) else thumb[0] if thumb else product.get("image", "")
+        link = product.get("url") or product.get("itemUrl") or product.get("item_url") or ""
+        items.append(Item(
+            title=product.get("name", product.get("title", "")),
+            price=parse_price(product.get("price") or product.get("price_label")),
+            image=_to_proxy_path(base, img_url or ""),
+            href=_to_proxy_path(base, link),
+            id=str(product.get("id") or ""),
+            status=str(product.get("status") or ""),
+        ))
+    return items
+
+
+def _query_api_www(client, base: str, params: Dict, headers: Dict, limit: int) -> List[Item]:
+    resp = client.get(MERCARI_WWW_ENDPOINT, kind="api", params=_api_www_payload(params, limit), headers=headers)
+    resp.raise_for_status()
+    return _api_www_items(resp.json(), base, limit)
+
+
+async def _query_api_async(client: AsyncUpstreamClient, endpoint: str, payload: Dict, headers: Dict) -> Dict:
+    resp = await client.get_async(endpoint, kind="api", params=payload, headers=headers)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _query_merch_api(path: str, limit: int):
+    """Race api.mercari.jp against www.mercari.com; the first non-empty answer wins.
+
+    With ``HEDGE_ENABLED`` the secondary endpoint is launched after
+    ``HEDGE_DELAY_SECS`` even if the primary is still in flight; otherwise it
+    only runs once the primary has failed. With the async engine the race is
+    one call into its event loop instead of two hedge pool threads.
+    """
+    params = parse_qs(urlparse(path).query)
+    cfg = current_app.config
+    base = cfg["MERCARI_BASE"]
+    client = current_app.upstream
+    circuits = current_app.circuits
     headers = {
         "User-Agent": "Mozilla/5.0 (compatible; JP-Site/1.0)",
-        "Referer": current_app.config["MERCARI_BASE"],
+        "Referer": base,
     }
-    try:
-        resp = requests.get(MERCARI_API_ENDPOINT, params=payload, timeout=10, headers=headers)
-        resp.raise_for_status()
-        data = resp.json()
-        items = []
-        for product in data.get("items", [])[:limit]:
-            thumb = product.get("thumbnails") or product.get("images") or []
-            img_url = thumb[0].get("url") if thumb and isinstance(thumb[0], dict) else thumb[0] if thumb else ""
-            items.append({
-                "title": product.get("name", ""),
-                "price": f"{product.get('price', '')}円",
-                "image": _to_proxy_path(current_app.config["MERCARI_BASE"], img_url or ""),
-                "link": _to_proxy_path(current_app.config["MERCARI_BASE"], product.get("url", "")),
-            })
-        if items:
-            return items
-    except Exception:
-        pass
+    delay = float(cfg.get("HEDGE_DELAY_SECS", 0.8)) if cfg.get("HEDGE_ENABLED", True) else None
+    if isinstance(client, AsyncUpstreamClient):
+        async def api_jp():
+            data = await _query_api_async(client, MERCARI_API_ENDPOINT, _api_jp_payload(params, limit), headers)
+            return _api_jp_items(data, base, limit)
+
+        async def api_www():
+            data = await _query_api_async(client, MERCARI_WWW_ENDPOINT, _api_www_payload(params, limit), headers)
+            return _api_www_items(data, base, limit)
+
+        attempts = [
+            (_CIRCUIT_API, lambda: circuits.call_async(_CIRCUIT_API, api_jp)),
+            (_CIRCUIT_WWW, lambda: circuits.call_async(_CIRCUIT_WWW, api_www)),
+        ]
+        return client.run(hedge.first_non_empty_async(attempts, delay)) or []
+    attempts = [
+        (_CIRCUIT_API, lambda: circuits.call(_CIRCUIT_API, lambda: _query_api_jp(client, base, params, headers, limit))),
+        (_CIRCUIT_WWW, lambda: circuits.call(_CIRCUIT_WWW, lambda: _query_api_www(client, base, params, headers, limit))),
+    ]
+    return first_non_empty(attempts, delay, max_workers=cfg.get("HEDGE_MAX_WORKERS", 16)) or []
+
+
+def _data_dir() -> Path:
+    return Path(current_app.root_path).parent / "frontend" / "src" / "data"
+
+
+def _parse_item_list(path: str) -> List[Item]:
+    """Parse a dataset file into the items it contains."""
+    with open(path, "r", encoding="utf-8") as fp:
+        data = json.load(fp)
+    if not isinstance(data, list):
+        return []
+    return [Item.from_dict(item) for item in data if item and isinstance(item, dict)]
+
+
+_load_compiled = partial(compiled_catalog.load, factory=Item.from_dict)
+
+
+def _dataset_source(path: Path) -> Tuple[Path, Callable, Tuple[Path, ...], Sequence[Item]]:
+    """Pick the compiled ``.mcat`` next to the JSON dataset at ``path`` when it is usable.
+
+    Returns ``(source, loader, depends, items)``, costing one counted cache
+    lookup; a compiled entry depends on its JSON source, so editing the JSON
+    drops the mapped catalog on the next check. Raises ``FileNotFoundError``
+    when neither file exists.
+    """
+    cache = current_app.dataset_cache
+    if current_app.config.get("COMPILED_CATALOG_ENABLED", True):
+        compiled = compiled_catalog.compiled_path(path)
+        items = cache.probe(compiled, _load_compiled, (path,))
+        if items is not None:
+            return compiled, _load_compiled, (path,), items
+    return path, _parse_item_list, (), cache.get(path, _parse_item_list)
+
+
+def _load_dataset(path: Path) -> List[Item]:
+    """Return the cached, pre-validated item list stored at ``path``.
+
+    A compiled catalog is returned as a lazy sequence; slicing it only
+    materializes the requested items.
+    """
+    return _dataset_source(path)[3]
+
+
+def _dataset_index(path: Path) -> SearchIndex:
+    """Return the keyword index built once for the dataset at ``path``."""
+    source, loader, depends, _ = _dataset_source(path)
+    return current_app.dataset_cache.derived(source, "search_index", SearchIndex, loader, depends, count=False)
 
-    try:
-        payload2 = {
-            "page": 1,
-            "limit": limit,
-            "status": "on_sale",
-            "sort": params.get("sort", ["sort" if keyword else "category"])[0],
-            "order": params.get("order", ["desc"])[0],
-        }
-        if keyword:
-            payload2["keyword"] = keyword
-        if "category_id" in params:
-            payload2["category_id"] = params["category_id"][0]
-        resp2 = requests.get("https://www.mercari.com/jp/api/search/items/", params=payload2, timeout=10, headers=headers)
-        resp2.raise_for_status()
-        data2 = resp2.json()
-        items_data = data2.get("items") or data2.get("data", {}).get("items", [])
-        items = []
-        for product in items_data[:limit]:
-            thumb = product.get("thumbnails") or product.get("images") or []
-            img_url = thumb[0].get("url") if thumb and isinstance(thumb[0], dict) else thumb[0] if thumb else product.get("image", "")
-            link = product.get("url") or product.get("itemUrl") or product.get("item_url") or ""
-            items.append({
-                "title": product.get("name", product.get("title", "")),
-                "price": f"{product.get('price', '')}円" if product.get('price') else product.get('price_label', ''),
-                "image": _to_proxy_path(current_app.config["MERCARI_BASE"], img_url or ""),
-                "link": _to_proxy_path(current_app.config["MERCARI_BASE"], link),
-            })
-        if items:
-            return items
-    except Exception:
-        pass
 
+def _dataset_listing(path: Path) -> Tuple[Sequence[Item], PriceIndex]:
+    """The dataset at ``path`` with its price index, both built once per dataset load."""
+    source, loader, depends, items = _dataset_source(path)
+    return items, current_app.dataset_cache.derived(source, "price_index", PriceIndex, loader, depends, count=False)
+
+
+def _search_fallback_items(keyword: str, limit: Optional[int] = None) -> List[Item]:
+    """Return fallback items whose title contains ``keyword``, best match first."""
+    data_path = _data_dir() / "mercari_items.json"
+    try:
+        return _dataset_index(data_path).search(keyword, limit)
+    except FileNotFoundError:
+        logger.warning("Fallback items file not found: %s", data_path)
+    except Exception as exc:
+        logger.warning("Failed to search fallback items: %s", exc)
     return []
 
 
 def _load_fallback_items(limit: Optional[int] = None):
     """Load static fallback items from the frontend dataset."""
-    data_path = Path(current_app.root_path).parent / "frontend" / "src" / "data" / "mercari_items.json"
+    data_path = _data_dir() / "mercari_items.json"
     try:
-        with data_path.open("r", encoding="utf-8") as fp:
-            data = json.load(fp)
-        if not isinstance(data, list):
-            return []
+        data = _load_dataset(data_path)
         if limit is not None and limit > 0:
             return data[:limit]
-        return data
+        return list(data)
     except FileNotFoundError:
         logger.warning("Fallback items file not found: %s", data_path)
     except Exception as exc:
@@ -209,37 +274,112 @@ def _normalize_brand_key(raw: str) -> str:
     return re.sub(r"[^a-z0-9]+", "-", raw.lower())
 
 
-def _load_brand_items(brand: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
+def _load_brand_items(brand: str, limit: Optional[int] = None) -> List[Item]:
     """Load brand specific items from static dataset or fallback items filtered by keyword."""
     if not brand:
         return []
 
     key = _normalize_brand_key(brand)
-    data_dir = Path(current_app.root_path).parent / "frontend" / "src" / "data" / "brands"
-    data_path = data_dir / f"{key}.json"
+    data_path = _data_dir() / "brands" / f"{key}.json"
 
     try:
-        with data_path.open("r", encoding="utf-8") as fp:
-            data = json.load(fp)
-        if isinstance(data, list):
-            valid_items = [item for item in data if item and isinstance(item, dict)]
-            if limit is not None and limit > 0:
-                return valid_items[:limit]
-            return valid_items
+        valid_items = _load_dataset(data_path)
+        if limit is not None and limit > 0:
+            return valid_items[:limit]
+        return list(valid_items)
     except FileNotFoundError:
         logger.info("Brand dataset not found for %s, falling back to keyword filter", brand)
     except Exception as exc:
         logger.warning("Failed to load brand items for %s: %s", brand, exc)
 
-    fallback_items = _load_fallback_items(None)
-    if not fallback_items:
-        return []
+    return _search_fallback_items(brand, limit)
+
+
+@home_bp.get("/stats")
+def home_stats():
+    return jsonify({
+        "datasetCache": current_app.dataset_cache.stats(),
+        "responseCache": response_cache_stats(),
+        "singleflight": singleflight.stats(),
+        "upstreamEndpoints": hedge.stats(),
+        "assetCache": current_app.asset_cache.stats() if current_app.asset_cache is not None else None,
+        "searchStages": search_page.stats(),
+        "productExtractor": product_extractor.stats(),
+        "batch": batch.stats(),
+    })
+
+
+def _cached_json(endpoint: str, params: Dict, compute):
+    body, status, cache_status = cached_payload(endpoint, params, compute)
+    resp = Response(body, status=status, mimetype="application/json")
+    resp.headers["X-Cache"] = cache_status
+    timings = g.get("server_timing")
+    if timings:
+        resp.headers["Server-Timing"] = server_timing_header(timings)
+    return resp
+
+
+def catalog_feed_value(kind: str, value: str) -> str:
+    """Canonical value of a catalog feed, matching how requests are keyed."""
+    if kind == "brand":
+        return _normalize_brand_key(value)
+    if kind == "keyword":
+        return normalize_text(value)
+    return value
+
+
+def fetch_catalog_feed(kind: str, value: str, limit: int) -> List[Item]:
+    """Fetch one catalog feed live from Mercari (used by the background refresher)."""
+    if kind == "default":
+        return _query_merch_api("/search/", limit)
+    if kind == "category":
+        return _query_merch_api("/search/?" + urlencode({"category_id": value}), limit) or _scrape_search("", value, limit)
+    keyword = value.replace("-", " ") if kind == "brand" else value
+    if kind == "keyword":
+        return _scrape_search(keyword, "", limit) or _query_merch_api("/search/?" + urlencode({"keyword": keyword}), limit)
+    return _query_merch_api("/search/?" + urlencode({"keyword": keyword}), limit) or _scrape_search(keyword, "", limit)
+
+
+def _catalog_items(kind: str, value: str, limit: int) -> Optional[List[Item]]:
+    refresher = getattr(current_app, "catalog_refresher", None)
+    if refresher is None:
+        return None
+    return refresher.lookup(kind, value, limit)
+
+
+def _catalog_feed_for(keyword: str, category: str) -> Tuple[str, str]:
+    if keyword and not category:
+        return "keyword", keyword
+    if category and not keyword:
+        return "category", category
+    if not keyword and not category:
+        return "default", ""
+    return "", ""
+
 
-    lowered = brand.lower()
-    filtered = [item for item in fallback_items if lowered in (item.get("title", "") or "").lower()]
-    if limit is not None and limit > 0:
-        return filtered[:limit]
-    return filtered
+@home_bp.get("/catalog/status")
+def catalog_status():
+    refresher = getattr(current_app, "catalog_refresher", None)
+    if refresher is None:
+        return jsonify({"enabled": False, "feeds": {}})
+    return jsonify({"enabled": True, "feeds": refresher.status()})
+
+
+def _feed_payload(path: str, limit: int):
+    params = parse_qs(urlparse(path).query)
+    kind, value = _catalog_feed_for(params.get("keyword", [""])[0], params.get("category_id", [""])[0])
+    items = _catalog_items(kind, value, limit) if kind else None
+    if items:
+        return {"items": items}, 200
+
+    items = _fetch_merch_api(path, limit)
+    if items:
+        return {"items": items}, 200
+
+    fallback_items = _load_fallback_items(limit)
+    if fallback_items:
+        return {"items": fallback_items}, 200
+    return {"items": []}, 200
 
 
 @home_bp.get("/feed")
@@ -247,73 +387,241 @@ def mercari_feed():
     raw_path = request.args.get("path", "/search/")
     path = _normalize_path(raw_path)
     limit = min(int(request.args.get("limit", 24)), 60)
-    base = current_app.config["MERCARI_BASE"]
-    url = urljoin(base, path)
+    return _cached_json("feed", {"path": path, "limit": limit}, lambda: _feed_payload(path, limit))
 
-    items = _fetch_merch_api(path, limit)
+
+def _listing_payload(query: ListingQuery, items: Sequence[Item], index: Optional[PriceIndex] = None):
+    return paginate(items, query, index), 200
+
+
+def _items_listing(brand: str, query: ListingQuery):
+    """Filtered/sorted/paged items: catalog snapshot, then the brand (or fallback) dataset."""
+    items = _catalog_items("brand", brand, 0) if brand else _catalog_items("default", "", 0)
     if items:
-        return jsonify({"items": items})
+        return _listing_payload(query, items)
+    if brand:
+        data_path = _data_dir() / "brands" / f"{_normalize_brand_key(brand)}.json"
+        try:
+            return _listing_payload(query, *_dataset_listing(data_path))
+        except FileNotFoundError:
+            return _listing_payload(query, _search_fallback_items(brand))
+    try:
+        return _listing_payload(query, *_dataset_listing(_data_dir() / "mercari_items.json"))
+    except FileNotFoundError:
+        logger.warning("Fallback items file not found")
+        return {"items": [], "nextCursor": None, "total": 0}, 200
 
-    fallback_items = _load_fallback_items(limit)
-    if fallback_items:
-        return jsonify({"items": fallback_items})
-    return jsonify({"items": []})
+
+def _items_payload(brand: str, limit: int, query: Optional[ListingQuery] = None):
+    if query is not None and query.active:
+        return _items_listing(brand, query)
+    if brand:
+        items = _catalog_items("brand", brand, limit) or _load_brand_items(brand, limit)
+        if items:
+            return {"items": items}, 200
+        # fallthrough to general feed when brand not found / empty
+
+    return _feed_payload("/search/", limit)
+
+
+Plan = Tuple[str, Dict, Callable]
+
+
+def _items_request(args) -> Plan:
+    """Response-cache endpoint, cache params and payload function of an items query.
+
+    Raises ``ValueError`` with the client-facing message on bad parameters.
+    """
+    try:
+        limit = min(int(args.get("limit", 24)), 60)
+        query = parse_query(args, limit)
+    except ValueError as exc:
+        raise ValueError(f"パラメータが不正です: {exc}") from None
+    brand = (args.get("brand") or "").strip()
+    params = {"brand": _normalize_brand_key(brand), "limit": limit}
+    if query.active:
+        params.update(query.cache_params())
+    return "items", params, lambda: _items_payload(brand, limit, query)
 
 
 @home_bp.get("/items")
 def mercari_items():
     """获取默认商品列表（别名：feed）"""
-    limit = min(int(request.args.get("limit", 24)), 60)
-    brand = request.args.get("brand", "").strip()
+    try:
+        plan = _items_request(request.args)
+    except ValueError as exc:
+        return jsonify({"items": [], "error": str(exc)}), 400
+    return _cached_json(*plan)
 
-    if brand:
-        items = _load_brand_items(brand, limit)
-        if items:
-            return jsonify({"items": items})
-        # fallthrough to general feed when brand not found / empty
 
-    path = "/search/"
-    items = _fetch_merch_api(path, limit)
-    if items:
-        return jsonify({"items": items})
+def _search_terms(args) -> Tuple[str, str]:
+    """``(keyword, category)`` from the encrypted ``t_s`` blob or the plain ``q``/``category`` args."""
+    encrypted_blob = args.get("t_s")
+    if not encrypted_blob:
+        return (args.get("q") or "").strip(), (args.get("category") or "").strip()
+    try:
+        padded = encrypted_blob + "=" * (-len(encrypted_blob) % 4)
+        try:
+            enc_bytes = base64.urlsafe_b64decode(padded)
+        except Exception:
+            enc_bytes = base64.b64decode(padded)
+        decrypted = decrypt_payload(enc_bytes)
+        payload = json.loads(decrypted.decode("utf-8"))
+        return (payload.get("keyword") or "").strip(), (payload.get("category") or "").strip()
+    except Exception as exc:
+        logger.warning("Failed to decrypt search payload: %s", exc)
+        raise ValueError("検索情報の復号に失敗しました") from None
+
+
+SearchArgs = Tuple[str, str, int, ListingQuery]
+
+
+def _search_args(args) -> Optional[SearchArgs]:
+    """``(keyword, category, limit, query)`` of a search; ``None`` when there is nothing to search for."""
+    keyword, category = _search_terms(args)
+    try:
+        limit = min(int(args.get("limit", 24)), 60)
+        query = parse_query(args, limit)
+    except ValueError as exc:
+        raise ValueError(f"パラメータが不正です: {exc}") from None
+    if not keyword and not category:
+        return None
+    return keyword, category, limit, query
+
+
+def _search_plan(keyword: str, category: str, limit: int, query: ListingQuery) -> Plan:
+    params = {"keyword": normalize_text(keyword), "category": category, "limit": limit}
+    if query.active:
+        params.update(query.cache_params())
+    return "search", params, lambda: _search_payload(keyword, category, limit, query)
 
-    fallback_items = _load_fallback_items(limit)
-    if fallback_items:
-        return jsonify({"items": fallback_items})
 
-    return jsonify({"items": []})
+def _search_request(args) -> Optional[Plan]:
+    """Like :func:`_items_request` for searches; ``None`` when there is nothing to search for."""
+    search = _search_args(args)
+    return _search_plan(*search) if search is not None else None
+
+
+def _search_upstream(keyword: str, category: str, limit: int, query: ListingQuery):
+    """The search page request :func:`_search_payload` would send, or ``None`` when a catalog snapshot answers."""
+    kind, value = _catalog_feed_for(keyword, category)
+    if kind and _catalog_items(kind, value, 1):
+        return None
+    extra = _listing_extra(query) if query.active else None
+    return _search_page_request(keyword, category, extra)
+
+
+def _prefetch_searches(searches: Sequence[Tuple[Plan, SearchArgs]], timeout: float) -> Dict:
+    """Fetch the search pages of uncached ``searches`` in one event loop call (async engine only)."""
+    client = current_app.upstream
+    if not isinstance(client, AsyncUpstreamClient) or current_app.circuits.rejecting(_CIRCUIT_WEB):
+        return {}
+    reqs = []
+    for (endpoint, params, _), search in searches:
+        if has_entry(endpoint, params):
+            continue
+        req = _search_upstream(*search)
+        if req is not None:
+            reqs.append(req)
+    return client.prefetch(reqs, timeout) if reqs else {}
 
 
 @home_bp.get("/search")
+@rate_limit("search", "RATE_LIMIT_SEARCH")
 def mercari_search():
     """搜索商品 - 直接访问 Mercari 网站"""
-    encrypted_blob = request.args.get("t_s")
-    keyword = ""
-    category = ""
+    try:
+        plan = _search_request(request.args)
+    except ValueError as exc:
+        return jsonify({"items": [], "error": str(exc)}), 400
+    if plan is None:
+        return jsonify({"items": []})
+    return _cached_json(*plan)
 
-    if encrypted_blob:
-        try:
-            padded = encrypted_blob + "=" * (-len(encrypted_blob) % 4)
-            try:
-                enc_bytes = base64.urlsafe_b64decode(padded)
-            except Exception:
-                enc_bytes = base64.b64decode(padded)
-            decrypted = decrypt_payload(enc_bytes)
-            payload = json.loads(decrypted.decode("utf-8"))
-            keyword = (payload.get("keyword") or "").strip()
-            category = (payload.get("category") or "").strip()
-        except Exception as exc:
-            logger.warning("Failed to decrypt search payload: %s", exc)
-            return jsonify({"items": [], "error": "検索情報の復号に失敗しました"}), 400
-    else:
-        keyword = request.args.get("q", "").strip()
-        category = request.args.get("category", "").strip()
 
-    limit = min(int(request.args.get("limit", 24)), 60)
+@home_bp.post("/batch")
+def home_batch():
+    """Resolve several items/search queries in one round trip.
 
-    if not keyword and not category:
-        return jsonify({"items": []})
-    
+    Body: ``{"queries": [{"brand": "Chanel", "limit": 21}, {"keyword": "バッグ"}, ...], "deadlineMs": 2000}``;
+    each query takes the args of ``/items`` or ``/search``. Identical queries
+    are resolved once, all of them in parallel through the response cache
+    under one shared deadline. Every result is the JSON the single-query
+    endpoint would have returned, spliced in without re-encoding.
+    """
+    cfg = current_app.config
+    body = request.get_json(silent=True)
+    try:
+        queries = batch.parse_queries(body, cfg.get("BATCH_MAX_QUERIES", 20), cfg.get("BATCH_MAX_SEARCHES", 5))
+    except ValueError as exc:
+        return jsonify({"results": [], "error": str(exc)}), 400
+
+    slots = []  # per query: (status, body), or (-1, index of its task)
+    tasks: List[Callable] = []
+    task_of: Dict[str, int] = {}
+    searches: List[Tuple[Plan, SearchArgs]] = []
+    for args in queries:
+        search = None
+        try:
+            if args["type"] == "items":
+                plan = _items_request(args)
+            else:
+                search = _search_args(args)
+                plan = _search_plan(*search) if search is not None else None
+        except ValueError as exc:
+            slots.append((400, dumps({"items": [], "error": str(exc)})))
+            continue
+        if plan is None:
+            slots.append((200, b'{"items":[]}'))
+            continue
+        key = cache_key(plan[0], plan[1])
+        if key not in task_of:
+            task_of[key] = len(tasks)
+            tasks.append(lambda plan=plan: cached_payload(*plan))
+            if search is not None:
+                searches.append((plan, search))
+        slots.append((-1, task_of[key]))
+
+    # Every distinct search costs what a /search request would; items lookups are local reads.
+    # The bucket is only checked first, so a refusal by either limit charges neither.
+    traffic = getattr(current_app, "traffic", None)
+    wait = traffic.charge("home.mercari_search", len(searches), commit=False) if traffic is not None else 0.0
+    if wait:
+        return too_many_requests(min(wait, 60))
+    wait = charge_rate("search", "RATE_LIMIT_SEARCH", len(searches))
+    if wait is not None:
+        return too_many_requests(wait)
+    if traffic is not None:
+        traffic.charge("home.mercari_search", len(searches))
+
+    # With the async engine all uncached search pages are fetched together on
+    # its event loop first; the tasks below then only parse them.
+    timeout = batch.deadline(body, float(cfg.get("BATCH_DEADLINE_SECS", 3)))
+    started = time.monotonic()
+    prefetched = _prefetch_searches(searches, timeout) if searches else {}
+    with using_prefetched(prefetched):
+        outcomes = batch.run(current_app._get_current_object(), tasks, timeout - (time.monotonic() - started),
+                             cfg.get("BATCH_MAX_WORKERS", 16))
+    batch.record(len(queries), sum(1 for status, _ in slots if status == -1) - len(tasks), outcomes)
+
+    parts = []
+    for args, (status, data) in zip(queries, slots):
+        cache = None
+        if status == -1:
+            kind, result = outcomes[data]
+            if kind == "ok":
+                data, status, cache = result
+            elif kind == "timeout":
+                status, data = 504, dumps({"items": [], "error": "タイムアウトしました"})
+            else:
+                status, data = 500, dumps({"items": [], "error": "取得に失敗しました"})
+        head = dumps({"id": args["id"], "status": status, "cache": cache})
+        parts.append(head[:-1] + b',"data":' + data + b"}")
+    return Response(b'{"results":[' + b",".join(parts) + b"]}", mimetype="application/json")
+
+
+def _search_page_request(keyword: str, category: str, extra: Optional[Dict] = None):
+    """``(url, kind, params, headers)`` of the Mercari search page GET."""
     # 构建真实的 Mercari 搜索URL
     base = current_app.config["MERCARI_BASE"]
     search_url = f"{base}/search"
@@ -322,121 +630,287 @@ def mercari_search():
         params["keyword"] = keyword
     if category:
         params["category_id"] = category
-    
+    params.update(extra or {})
+
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        "Accept-Language": "ja-JP,ja;q=0.9,en-US;q=0.8,en;q=0.7",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+        "Referer": base,
+    }
+    return search_url, "search", params, headers
+
+
+def _scrape_search(keyword: str, category: str, limit: int, extra: Optional[Dict] = None) -> List[Item]:
+    base = current_app.config["MERCARI_BASE"]
+    search_url, kind, params, headers = _search_page_request(keyword, category, extra)
+
+    def fetch():
+        resp = current_app.upstream.get(search_url, kind=kind, params=params, headers=headers, stream=True)
+        try:
+            resp.raise_for_status()
+        except Exception:
+            resp.close()
+            raise
+        return resp
+
+    timer = StageTimer()
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Accept-Language": "ja-JP,ja;q=0.9,en-US;q=0.8,en;q=0.7",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Referer": base,
-        }
-        resp = requests.get(search_url, params=params, timeout=15, headers=headers)
-        resp.raise_for_status()
-        
-        # 解析HTML提取商品
-        soup = BeautifulSoup(resp.text, "html.parser")
+        with timer.stage("upstream"):
+            resp = current_app.circuits.call(_CIRCUIT_WEB, fetch)
+        try:
+            chunks = resp.iter_content(current_app.config.get("PROXY_CHUNK_SIZE", 64 * 1024))
+            # 快速路径：只读取到 __NEXT_DATA__ 结束为止，不解析整页
+            with timer.stage("body"):
+                next_data, html = read_next_data(chunks)
+
+            items = []
+            if next_data:
+                try:
+                    with timer.stage("json"):
+                        data_json = search_page.loads(next_data)
+                    with timer.stage("extract"):
+                        items = extract_products(data_json, base, limit)[:limit]
+                except Exception as e:
+                    logger.debug("Failed to parse __NEXT_DATA__: %s", e)
+
+            if not items:
+                with timer.stage("body_rest"):
+                    html += b"".join(chunks)
+                with timer.stage("dom"):
+                    items = _scrape_search_dom(html, base, limit)
+        finally:
+            resp.close()
+    finally:
+        timer.publish()
+    return items[:limit]
+
+
+def _scrape_search_dom(html: bytes, base: str, limit: int) -> List[Item]:
+    """DOM fallback for search pages without a usable __NEXT_DATA__ payload."""
+    soup = search_page.parse_dom(html)
+    items = []
+    for link in soup.select('a[href*="/item/"]'):
+        if len(items) >= limit:
+            break
+        img = link.select_one('img')
+        if not img:
+            continue
+
+        price_elem = link.find(string=re.compile(r'¥|円|\d+,?\d*'))
+        if not price_elem:
+            price_elem = link.select_one('[class*="price"]')
+            if price_elem:
+                price_elem = price_elem.get_text()
+
+        title = img.get('alt', '') or img.get('title', '') or link.get('aria-label', '')
+        href = link.get('href', '')
+        src = img.get('src', '') or img.get('data-src', '')
+
+        if title and href and src:
+            items.append(Item(
+                title=title,
+                price=parse_price(price_elem),
+                image=_to_proxy_path(base, src),
+                href=_to_proxy_path(base, href),
+            ))
+    return items
+
+
+def _listing_extra(query: ListingQuery) -> Dict:
+    """Search page params that make the live window match ``query``."""
+    # Let upstream apply the price range so the window is not spent on items we would drop.
+    extra = {}
+    if query.min_price is not None:
+        extra["price_min"] = query.min_price
+    if query.max_price is not None:
+        extra["price_max"] = query.max_price
+    if query.sort == "newest":
+        # Upstream defaults to best-match order; the window must already be newest first.
+        extra["sort"] = "created_time"
+        extra["order"] = "desc"
+    return extra
+
+
+def _search_listing(keyword: str, category: str, query: ListingQuery):
+    """Filtered/sorted/paged search: catalog snapshot, a wider live window, then the fallback dataset.
+
+    The live window is the first ``_LISTING_WINDOW`` upstream results, so its cursor stops there.
+    """
+    kind, value = _catalog_feed_for(keyword, category)
+    items = _catalog_items(kind, value, 0) if kind else None
+    if items:
+        return _listing_payload(query, items)
+    extra = _listing_extra(query)
+    key = flight_key("search", keyword, category, _LISTING_WINDOW, extra)
+    try:
+        items = as_items(singleflight.do(key, lambda: _scrape_search(keyword, category, _LISTING_WINDOW, extra)))
+    except Exception as exc:
+        logger.warning("Search listing failed upstream: %s", exc)
         items = []
-        
-        # 尝试从 __NEXT_DATA__ 提取
-        next_script = soup.find('script', id='__NEXT_DATA__')
-        if next_script and next_script.string:
-            try:
-                data_json = json.loads(next_script.string)
-                extracted = _extract_products_from_json(data_json, base, limit)
-                items.extend(extracted[:limit])
-            except Exception as e:
-                logger.debug("Failed to parse __NEXT_DATA__: %s", e)
-        
-        # 如果没有足够的商品，尝试DOM解析
-        if len(items) < limit:
-            for link in soup.select('a[href*="/item/"]'):
-                if len(items) >= limit:
-                    break
-                img = link.select_one('img')
-                if not img:
-                    continue
-                
-                price_elem = link.find(string=re.compile(r'¥|円|\d+,?\d*'))
-                if not price_elem:
-                    price_elem = link.select_one('[class*="price"]')
-                    if price_elem:
-                        price_elem = price_elem.get_text()
-                
-                title = img.get('alt', '') or img.get('title', '') or link.get('aria-label', '')
-                href = link.get('href', '')
-                src = img.get('src', '') or img.get('data-src', '')
-                
-                if title and href and src:
-                    price_text = str(price_elem) if price_elem else ''
-                    if price_text and not ('¥' in price_text or '円' in price_text):
-                        price_text = f"¥{price_text}"
-                    items.append({
-                        "title": title,
-                        "price": price_text,
-                        "image": _to_proxy_path(base, src),
-                        "link": _to_proxy_path(base, href),
-                    })
-                    if len(items) >= limit:
-                        break
-        
+    if items:
+        return _listing_payload(query, items)
+    if keyword:
+        return _listing_payload(query, _search_fallback_items(keyword))
+    return _items_listing("", query)
+
+
+def _search_payload(keyword: str, category: str, limit: int, query: Optional[ListingQuery] = None):
+    if query is not None and query.active:
+        return _search_listing(keyword, category, query)
+    kind, value = _catalog_feed_for(keyword, category)
+    items = _catalog_items(kind, value, limit) if kind else None
+    if items:
+        return {"items": items}, 200
+
+    try:
+        key = flight_key("search", keyword, category, limit)
+        try:
+            items = as_items(singleflight.do(key, lambda: _scrape_search(keyword, category, limit)))
+        except CircuitOpenError:
+            items = []
+
         if len(items) < limit:
-            fallback_items = _load_fallback_items(None)
-            if fallback_items:
-                filtered = fallback_items
-                if keyword:
-                    lowered_kw = keyword.lower()
-                    filtered = [item for item in filtered if lowered_kw in (item.get("title", "") or "").lower()]
-                if category:
-                    pass
-                if filtered:
-                    return jsonify({"items": filtered[:limit]})
-
-        return jsonify({"items": items[:limit] if items else []})
+            if keyword:
+                filtered = _search_fallback_items(keyword, limit)
+            else:
+                filtered = _load_fallback_items(limit)
+            if filtered:
+                return {"items": filtered[:limit]}, 200
+
+        return {"items": items[:limit] if items else []}, 200
     
     except Exception as e:
         logger.error("Search failed: %s", e)
-        return jsonify({"items": [], "error": "検索に失敗しました"})
+        return {"items": [], "error": "検索に失敗しました"}, 200
+
+
+# Request headers relayed upstream so browsers can revalidate and resume assets.
+_PROXY_FORWARD_HEADERS = ("Range", "If-Range", "If-None-Match", "If-Modified-Since")
+_HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade",
+}
+_PROXY_DROPPED_HEADERS = {"x-frame-options", "content-security-policy", "content-type"} | _HOP_BY_HOP_HEADERS
+
+
+def _proxy_accept_encoding(client_value: str) -> str:
+    """Only ask for encodings both the client and ``requests`` understand."""
+    accepted = [enc for enc in ("gzip", "deflate") if enc in client_value.lower()]
+    return ", ".join(accepted) or "identity"
 
 
 @home_bp.get("/proxy")
+@rate_limit("proxy", "RATE_LIMIT_PROXY")
 def mercari_proxy():
     raw_path = request.args.get("path", "/")
     path = _normalize_path(raw_path)
     base = current_app.config["MERCARI_BASE"]
     url = urljoin(base, path)
+    cache = current_app.asset_cache
+    accept_encoding = request.headers.get("Accept-Encoding", "")
+
+    entry = cache.lookup(url) if cache is not None else None
+    # A client that cannot take the stored encoding is proxied without replacing it.
+    keep_stored = entry is not None and not cache.accepts(entry, accept_encoding)
+    if keep_stored:
+        entry = None
+    if entry is not None and entry.fresh:
+        return cache.serve(entry)
+
+    breaker = current_app.circuits.get(_CIRCUIT_WEB)
+    if breaker is not None and not breaker.allow():
+        if entry is not None:
+            return cache.serve(entry, "STALE")
+        return jsonify({"error": "外部サービスが一時的に利用できません"}), 503, {"Retry-After": str(int(breaker.cooldown))}
     try:
         fwd_headers = {
             "User-Agent": request.headers.get("User-Agent", "Mozilla/5.0 (compatible; JP-Site/1.0)"),
             "Accept-Language": request.headers.get("Accept-Language", "ja-JP,ja;q=0.9"),
             "Accept": request.headers.get("Accept", "*/*"),
+            "Accept-Encoding": _proxy_accept_encoding(accept_encoding),
         }
-        resp = requests.get(url, timeout=12, headers=fwd_headers)
+        if entry is not None:
+            # Revalidate the stale cached copy with the upstream validators, not the client's.
+            if entry.etag:
+                fwd_headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                fwd_headers["If-Modified-Since"] = entry.last_modified
+        else:
+            for name in _PROXY_FORWARD_HEADERS:
+                if name in request.headers:
+                    fwd_headers[name] = request.headers[name]
+        try:
+            resp = current_app.upstream.get(url, kind="proxy", headers=fwd_headers, stream=True)
+        except requests.RequestException:
+            if breaker is not None:
+                breaker.record_failure()
+            if entry is not None:
+                return cache.serve(entry, "STALE")
+            raise
+        if breaker is not None:
+            if resp.status_code >= 500 or resp.status_code in (403, 429):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        if entry is not None and resp.status_code == 304:
+            resp.close()
+            return cache.serve(cache.refresh(entry, resp.headers), "REVALIDATED")
         content_type = resp.headers.get("Content-Type", "application/octet-stream")
+        storable = cache is not None and not keep_stored and resp.status_code == 200 and "Range" not in fwd_headers
 
         safe_headers = {}
         for k, v in resp.headers.items():
-            lk = k.lower()
-            if lk in ("x-frame-options", "content-security-policy"):
-                continue
-            if lk == "content-type":
+            if k.lower() in _PROXY_DROPPED_HEADERS:
                 continue
             safe_headers[k] = v
-
-        if "text/html" in content_type.lower():
+        if cache is not None:
+            safe_headers["X-Cache"] = "MISS"
+
+        lowered_type = content_type.lower()
+        if "text/html" in lowered_type or "text/css" in lowered_type:
+            # Rewritten documents are decoded and re-encoded, so the upstream length/encoding no longer apply.
+            for k in list(safe_headers):
+                if k.lower() in ("content-length", "content-encoding"):
+                    del safe_headers[k]
+            charset = resp.encoding if "charset" in lowered_type else "utf-8"
+            if "text/html" in lowered_type:
+                chunk_size = current_app.config.get("PROXY_CHUNK_SIZE", 64 * 1024)
+
+                def generate_html():
+                    try:
+                        yield from rewrite_html_stream(resp.iter_content(chunk_size), base, charset or "utf-8")
+                    finally:
+                        resp.close()
+
+                return Response(generate_html(), status=resp.status_code,
+                                headers={"Content-Type": "text/html; charset=utf-8", **safe_headers})
             try:
-                text = resp.text
-                text = _rewrite_html(text, base)
-                return (text.encode(resp.encoding or "utf-8"), resp.status_code, {"Content-Type": "text/html; charset=utf-8", **safe_headers})
+                text = _rewrite_css(resp.content.decode(charset or "utf-8", errors="replace"), base)
+                body = text.encode("utf-8")
+                if storable:
+                    store_headers = Headers(safe_headers)
+                    store_headers["Content-Type"] = "text/css; charset=utf-8"
+                    cache.put_bytes(url, body, store_headers)
+                return (body, resp.status_code, {"Content-Type": "text/css; charset=utf-8", **safe_headers})
             except Exception:
-                pass
-        if "text/css" in content_type.lower():
+                return (resp.content, resp.status_code, {"Content-Type": content_type, **safe_headers})
+            finally:
+                resp.close()
+
+        chunk_size = current_app.config.get("PROXY_CHUNK_SIZE", 64 * 1024)
+        body = iter_raw(resp, chunk_size)
+        if storable:
+            body = cache.tee(url, resp.headers, body)
+
+        def generate():
             try:
-                text = resp.text
-                text = _rewrite_css(text, base)
-                return (text.encode(resp.encoding or "utf-8"), resp.status_code, {"Content-Type": "text/css; charset=utf-8", **safe_headers})
-            except Exception:
-                pass
+                for chunk in body:
+                    yield chunk
+            finally:
+                resp.close()
 
-        return (resp.content, resp.status_code, {"Content-Type": content_type, **safe_headers})
+        return Response(generate(), status=resp.status_code, headers={"Content-Type": content_type, **safe_headers},
+                        direct_passthrough=True)
     except requests.RequestException:
-        return jsonify({"error": "外部サービスに接続できません"}), 502 
\ No newline at end of file
+        return jsonify({"error": "外部サービスに接続できません"}), 502
@@ -0,0 +1,325 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Mapping, Optional
+
+from flask import send_file
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    content_type TEXT NOT NULL,
+    content_encoding TEXT NOT NULL DEFAULT '',
+    etag TEXT NOT NULL DEFAULT '',
+    last_modified TEXT NOT NULL DEFAULT '',
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assets_lru ON assets (last_access);
+CREATE INDEX IF NOT EXISTS assets_digest ON assets (digest);
+"""
+
+_COLUMNS = ("url", "digest", "size", "content_type", "content_encoding", "etag", "last_modified", "expires_at",
+            "last_access")
+
+# Refresh last_access at most this often per entry to keep hits read-only.
+_TOUCH_INTERVAL_SECS = 60
+
+# Content types that get ``default_ttl`` when upstream sends no freshness and no Last-Modified.
+_STATIC_TYPES = ("image/", "font/", "audio/", "video/", "text/css", "javascript", "application/wasm",
+                 "application/font-", "application/vnd.ms-fontobject")
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+
+class AssetEntry:
+    __slots__ = _COLUMNS
+
+    def __init__(self, row: Iterable):
+        for name, value in zip(_COLUMNS, row):
+            setattr(self, name, value)
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at > time.time()
+
+
+class AssetCache:
+    """Content-addressed on-disk cache for proxied static assets.
+
+    Bodies are stored once per SHA-256 digest under ``blobs/`` and served with
+    ``send_file`` (sendfile/``wsgi.file_wrapper`` where the server supports
+    it) using the digest as a strong ETag, so browsers get ``304 Not Modified``
+    and range requests for free. A SQLite index maps URL -> digest together
+    with the upstream validators and freshness lifetime, and is shared by all
+    workers on the host. Total size is capped with LRU eviction.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 512 * 1024 * 1024, max_object_bytes: int = 16 * 1024 * 1024,
+                 default_ttl: int = 3600):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.max_object_bytes = int(max_object_bytes)
+        self.default_ttl = int(default_ttl)
+        self._blob_dir = os.path.join(root, "blobs")
+        self._tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self._blob_dir, exist_ok=True)
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        self._db_path = os.path.join(root, "index.sqlite3")
+        self._local = threading.local()
+        self._evict_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stored = 0
+        self.evicted = 0
+        with self._db() as conn:
+            conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_config(cls, config) -> Optional["AssetCache"]:
+        if not config.get("ASSET_CACHE_ENABLED", True):
+            return None
+        try:
+            return cls(
+                config["ASSET_CACHE_DIR"],
+                max_bytes=config.get("ASSET_CACHE_MAX_BYTES", 512 * 1024 * 1024),
+                max_object_bytes=config.get("ASSET_CACHE_MAX_OBJECT_BYTES", 16 * 1024 * 1024),
+                default_ttl=config.get("ASSET_CACHE_DEFAULT_TTL", 3600),
+            )
+        except (OSError, sqlite3.Error) as exc:
+            logger.warning("Asset cache disabled, cannot use %s: %s", config.get("ASSET_CACHE_DIR"), exc)
+            return None
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self._blob_dir, digest[:2], digest)
+
+    def lookup(self, url: str) -> Optional[AssetEntry]:
+        try:
+            row = self._db().execute(f"SELECT {', '.join(_COLUMNS)} FROM assets WHERE url = ?", (url,)).fetchone()
+        except sqlite3.Error as exc:
+            logger.warning("Asset cache lookup failed: %s", exc)
+            return None
+        if row is None:
+            self.misses += 1
+            return None
+        entry = AssetEntry(row)
+        if not os.path.exists(self.blob_path(entry.digest)):
+            self._delete_url(url)
+            self.misses += 1
+            return None
+        return entry
+
+    def accepts(self, entry: AssetEntry, accept_encoding: str) -> bool:
+        """Whether a client with ``accept_encoding`` can take the stored representation."""
+        return not entry.content_encoding or entry.content_encoding.lower() in accept_encoding.lower()
+
+    def serve(self, entry: AssetEntry, cache_status: str = "HIT"):
+        self.hits += 1
+        now = time.time()
+        if now - entry.last_access > _TOUCH_INTERVAL_SECS:
+            try:
+                self._db().execute("UPDATE assets SET last_access = ? WHERE url = ?", (now, entry.url))
+            except sqlite3.Error:
+                pass
+        max_age = max(0, int(entry.expires_at - now))
+        resp = send_file(self.blob_path(entry.digest), mimetype=entry.content_type, etag=entry.digest,
+                         conditional=True, max_age=max_age)
+        if entry.content_encoding:
+            resp.headers["Content-Encoding"] = entry.content_encoding
+            resp.headers["Vary"] = "Accept-Encoding"
+        resp.headers["X-Cache"] = cache_status
+        return resp
+
+    def expiry_for(self, headers: Mapping[str, str], content_type: str = "",
+                   last_modified: str = "") -> Optional[float]:
+        """Return the absolute expiry for a response, or ``None`` if it must not be stored.
+
+        Responses that vary on anything but ``Accept-Encoding`` are not stored.
+        Without explicit freshness, ``default_ttl`` only applies to static asset
+        types or responses carrying ``Last-Modified``.
+        """
+        cc = _parse_cache_control(headers.get("Cache-Control", ""))
+        if "no-store" in cc or "private" in cc:
+            return None
+        vary = {v.strip().lower() for v in headers.get("Vary", "").split(",") if v.strip()}
+        if vary - {"accept-encoding"}:
+            return None
+        now = time.time()
+        if "no-cache" in cc:
+            return now
+        for name in ("s-maxage", "max-age"):
+            if cc.get(name):
+                try:
+                    return now + int(cc[name])
+                except ValueError:
+                    pass
+        content_type = (headers.get("Content-Type") or content_type).lower()
+        if (headers.get("Last-Modified") or last_modified) or any(t in content_type for t in _STATIC_TYPES):
+            return now + self.default_ttl
+        return None
+
+    def refresh(self, entry: AssetEntry, headers: Mapping[str, str]) -> AssetEntry:
+        """Extend an entry after upstream answered ``304 Not Modified``."""
+        # A validator that turned no-store still answers this request; it just never stays fresh.
+        entry.expires_at = self.expiry_for(headers, entry.content_type, entry.last_modified) or time.time()
+        entry.etag = headers.get("ETag", entry.etag)
+        entry.last_modified = headers.get("Last-Modified", entry.last_modified)
+        try:
+            self._db().execute("UPDATE assets SET expires_at = ?, etag = ?, last_modified = ? WHERE url = ?",
+                               (entry.expires_at, entry.etag, entry.last_modified, entry.url))
+        except sqlite3.Error:
+            pass
+        self.revalidated += 1
+        return entry
+
+    def tee(self, url: str, headers: Mapping[str, str], chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Relay ``chunks`` while writing them to the cache; commit once the body completed.
+
+        Bodies that are not cacheable, exceed ``max_object_bytes`` or are cut
+        short (client disconnect, upstream error) are discarded.
+        """
+        expires_at = self.expiry_for(headers)
+        declared = headers.get("Content-Length")
+        if expires_at is None or (declared and declared.isdigit() and int(declared) > self.max_object_bytes):
+            yield from chunks
+            return
+
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        hasher = hashlib.sha256()
+        size = 0
+        oversized = False
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                for chunk in chunks:
+                    if not oversized:
+                        size += len(chunk)
+                        oversized = size > self.max_object_bytes
+                        if not oversized:
+                            fp.write(chunk)
+                            hasher.update(chunk)
+                    yield chunk
+            if not oversized:
+                self._commit(url, tmp_path, hasher.hexdigest(), size, headers, expires_at)
+        finally:
+            # Left behind when the body was cut short, too large, or already stored.
+            if os.path.exists(tmp_path):
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+    def put_bytes(self, url: str, data: bytes, headers: Mapping[str, str]) -> None:
+        """Store an already materialized body (e.g. rewritten CSS)."""
+        for _ in self.tee(url, headers, [data]):
+            pass
+
+    def _commit(self, url: str, tmp_path: str, digest: str, size: int, headers: Mapping[str, str],
+                expires_at: float) -> None:
+        blob = self.blob_path(digest)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.replace(tmp_path, blob)
+        row = (
+            url,
+            digest,
+            size,
+            headers.get("Content-Type", "application/octet-stream"),
+            headers.get("Content-Encoding", ""),
+            headers.get("ETag", ""),
+            headers.get("Last-Modified", ""),
+            expires_at,
+            time.time(),
+        )
+        try:
+            self._db().execute(f"INSERT OR REPLACE INTO assets ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", row)
+        except sqlite3.Error as exc:
+            logger.warning("Asset cache insert failed: %s", exc)
+            return
+        self.stored += 1
+        self._evict()
+
+    def _delete_url(self, url: str) -> None:
+        try:
+            conn = self._db()
+            row = conn.execute("SELECT digest FROM assets WHERE url = ?", (url,)).fetchone()
+            conn.execute("DELETE FROM assets WHERE url = ?", (url,))
+            if row:
+                self._drop_blob_if_unused(row[0])
+        except sqlite3.Error:
+            pass
+
+    def _drop_blob_if_unused(self, digest: str) -> bool:
+        if self._db().execute("SELECT 1 FROM assets WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return False
+        try:
+            os.unlink(self.blob_path(digest))
+        except FileNotFoundError:
+            pass
+        return True
+
+    def total_bytes(self) -> int:
+        row = self._db().execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM assets)").fetchone()
+        return int(row[0])
+
+    def _evict(self) -> None:
+        """Drop least recently used URLs until the store is back under 90% of its cap."""
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            total = self.total_bytes()
+            if total <= self.max_bytes:
+                return
+            target = int(self.max_bytes * 0.9)
+            conn = self._db()
+            rows = conn.execute("SELECT url, digest, size FROM assets ORDER BY last_access ASC").fetchall()
+            for url, digest, size in rows:
+                if total <= target:
+                    break
+                conn.execute("DELETE FROM assets WHERE url = ?", (url,))
+                self.evicted += 1
+                if self._drop_blob_if_unused(digest):
+                    total -= size
+        except sqlite3.Error as exc:
+            logger.warning("Asset cache eviction failed: %s", exc)
+        finally:
+            self._evict_lock.release()
+
+    def stats(self) -> Dict[str, int]:
+        try:
+            total = self.total_bytes()
+        except sqlite3.Error:
+            total = -1
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "stored": self.stored,
+            "evicted": self.evicted,
+            "bytes": total,
+            "maxBytes": self.max_bytes,
+        }
@@ -0,0 +1,107 @@
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Keys copied from a batch query into the args of the single-query endpoints.
+_QUERY_KEYS = ("brand", "keyword", "category", "t_s", "limit", "min_price", "max_price", "sort", "order", "cursor")
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+_STATS_LOCK = threading.Lock()
+_STATS = {"batches": 0, "queries": 0, "deduplicated": 0, "timeouts": 0, "errors": 0}
+
+Outcome = Tuple[str, Any]  # ("ok", result) | ("error", exception) | ("timeout", None)
+
+
+def _executor(max_workers: int) -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch")
+    return _EXECUTOR
+
+
+def parse_queries(body: Any, max_queries: int, max_searches: int) -> List[Dict[str, str]]:
+    """Validate ``{"queries": [...]}`` and return one string-valued args dict per query.
+
+    A query with ``keyword``, ``category`` or ``t_s`` is a search, anything
+    else an items lookup (``brand`` optional); at most ``max_searches`` may be
+    searches. ``id`` is echoed back and defaults to the query's position.
+    """
+    queries = body.get("queries") if isinstance(body, dict) else None
+    if not isinstance(queries, list) or not queries:
+        raise ValueError("queries must be a non-empty list")
+    if len(queries) > max_queries:
+        raise ValueError(f"at most {max_queries} queries per batch")
+    out = []
+    for pos, query in enumerate(queries):
+        if not isinstance(query, dict):
+            raise ValueError(f"query {pos} must be an object")
+        args = {key: str(query[key]) for key in _QUERY_KEYS if query.get(key) is not None}
+        if "keyword" in args:
+            args["q"] = args.pop("keyword")
+        args["id"] = str(query.get("id", pos))
+        args["type"] = "search" if {"q", "category", "t_s"} & args.keys() else "items"
+        out.append(args)
+    if sum(1 for args in out if args["type"] == "search") > max_searches:
+        raise ValueError(f"at most {max_searches} search queries per batch")
+    return out
+
+
+def run(app, tasks: Sequence[Callable[[], Any]], timeout: float, max_workers: int = 16) -> List[Outcome]:
+    """Run ``tasks`` concurrently, each inside an app context, under one shared deadline.
+
+    Returns one outcome per task, in order. Tasks still queued at the
+    deadline are cancelled; running ones are left to finish in the
+    background (their results still land in the response cache) and are
+    reported as ``timeout``. Tasks see the caller's context variables, so
+    responses prefetched with ``async_upstream.using_prefetched`` reach them.
+    """
+    pool = _executor(max_workers)
+
+    def call(fn: Callable[[], Any]) -> Any:
+        with app.app_context():
+            return fn()
+
+    futures = [pool.submit(contextvars.copy_context().run, call, fn) for fn in tasks]
+    done, pending = wait(futures, timeout=max(0.0, timeout))
+    for fut in pending:
+        fut.cancel()
+    outcomes: List[Outcome] = []
+    for fut in futures:
+        if fut not in done:
+            outcomes.append(("timeout", None))
+        elif fut.exception() is not None:
+            logger.warning("Batch query failed: %s", fut.exception())
+            outcomes.append(("error", fut.exception()))
+        else:
+            outcomes.append(("ok", fut.result()))
+    return outcomes
+
+
+def record(queries: int, deduplicated: int, outcomes: Sequence[Outcome]) -> None:
+    with _STATS_LOCK:
+        _STATS["batches"] += 1
+        _STATS["queries"] += queries
+        _STATS["deduplicated"] += deduplicated
+        _STATS["timeouts"] += sum(1 for kind, _ in outcomes if kind == "timeout")
+        _STATS["errors"] += sum(1 for kind, _ in outcomes if kind == "error")
+
+
+def deadline(body: Any, default: float) -> float:
+    """Seconds until the shared deadline: ``deadlineMs`` from the body, capped at ``default``."""
+    try:
+        requested = float(body.get("deadlineMs")) / 1000
+    except (AttributeError, TypeError, ValueError):
+        return default
+    return min(max(requested, 0.0), default)
+
+
+def stats() -> Dict[str, int]:
+    with _STATS_LOCK:
+        return dict(_STATS)
@@ -0,0 +1,241 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .item import Item, as_items, dumps
+
+logger = logging.getLogger(__name__)
+
+FEED_KINDS = ("default", "brand", "category", "keyword")
+
+_DATA_PREFIX = "home:catalog:data:"
+_LOCK_PREFIX = "home:catalog:lock:"
+_STATUS_KEY = "home:catalog:status"
+
+Fetch = Callable[[str, str, int], List[Item]]
+
+
+def feed_key(kind: str, value: str = "") -> str:
+    return f"{kind}:{value}" if value else kind
+
+
+def parse_feeds(spec: str) -> List[Tuple[str, str]]:
+    """Parse ``"default,brand:chanel,category:1,keyword:バッグ"`` into ``(kind, value)`` pairs."""
+    feeds = []
+    for part in (spec or "").split(","):
+        kind, _, value = part.strip().partition(":")
+        kind = kind.strip().lower()
+        if kind not in FEED_KINDS or (kind != "default" and not value.strip()):
+            if part.strip():
+                logger.warning("Ignoring catalog feed %r", part)
+            continue
+        pair = (kind, value.strip())
+        if pair not in feeds:
+            feeds.append(pair)
+    return feeds
+
+
+def normalize_items(items: List[Item]) -> List[Item]:
+    """Keep complete items (title, link and image), deduplicated by link."""
+    seen = set()
+    out = []
+    for item in as_items(items):
+        if not item.complete or item.href in seen:
+            continue
+        seen.add(item.href)
+        out.append(item)
+    return out
+
+
+class CatalogRefresher:
+    """Background worker that keeps configured feeds pre-fetched.
+
+    Every feed is refreshed about every ``interval`` seconds (randomised by
+    ``±jitter`` so feeds and workers spread out), at most ``concurrency`` at
+    a time. A Redis NX lock per feed makes sure only one worker process
+    fetches a feed per cycle. The normalized snapshot and its status are
+    swapped in with one MULTI/EXEC, so readers see either the old or the new
+    list, never a partial one; a failed or empty refresh keeps serving the
+    previous snapshot until ``ttl`` expires. Without Redis everything is kept
+    per process.
+    """
+
+    def __init__(self, app, fetch: Fetch, feeds: List[Tuple[str, str]], interval: float = 600,
+                 jitter: float = 0.2, concurrency: int = 4, limit: int = 60, ttl: int = 3600,
+                 normalize: Optional[Callable[[str, str], str]] = None):
+        self.app = app
+        self.fetch = fetch
+        self.normalize = normalize or (lambda kind, value: value)
+        feeds = [(kind, self.normalize(kind, value)) for kind, value in feeds]
+        self.feeds = {feed_key(kind, value): (kind, value) for kind, value in feeds}
+        self.interval = float(interval)
+        self.jitter = min(max(float(jitter), 0.0), 0.9)
+        self.concurrency = max(1, int(concurrency))
+        self.limit = int(limit)
+        self.ttl = int(ttl)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._in_flight = set()
+        # Stagger the first round over the jitter window instead of fetching everything at boot.
+        self._next_due = {key: time.time() + random.uniform(0, self.interval * self.jitter) for key in self.feeds}
+        self._local_data: Dict[str, Tuple[List[Item], float]] = {}
+        self._local_status: Dict[str, Dict] = {}
+
+    @classmethod
+    def from_app(cls, app, fetch: Fetch, normalize: Optional[Callable[[str, str], str]] = None
+                 ) -> Optional["CatalogRefresher"]:
+        cfg = app.config
+        if not cfg.get("CATALOG_REFRESH_ENABLED", False):
+            return None
+        feeds = parse_feeds(cfg.get("CATALOG_REFRESH_FEEDS", "default"))
+        if not feeds:
+            return None
+        return cls(
+            app,
+            fetch,
+            feeds,
+            interval=cfg.get("CATALOG_REFRESH_INTERVAL", 600),
+            jitter=cfg.get("CATALOG_REFRESH_JITTER", 0.2),
+            concurrency=cfg.get("CATALOG_REFRESH_CONCURRENCY", 4),
+            limit=cfg.get("CATALOG_REFRESH_LIMIT", 60),
+            ttl=cfg.get("CATALOG_REFRESH_TTL", 3600),
+            normalize=normalize,
+        )
+
+    def _redis(self):
+        return getattr(self.app, "redis", None)
+
+    def ensure_started(self) -> None:
+        """Start the scheduler thread once per process (called lazily, so it survives forking servers)."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="catalog")
+            self._thread = threading.Thread(target=self._run, name="catalog-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            now = time.time()
+            with self._lock:
+                due = [key for key, at in self._next_due.items() if at <= now and key not in self._in_flight]
+                self._in_flight.update(due)
+            for key in due:
+                self._pool.submit(self._refresh_safe, key)
+            wait = min(self._next_due.values()) - time.time() if self._next_due else self.interval
+            self._stop.wait(min(max(wait, 1.0), 60.0))
+
+    def _schedule_next(self, key: str) -> None:
+        delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        with self._lock:
+            self._next_due[key] = time.time() + delay
+            self._in_flight.discard(key)
+
+    def _refresh_safe(self, key: str) -> None:
+        try:
+            with self.app.app_context():
+                self.refresh(key)
+        except Exception as exc:
+            logger.warning("Catalog refresh of %s failed: %s", key, exc)
+        finally:
+            self._schedule_next(key)
+
+    def _acquire(self, key: str) -> bool:
+        try:
+            ttl = max(1, int(self.interval * (1 - self.jitter) * 0.9))
+            return bool(self._redis().set(f"{_LOCK_PREFIX}{key}", "1", nx=True, ex=ttl))
+        except Exception:
+            return True
+
+    def refresh(self, key: str) -> bool:
+        """Fetch one feed now and swap it in; returns whether a new snapshot was stored."""
+        kind, value = self.feeds[key]
+        if not self._acquire(key):
+            return False
+        started = time.time()
+        status = dict(self._read_status(key) or {"feed": key, "kind": kind, "value": value})
+        status["lastAttemptAt"] = started
+        try:
+            items = normalize_items(self.fetch(kind, value, self.limit))
+            error = None if items else "empty result"
+        except Exception as exc:
+            items, error = [], f"{type(exc).__name__}: {exc}"
+        status["durationMs"] = round((time.time() - started) * 1000, 1)
+        status["lastError"] = error
+        if error is None:
+            status.update(refreshedAt=started, items=len(items))
+            self._swap(key, items, status)
+            return True
+        logger.info("Catalog feed %s not refreshed: %s", key, error)
+        self._write_status(key, status)
+        return False
+
+    def _swap(self, key: str, items: List[Item], status: Dict) -> None:
+        payload = dumps({"items": items, "refreshedAt": status["refreshedAt"]})
+        try:
+            pipe = self._redis().pipeline(transaction=True)
+            pipe.set(f"{_DATA_PREFIX}{key}", payload, ex=self.ttl)
+            pipe.hset(_STATUS_KEY, key, json.dumps(status, ensure_ascii=False))
+            pipe.execute()
+        except Exception:
+            with self._lock:
+                self._local_data[key] = (items, time.time() + self.ttl)
+                self._local_status[key] = status
+
+    def _read_status(self, key: str) -> Optional[Dict]:
+        try:
+            raw = self._redis().hget(_STATUS_KEY, key)
+            return json.loads(raw) if raw else None
+        except Exception:
+            return self._local_status.get(key)
+
+    def _write_status(self, key: str, status: Dict) -> None:
+        try:
+            self._redis().hset(_STATUS_KEY, key, json.dumps(status, ensure_ascii=False))
+        except Exception:
+            with self._lock:
+                self._local_status[key] = status
+
+    def lookup(self, kind: str, value: str = "", limit: Optional[int] = None) -> Optional[List[Item]]:
+        """Return the pre-fetched items of a configured feed, or ``None`` if there is no live snapshot."""
+        key = feed_key(kind, self.normalize(kind, value))
+        if key not in self.feeds:
+            return None
+        try:
+            raw = self._redis().get(f"{_DATA_PREFIX}{key}")
+            items = as_items(json.loads(raw)["items"]) if raw else None
+        except Exception:
+            cached = self._local_data.get(key)
+            items = cached[0] if cached and cached[1] > time.time() else None
+        if not items:
+            return None
+        return items[:limit] if limit else items
+
+    def status(self) -> Dict[str, Dict]:
+        try:
+            raw = self._redis().hgetall(_STATUS_KEY) or {}
+            shared = {k: json.loads(v) for k, v in raw.items()}
+        except Exception:
+            shared = dict(self._local_status)
+        out = {}
+        with self._lock:
+            for key, (kind, value) in self.feeds.items():
+                entry = {"kind": kind, "value": value, "refreshedAt": None, "items": 0, "lastError": None}
+                entry.update(shared.get(key) or {})
+                entry["nextDueAt"] = self._next_due.get(key)
+                entry["inFlight"] = key in self._in_flight
+                out[key] = entry
+        return out
@@ -0,0 +1,255 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib decoder
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = ".mcat"
+MAGIC = b"MCAT"
+VERSION = 1
+
+# magic, version, reserved, count, source size, source mtime_ns, layouts offset, strings offset
+_HEADER = struct.Struct("<4sHHIQqQQ")
+# price, id (offset, length), title (offset, length), rest (offset, length), layout, reserved
+_RECORD = struct.Struct("<qIIIIIIHH")
+_NO_PRICE = -(2 ** 63)
+
+
+def _loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def compiled_path(path) -> Path:
+    """``brands/chanel.json`` -> ``brands/chanel.mcat``."""
+    return Path(path).with_suffix(SUFFIX)
+
+
+def _source_stamp(path) -> Tuple[int, int]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return 0, 0
+    return st.st_size, st.st_mtime_ns
+
+
+def _file_mode() -> int:
+    """Mode a plain ``open()`` would create files with (``mkstemp`` always uses 0600)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def _is_price(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and _NO_PRICE < value < 2 ** 63
+
+
+class _StringTable:
+    """UTF-8 heap; identical strings are stored once."""
+
+    def __init__(self):
+        self.buf = bytearray()
+        self._seen: Dict[bytes, int] = {}
+
+    def add(self, data: bytes) -> Tuple[int, int]:
+        if not data:
+            return 0, 0
+        off = self._seen.get(data)
+        if off is None:
+            off = self._seen[data] = len(self.buf)
+            self.buf += data
+        return off, len(data)
+
+
+def compile_items(items: Iterable[Dict], out_path, source_stamp: Tuple[int, int] = (0, 0)) -> int:
+    """Write ``items`` as a compiled catalog to ``out_path`` and return the record count.
+
+    ``id``/``title`` strings and integer ``price`` values become fixed-width
+    columns; every other key is kept as compact JSON in the string table.
+    The original key order of each item is recorded as a layout so
+    materialized dicts serialize exactly like the source. The file is written
+    to a temporary name and renamed into place, so processes that still map
+    the old file keep reading a consistent snapshot.
+    """
+    strings = _StringTable()
+    layouts: Dict[Tuple[str, ...], int] = {}
+    records = bytearray()
+    count = 0
+    for item in items:
+        if not item or not isinstance(item, dict):
+            continue
+        layout = layouts.setdefault(tuple(item), len(layouts))
+        rest = dict(item)
+        id_ref = title_ref = (0, 0)
+        price = _NO_PRICE
+        if isinstance(rest.get("id"), str):
+            id_ref = strings.add(rest.pop("id").encode("utf-8"))
+        if isinstance(rest.get("title"), str):
+            title_ref = strings.add(rest.pop("title").encode("utf-8"))
+        if _is_price(rest.get("price")):
+            price = rest.pop("price")
+        rest_ref = strings.add(json.dumps(rest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                               if rest else b"")
+        records += _RECORD.pack(price, *id_ref, *title_ref, *rest_ref, layout, 0)
+        count += 1
+    if len(layouts) > 0xFFFF:
+        raise ValueError("too many distinct item layouts")
+
+    layout_blob = json.dumps([list(keys) for keys in layouts], ensure_ascii=False).encode("utf-8")
+    layouts_offset = _HEADER.size + len(records)
+    strings_offset = layouts_offset + len(layout_blob)
+    header = _HEADER.pack(MAGIC, VERSION, 0, count, source_stamp[0], source_stamp[1], layouts_offset,
+                          strings_offset)
+
+    out_path = Path(out_path)
+    fd, tmp = tempfile.mkstemp(prefix=out_path.name + ".", suffix=".tmp", dir=out_path.parent)
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(header)
+            fp.write(records)
+            fp.write(layout_blob)
+            fp.write(strings.buf)
+        os.chmod(tmp, _file_mode())
+        os.replace(tmp, out_path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return count
+
+
+def compile_file(source, out_path=None) -> Tuple[Path, int]:
+    """Compile the JSON dataset at ``source`` (a list of item dicts)."""
+    source = Path(source)
+    out_path = Path(out_path) if out_path else compiled_path(source)
+    stamp = _source_stamp(source)
+    with open(source, "rb") as fp:
+        data = _loads(fp.read())
+    if not isinstance(data, list):
+        data = []
+    return out_path, compile_items(data, out_path, stamp)
+
+
+class CompiledCatalog(Sequence):
+    """Read-only item list backed by a memory-mapped compiled catalog.
+
+    The file is mapped once per process; its pages live in the OS page cache
+    and are shared by every worker mapping the same file. Items are only
+    turned into dicts when indexed (slices return lists), and each access
+    returns a fresh dict, passed through ``factory`` when one is given.
+    :meth:`titles`/:meth:`prices` read the fixed-width columns without
+    materializing items.
+    """
+
+    def __init__(self, path, factory: Optional[Callable[[Dict], Any]] = None):
+        self.path = os.fspath(path)
+        self.factory = factory
+        with open(self.path, "rb") as fp:
+            self._mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, count, size, mtime_ns, layouts_offset, strings_offset = \
+                _HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{self.path} is not a version {VERSION} compiled catalog")
+            if strings_offset > len(self._mm) or layouts_offset != _HEADER.size + count * _RECORD.size:
+                raise ValueError(f"{self.path} is truncated")
+        except Exception:
+            self._mm.close()
+            raise
+        self._count = count
+        self.source_stamp = (size, mtime_ns)
+        self._strings = strings_offset
+        self._layouts: List[Tuple[str, ...]] = [tuple(keys) for keys in
+                                                _loads(self._mm[layouts_offset:strings_offset])]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _record(self, index: int) -> tuple:
+        return _RECORD.unpack_from(self._mm, _HEADER.size + index * _RECORD.size)
+
+    def _str(self, off: int, length: int) -> str:
+        start = self._strings + off
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _materialize(self, index: int) -> Any:
+        price, id_off, id_len, title_off, title_len, rest_off, rest_len, layout, _ = self._record(index)
+        rest = _loads(self._mm[self._strings + rest_off:self._strings + rest_off + rest_len]) if rest_len else {}
+        item = {}
+        for key in self._layouts[layout]:
+            if key in rest:
+                item[key] = rest[key]
+            elif key == "id":
+                item[key] = self._str(id_off, id_len)
+            elif key == "title":
+                item[key] = self._str(title_off, title_len)
+            elif key == "price":
+                item[key] = price
+        return self.factory(item) if self.factory is not None else item
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._materialize(i) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("catalog index out of range")
+        return self._materialize(index)
+
+    def heap_bytes(self) -> int:
+        """Private memory held besides the mapping, which lives in the shared page cache."""
+        return 1024 + sum(64 * (len(keys) + 1) for keys in self._layouts)
+
+    def titles(self) -> List[str]:
+        """Item titles from the title column (``""`` where an item has none)."""
+        out = []
+        for i in range(self._count):
+            _, _, _, title_off, title_len, *_ = self._record(i)
+            out.append(self._str(title_off, title_len))
+        return out
+
+    def prices(self) -> List[Optional[int]]:
+        """Integer prices from the price column (``None`` where an item has no integer price)."""
+        out = []
+        for i in range(self._count):
+            price = self._record(i)[0]
+            out.append(None if price == _NO_PRICE else price)
+        return out
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def load(path, factory: Optional[Callable[[Dict], Any]] = None) -> Optional[CompiledCatalog]:
+    """``DatasetCache`` loader for ``.mcat`` files.
+
+    Returns ``None`` (so callers fall back to the JSON source) when the
+    catalog cannot be read or the JSON it was compiled from has changed
+    since. A catalog without its JSON source next to it is used as is.
+    """
+    try:
+        catalog = CompiledCatalog(path, factory)
+    except (OSError, ValueError, struct.error) as exc:
+        logger.warning("Ignoring compiled catalog %s: %s", path, exc)
+        return None
+    source = Path(path).with_suffix(".json")
+    stamp = _source_stamp(source)
+    if stamp != (0, 0) and stamp != catalog.source_stamp:
+        logger.warning("Compiled catalog %s is older than %s; re-run scripts/compile_catalog.py", path, source)
+        catalog.close()
+        return None
+    return catalog
@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+
+# Parsed JSON datasets take a few times their file size in Python objects.
+_PARSED_EXPANSION = 4
+
+
+def _estimate_size(stamp: Tuple[int, int], value: Any) -> int:
+    """Approximate heap bytes held by a cached dataset."""
+    if value is None:
+        return 0
+    heap_bytes = getattr(value, "heap_bytes", None)
+    if heap_bytes is not None:
+        return heap_bytes()
+    return stamp[1] * _PARSED_EXPANSION
+
+
+class _Entry:
+    __slots__ = ("stamp", "value", "checked_at", "derived", "depends", "depends_stamp", "size")
+
+    def __init__(self, stamp: Optional[Tuple[int, int]], value: Any, checked_at: float,
+                 depends: Tuple[str, ...] = (), depends_stamp: Tuple = ()):
+        self.stamp = stamp
+        self.value = value
+        self.checked_at = checked_at
+        self.derived: Dict[str, Any] = {}
+        self.depends = depends
+        self.depends_stamp = depends_stamp
+        self.size = _estimate_size(stamp, value) if stamp is not None else 0
+
+
+class DatasetCache:
+    """In-process cache of parsed dataset files.
+
+    Entries are keyed by file path and validated against the file's
+    (mtime_ns, size) at most once per ``ttl`` seconds, so hot requests are
+    served without touching disk. Files listed in ``depends`` (e.g. the JSON a
+    compiled catalog was built from) are part of the stamp, so editing them
+    invalidates the entry too. Least recently used entries are evicted once
+    ``max_entries`` or the approximate ``max_bytes`` is exceeded (the newest
+    entry is always kept). Missing files are remembered in a separate, small
+    map of ``max_missing`` paths, which keeps unknown brand lookups cheap
+    without letting them evict parsed datasets.
+    """
+
+    def __init__(self, max_entries: int = 32, ttl: float = 5.0, max_bytes: int = 256 * 1024 * 1024,
+                 max_missing: int = 256):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = int(max_bytes)
+        self.max_missing = max(1, int(max_missing))
+        self.ttl = float(ttl)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._missing: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _stats(self, paths: Sequence[str]) -> Tuple:
+        return tuple(self._stat(p) for p in paths)
+
+    def _drop(self, path: str) -> None:
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._bytes -= entry.size
+        self._missing.pop(path, None)
+
+    def _lookup(self, path: str) -> Optional[_Entry]:
+        """Return a still-valid entry for ``path`` or ``None``; caller holds the lock."""
+        table = self._entries if path in self._entries else self._missing
+        entry = table.get(path)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if now - entry.checked_at >= self.ttl:
+            if self._stat(path) != entry.stamp or self._stats(entry.depends) != entry.depends_stamp:
+                self._drop(path)
+                self.reloads += 1
+                return None
+            entry.checked_at = now
+        table.move_to_end(path)
+        return entry
+
+    def _store(self, path: str, entry: _Entry) -> None:
+        self._drop(path)
+        if entry.stamp is None:
+            self._missing[path] = entry
+            while len(self._missing) > self.max_missing:
+                self._missing.popitem(last=False)
+            return
+        self._entries[path] = entry
+        self._bytes += entry.size
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def _fetch(self, key: str, loader: Callable[[str], Any], depends: Sequence) -> Tuple[Any, bool, bool]:
+        """``(value, exists, hit)`` for ``key``, loading it on a miss; counters are left alone."""
+        depends = tuple(os.fspath(p) for p in depends)
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry.value, entry.stamp is not None, True
+
+        # Parse outside the lock; concurrent misses for the same file simply race
+        # and the last writer wins, which is harmless for immutable snapshots.
+        stamp = self._stat(key)
+        depends_stamp = self._stats(depends)
+        value = loader(key) if stamp is not None else None
+        with self._lock:
+            self._store(key, _Entry(stamp, value, time.monotonic(), depends, depends_stamp))
+        return value, stamp is not None, False
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, path, loader: Callable[[str], Any], depends: Sequence = ()) -> Any:
+        """Return the parsed contents of ``path``, calling ``loader(path)`` on a miss.
+
+        Raises ``FileNotFoundError`` when the file does not exist.
+        """
+        key = os.fspath(path)
+        value, exists, hit = self._fetch(key, loader, depends)
+        self._count(hit)
+        if not exists:
+            raise FileNotFoundError(key)
+        return value
+
+    def probe(self, path, loader: Callable[[str], Any], depends: Sequence = ()) -> Any:
+        """Like :meth:`get`, but ``None`` for a missing file; only lookups yielding a value are counted.
+
+        For optional files (a compiled catalog next to its JSON), so probing
+        for one that is absent does not show up as a hit in :meth:`stats`.
+        """
+        value, _, hit = self._fetch(os.fspath(path), loader, depends)
+        if value is not None:
+            self._count(hit)
+        return value
+
+    def derived(self, path, name: str, builder: Callable[[Any], Any], loader: Callable[[str], Any],
+                depends: Sequence = (), count: bool = True) -> Any:
+        """Return ``builder(dataset)`` for ``path``, built once per load of the dataset.
+
+        Derived structures (search indexes, sort orders) live on the cache entry
+        and are dropped together with it when the file changes or is evicted.
+        Pass ``count=False`` when the caller already looked ``path`` up.
+        """
+        key = os.fspath(path)
+        value, exists, hit = self._fetch(key, loader, depends)
+        if count:
+            self._count(hit)
+        if not exists:
+            raise FileNotFoundError(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.value is value and name in entry.derived:
+                return entry.derived[name]
+        built = builder(value)
+        with self._lock:
+            # Only attach when the entry was not replaced while building.
+            entry = self._entries.get(key)
+            if entry is not None and entry.value is value:
+                return entry.derived.setdefault(name, built)
+        return built
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._missing.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "missing": len(self._missing),
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+                "hitRate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+Attempt = Tuple[str, Callable[[], Any]]
+AsyncAttempt = Tuple[str, Callable[[], Awaitable[Any]]]
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+_STATS_LOCK = threading.Lock()
+_STATS: Dict[str, "_EndpointStats"] = {}
+
+
+class _EndpointStats:
+    __slots__ = ("calls", "ok", "failed", "wins", "latencies")
+
+    def __init__(self):
+        self.calls = 0
+        self.ok = 0
+        self.failed = 0
+        self.wins = 0
+        self.latencies: Deque[float] = deque(maxlen=256)
+
+    def snapshot(self) -> Dict[str, Any]:
+        samples = sorted(self.latencies)
+
+        def pct(p: float) -> Optional[float]:
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+
+        return {
+            "calls": self.calls,
+            "ok": self.ok,
+            "failed": self.failed,
+            "wins": self.wins,
+            "winRate": round(self.wins / self.calls, 4) if self.calls else 0.0,
+            "p50Ms": pct(0.5),
+            "p95Ms": pct(0.95),
+        }
+
+
+def _stats_for(name: str) -> _EndpointStats:
+    st = _STATS.get(name)
+    if st is None:
+        st = _STATS.setdefault(name, _EndpointStats())
+    return st
+
+
+def _executor(max_workers: int) -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+    return _EXECUTOR
+
+
+def _record(name: str, result: Any, elapsed: float) -> None:
+    with _STATS_LOCK:
+        st = _stats_for(name)
+        st.calls += 1
+        st.latencies.append(elapsed)
+        if result:
+            st.ok += 1
+        else:
+            st.failed += 1
+
+
+def _timed(name: str, fn: Callable[[], Any]) -> Any:
+    start = time.monotonic()
+    try:
+        result = fn()
+    except Exception as exc:
+        logger.debug("Upstream attempt %s failed: %s", name, exc)
+        result = None
+    _record(name, result, time.monotonic() - start)
+    return result
+
+
+async def _timed_async(name: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    start = time.monotonic()
+    try:
+        result = await fn()
+    except Exception as exc:
+        logger.debug("Upstream attempt %s failed: %s", name, exc)
+        result = None
+    _record(name, result, time.monotonic() - start)
+    return result
+
+
+def first_non_empty(attempts: Sequence[Attempt], delay: Optional[float], max_workers: int = 16) -> Any:
+    """Run ``attempts`` in order and return the first non-empty result.
+
+    The next attempt is launched as soon as the previous ones have all failed
+    or returned nothing, or - when ``delay`` is not ``None`` - once ``delay``
+    seconds have passed without a result (a hedged request; ``0`` launches
+    everything at once). Slower attempts are cancelled if still queued and
+    otherwise left to finish in the background with their result discarded.
+    Returns ``None`` when every attempt comes back empty.
+    """
+    pool = _executor(max_workers)
+    names: Dict[Future, str] = {}
+    pending = set()
+    launched = 0
+
+    def launch_next() -> None:
+        nonlocal launched
+        name, fn = attempts[launched]
+        fut = pool.submit(_timed, name, fn)
+        names[fut] = name
+        pending.add(fut)
+        launched += 1
+
+    launch_next()
+    hedge_at = time.monotonic() + (delay or 0)
+    while pending:
+        timeout = None
+        if launched < len(attempts) and delay is not None:
+            timeout = max(0.0, hedge_at - time.monotonic())
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for fut in done:
+            result = fut.result()
+            if result:
+                for other in pending:
+                    other.cancel()
+                with _STATS_LOCK:
+                    _stats_for(names[fut]).wins += 1
+                return result
+        if launched < len(attempts) and (not pending or (delay is not None and time.monotonic() >= hedge_at)):
+            launch_next()
+            hedge_at = time.monotonic() + (delay or 0)
+    return None
+
+
+async def first_non_empty_async(attempts: Sequence[AsyncAttempt], delay: Optional[float]) -> Any:
+    """:func:`first_non_empty` for coroutine attempts, raced as tasks on the running loop.
+
+    Same launch rules; losers are cancelled outright, which also drops their
+    upstream connections.
+    """
+    names: Dict[asyncio.Future, str] = {}
+    pending = set()
+    launched = 0
+
+    def launch_next() -> None:
+        nonlocal launched
+        name, fn = attempts[launched]
+        task = asyncio.ensure_future(_timed_async(name, fn))
+        names[task] = name
+        pending.add(task)
+        launched += 1
+
+    launch_next()
+    loop = asyncio.get_running_loop()
+    hedge_at = loop.time() + (delay or 0)
+    try:
+        while pending:
+            timeout = None
+            if launched < len(attempts) and delay is not None:
+                timeout = max(0.0, hedge_at - loop.time())
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if result:
+                    with _STATS_LOCK:
+                        _stats_for(names[task]).wins += 1
+                    return result
+            if launched < len(attempts) and (not pending or (delay is not None and loop.time() >= hedge_at)):
+                launch_next()
+                hedge_at = loop.time() + (delay or 0)
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    with _STATS_LOCK:
+        return {name: st.snapshot() for name, st in _STATS.items()}
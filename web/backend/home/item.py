@@ -0,0 +1,119 @@
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib encoder
+    orjson = None
+
+_DIGITS_RE = re.compile(r"\d[\d,]*")
+_ITEM_ID_RE = re.compile(r"/item/([A-Za-z0-9_-]+)")
+
+
+def parse_price(value: Any) -> Optional[int]:
+    """``4380``, ``"4380"``, ``"¥4,380"`` and ``"4,380円"`` -> ``4380``; anything else -> ``None``."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value)
+    m = _DIGITS_RE.search(str(value))
+    return int(m.group().replace(",", "")) if m else None
+
+
+def format_price(price: Optional[int]) -> str:
+    return f"¥{price:,}" if price is not None else ""
+
+
+def item_id_from_href(href: str) -> str:
+    """Mercari item id from an item URL or its ``/api/home/proxy?path=/item/...`` form."""
+    m = _ITEM_ID_RE.search(href or "")
+    return m.group(1) if m else ""
+
+
+class Item:
+    """One product as it flows through the home blueprint.
+
+    Every source (search APIs, ``__NEXT_DATA__``, the DOM fallback, static
+    datasets, the catalog refresher) builds ``Item`` objects with an integer
+    ``price``; they are converted to JSON only once, by :func:`dumps` at the
+    response boundary. :meth:`from_dict` also accepts the legacy dict shapes
+    and the wire shape of :meth:`to_dict`, so data read back from Redis
+    round-trips.
+    """
+
+    __slots__ = ("id", "title", "price", "price_text", "href", "image", "image_alt", "status")
+
+    def __init__(self, title: str, price: Optional[int] = None, href: str = "", image: str = "",
+                 image_alt: str = "", price_text: str = "", id: str = "", status: str = ""):
+        self.title = title
+        self.price = price
+        self.href = href
+        self.image = image
+        self.image_alt = image_alt
+        self.price_text = price_text or format_price(price)
+        self.id = id or item_id_from_href(href)
+        self.status = status
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Item":
+        image = data.get("image")
+        if isinstance(image, dict):
+            src, alt = image.get("src") or "", image.get("alt") or ""
+            title = data.get("title") or data.get("name") or image.get("title") or ""
+        else:
+            src, alt = image or "", ""
+            title = data.get("title") or data.get("name") or ""
+        price_text = data.get("priceText") or data.get("price_label") or ""
+        price = parse_price(data.get("price"))
+        if price is None:
+            price = parse_price(price_text)
+        return cls(
+            title=str(title),
+            price=price,
+            href=str(data.get("href") or data.get("link") or data.get("url") or ""),
+            image=str(src),
+            image_alt=str(alt),
+            # Legacy "4380円" strings are re-rendered from the parsed price.
+            price_text=price_text if isinstance(price_text, str) else "",
+            id=str(data.get("id") or ""),
+            status=str(data.get("status") or ""),
+        )
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.title and self.href and self.image)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "price": self.price,
+            "priceText": self.price_text,
+            "href": self.href,
+            "image": {"src": self.image, "alt": self.image_alt or self.title},
+            "status": self.status,
+        }
+
+    def __repr__(self) -> str:
+        return f"Item(id={self.id!r}, title={self.title!r}, price={self.price!r})"
+
+
+def as_items(values: Iterable[Any]) -> List[Item]:
+    """Items from a mix of ``Item`` objects and dicts (e.g. JSON read back from Redis)."""
+    return [v if isinstance(v, Item) else Item.from_dict(v) for v in values or () if isinstance(v, (Item, dict))]
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Item):
+        return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode ``obj`` (which may contain ``Item`` objects) as UTF-8 JSON, with orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
@@ -0,0 +1,233 @@
+import base64
+import binascii
+import json
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .item import Item
+
+try:
+    import numpy as np
+except ImportError:  # optional, bisect over plain lists is used instead
+    np = None
+
+SORTS = ("newest", "price")
+ORDERS = ("asc", "desc")
+
+
+class ListingQuery:
+    """``min_price``/``max_price``/``sort``/``order``/``cursor`` request parameters.
+
+    ``sort=newest`` keeps the source order (datasets are stored newest first
+    and live searches ask upstream for ``sort=created_time&order=desc``);
+    ``sort=price`` orders by price, ``order=desc`` for
+    the most expensive first. ``after`` is the decoded cursor key.
+    """
+
+    __slots__ = ("min_price", "max_price", "sort", "order", "cursor", "after", "limit")
+
+    def __init__(self, min_price: Optional[int] = None, max_price: Optional[int] = None, sort: str = "newest",
+                 order: str = "asc", cursor: str = "", limit: int = 24):
+        self.min_price = min_price
+        self.max_price = max_price
+        self.sort = sort
+        self.order = order if sort == "price" else "asc"
+        self.cursor = cursor
+        self.limit = limit
+        self.after: Optional[Tuple[int, ...]] = _decode_cursor(cursor, self._scope()) if cursor else None
+
+    @property
+    def active(self) -> bool:
+        """Whether any listing parameter was given (otherwise endpoints keep their plain first-N behaviour)."""
+        return (self.min_price is not None or self.max_price is not None or self.sort != "newest"
+                or self.order != "asc" or bool(self.cursor))
+
+    @property
+    def filtered(self) -> bool:
+        return self.min_price is not None or self.max_price is not None
+
+    def _scope(self) -> List[Any]:
+        return [self.sort, self.order, self.min_price, self.max_price]
+
+    def cache_params(self) -> Dict[str, Any]:
+        return {"minPrice": self.min_price, "maxPrice": self.max_price, "sort": self.sort, "order": self.order,
+                "cursor": self.cursor}
+
+    def next_cursor(self, key: Tuple[int, ...]) -> str:
+        raw = json.dumps(self._scope() + [list(key)], separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, scope: List[Any]) -> Tuple[int, ...]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        key = data[-1]
+        size = 2 if scope[0] == "price" else 1
+        if data[:-1] != scope or len(key) != size or not all(isinstance(k, int) and k >= 0 for k in key):
+            raise ValueError
+    except (binascii.Error, ValueError, TypeError, IndexError, UnicodeDecodeError):
+        raise ValueError("invalid cursor") from None
+    return tuple(key)
+
+
+def _int_arg(args: Mapping[str, str], name: str) -> Optional[int]:
+    value = (args.get(name) or "").strip()
+    if not value:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+    if number < 0:
+        raise ValueError(f"{name} must not be negative")
+    return number
+
+
+def parse_query(args: Mapping[str, str], limit: int) -> ListingQuery:
+    """Build a :class:`ListingQuery` from request args; raises ``ValueError`` on bad input."""
+    min_price = _int_arg(args, "min_price")
+    max_price = _int_arg(args, "max_price")
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise ValueError("min_price must not exceed max_price")
+    sort = (args.get("sort") or "newest").strip().lower()
+    order = (args.get("order") or "asc").strip().lower()
+    if sort not in SORTS:
+        raise ValueError(f"sort must be one of {', '.join(SORTS)}")
+    if order not in ORDERS:
+        raise ValueError(f"order must be one of {', '.join(ORDERS)}")
+    return ListingQuery(min_price, max_price, sort, order, (args.get("cursor") or "").strip(), limit)
+
+
+class PriceIndex:
+    """Sorted price vector over one item sequence, built once per dataset load.
+
+    Priced item positions are argsorted by ``(price, position)``, so a price
+    range is two binary searches and a cursor resumes with one more, making
+    every page an O(log n) slice regardless of how deep it is. Price-filtered
+    ``newest`` pages either scan the source-order prices from the cursor until
+    the page is full or sort the (small) matching window, whichever is
+    cheaper for the window's size. NumPy arrays are used when NumPy is
+    installed, plain lists with ``bisect`` otherwise. Items without a price
+    are left out of price-filtered and price-sorted listings.
+    """
+
+    def __init__(self, items: Sequence[Item]):
+        prices = items.prices() if hasattr(items, "prices") else [item.price for item in items]
+        self.size = len(prices)
+        priced = [(price, pos) for pos, price in enumerate(prices) if price is not None]
+        if np is not None:
+            values = np.fromiter((p for p, _ in priced), dtype=np.int64, count=len(priced))
+            positions = np.fromiter((pos for _, pos in priced), dtype=np.int64, count=len(priced))
+            order = np.argsort(values, kind="stable")
+            self._prices = values[order]
+            self._positions = positions[order]
+            # Source order, -1 where unpriced (filters never go below 0).
+            self._by_position = np.fromiter((-1 if p is None else p for p in prices), dtype=np.int64,
+                                            count=self.size)
+        else:
+            priced.sort()
+            self._prices = [p for p, _ in priced]
+            self._positions = [pos for _, pos in priced]
+            self._by_position = prices
+
+    def _bound(self, values, value: int, left: bool, lo: int = 0, hi: Optional[int] = None) -> int:
+        hi = len(values) if hi is None else hi
+        if np is not None:
+            return lo + int(np.searchsorted(values[lo:hi], value, side="left" if left else "right"))
+        return (bisect_left if left else bisect_right)(values, value, lo, hi)
+
+    def _price_window(self, query: ListingQuery) -> Tuple[int, int]:
+        lo = 0 if query.min_price is None else self._bound(self._prices, query.min_price, True)
+        hi = len(self._prices) if query.max_price is None else self._bound(self._prices, query.max_price, False)
+        return lo, max(lo, hi)
+
+    def _key_bound(self, key: Tuple[int, ...], lo: int, hi: int, after: bool) -> int:
+        """Index of the first ``(price, position)`` greater than (``after``) or not less than ``key``."""
+        price, pos = key
+        run_lo = self._bound(self._prices, price, True, lo, hi)
+        run_hi = self._bound(self._prices, price, False, run_lo, hi)
+        return self._bound(self._positions, pos, not after, run_lo, run_hi)
+
+    def page(self, query: ListingQuery) -> Tuple[List[int], Optional[str], int]:
+        """Return ``(positions, next_cursor, total)`` for one page of ``query``."""
+        limit = max(1, query.limit)
+        if query.sort == "price":
+            lo, hi = self._price_window(query)
+            total = hi - lo
+            if query.after is not None:
+                if query.order == "asc":
+                    lo = self._key_bound(query.after, lo, hi, after=True)
+                else:
+                    hi = self._key_bound(query.after, lo, hi, after=False)
+            if query.order == "asc":
+                start, end = lo, min(hi, lo + limit)
+                positions = [int(p) for p in self._positions[start:end]]
+                last, more = end - 1, end < hi
+            else:
+                start, end = max(lo, hi - limit), hi
+                positions = [int(p) for p in self._positions[start:end][::-1]]
+                last, more = start, start > lo
+            if more and positions:
+                return positions, query.next_cursor((int(self._prices[last]), positions[-1])), total
+            return positions, None, total
+
+        if not query.filtered:
+            total = self.size
+            start = 0 if query.after is None else query.after[0] + 1
+            positions = list(range(start, min(total, start + limit)))
+            more = start + limit < total
+        else:
+            lo, hi = self._price_window(query)
+            total = hi - lo
+            # Sorting the window costs ~total*log(total); a scan ~limit*size/total per page.
+            if total * total * max(1, total.bit_length()) <= limit * self.size:
+                window = self._positions[lo:hi]
+                ordered = np.sort(window) if np is not None else sorted(window)
+                start = 0 if query.after is None else self._bound(ordered, query.after[0], False)
+                positions = [int(p) for p in ordered[start:start + limit]]
+                more = start + limit < total
+            else:
+                start = 0 if query.after is None else query.after[0] + 1
+                positions = self._scan(start, query.min_price, query.max_price, limit + 1, total)
+                more = len(positions) > limit
+                del positions[limit:]
+        cursor = query.next_cursor((positions[-1],)) if positions and more else None
+        return positions, cursor, total
+
+    def _scan(self, start: int, min_price: Optional[int], max_price: Optional[int], count: int,
+              total: int) -> List[int]:
+        """First ``count`` positions from ``start`` on, in source order, priced within the range."""
+        low = 0 if min_price is None else min_price
+        found: List[int] = []
+        if np is None:
+            for pos in range(start, self.size):
+                price = self._by_position[pos]
+                if price is not None and low <= price and (max_price is None or price <= max_price):
+                    found.append(pos)
+                    if len(found) == count:
+                        break
+            return found
+        high = np.iinfo(np.int64).max if max_price is None else max_price
+        # Chunks sized for the expected density, doubling when it was underestimated.
+        step = max(count, count * self.size // max(1, total))
+        pos = start
+        while pos < self.size and len(found) < count:
+            chunk = self._by_position[pos:pos + step]
+            hits = np.flatnonzero((chunk >= low) & (chunk <= high))
+            found.extend(int(h) + pos for h in hits[:count - len(found)])
+            pos += step
+            step *= 2
+        return found
+
+
+def paginate(items: Sequence[Item], query: ListingQuery, index: Optional[PriceIndex] = None
+             ) -> Dict[str, Any]:
+    """One page of ``items`` as a response payload (``items``, ``nextCursor``, ``total``).
+
+    Pass the precomputed ``index`` for datasets; small upstream lists are
+    indexed on the fly.
+    """
+    index = index or PriceIndex(items)
+    positions, cursor, total = index.page(query)
+    return {"items": [items[pos] for pos in positions], "nextCursor": cursor, "total": total}
@@ -0,0 +1,203 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .item import Item, parse_price
+from .rewriter import to_proxy_path
+
+Path = Tuple[Any, ...]
+
+_PRICE_KEYS = ("price", "priceLabel", "price_label")
+_IMAGE_KEYS = ("thumbnails", "images", "image")
+
+
+def is_product(node: Dict) -> bool:
+    return ("name" in node and any(k in node for k in _PRICE_KEYS)
+            and any(k in node for k in _IMAGE_KEYS))
+
+
+def product_item(node: Dict, base: str) -> Optional[Item]:
+    """Convert one product dict into an :class:`Item`, or ``None`` if incomplete."""
+    thumb = node.get("thumbnails") or node.get("images") or [node.get("image")]
+    if isinstance(thumb, list) and thumb:
+        img = thumb[0]
+        if isinstance(img, dict):
+            img = img.get("url")
+    else:
+        img = thumb
+    link = node.get("url") or node.get("link") or node.get("itemUrl") or node.get("item_url")
+    price_val = node.get("price") or node.get("priceLabel") or node.get("price_label")
+    if not (link and img and node.get("name")):
+        return None
+    return Item(
+        title=node.get("name"),
+        price=parse_price(price_val),
+        image=to_proxy_path(base, img),
+        href=to_proxy_path(base, link),
+        id=str(node.get("id") or ""),
+        status=str(node.get("status") or ""),
+    )
+
+
+def shape_key(data: Any) -> str:
+    """Identify the page shape of a ``__NEXT_DATA__`` document (the Next.js route)."""
+    if isinstance(data, dict):
+        page = data.get("page")
+        if isinstance(page, str):
+            return page
+        return ",".join(sorted(map(str, data)))
+    return type(data).__name__
+
+
+# Stands for every index of a list in a learned path.
+_ANY = None
+
+
+class _PathTrie:
+    __slots__ = ("children", "end")
+
+    def __init__(self):
+        self.children: Dict[Any, "_PathTrie"] = {}
+        self.end = False
+
+
+def _build_trie(paths: List[Path]) -> _PathTrie:
+    root = _PathTrie()
+    for path in paths:
+        node = root
+        for step in path:
+            child = node.children.get(step)
+            if child is None:
+                child = node.children[step] = _PathTrie()
+            node = child
+        node.end = True
+    return root
+
+
+def _collect(node: Any, trie: _PathTrie, base: str, max_items: int, results: List[Item]) -> None:
+    """Append the products at the learned paths under ``node``, in document order."""
+    if trie.end and isinstance(node, dict) and is_product(node):
+        item = product_item(node, base)
+        if item is not None:
+            results.append(item)
+            return
+    for step, child in trie.children.items():
+        if len(results) >= max_items:
+            return
+        if step is _ANY:
+            if isinstance(node, list):
+                for entry in node:
+                    _collect(entry, child, base, max_items, results)
+                    if len(results) >= max_items:
+                        return
+        elif isinstance(node, dict) and step in node:
+            _collect(node[step], child, base, max_items, results)
+
+
+def walk(data: Any, base: str, max_items: Optional[int] = None) -> Tuple[List[Item], List[Path]]:
+    """Generic depth-first search in document order.
+
+    Returns the items plus the paths they were found at, list indices
+    replaced by :data:`_ANY`, which is what gets cached for the page shape.
+    Paths are only materialized for hits; every visited container just
+    records ``(parent record, key)``.
+    With ``max_items`` the search stops early, so the paths may be incomplete.
+    """
+    results: List[Item] = []
+    paths: List[Path] = []
+    seen = set()
+    records: List[Tuple[int, Any]] = [(-1, None)]
+    stack: List[Tuple[Any, int]] = [(data, 0)]
+
+    def path_of(rec: int) -> Path:
+        steps = []
+        while rec > 0:
+            rec, key = records[rec]
+            steps.append(key)
+        return tuple(reversed(steps))
+
+    while stack and (max_items is None or len(results) < max_items):
+        node, rec = stack.pop()
+        if isinstance(node, dict):
+            if is_product(node):
+                item = product_item(node, base)
+                if item is not None:
+                    results.append(item)
+                    path = tuple(_ANY if isinstance(step, int) else step for step in path_of(rec))
+                    if path not in seen:
+                        seen.add(path)
+                        paths.append(path)
+                    continue
+            children = reversed(node.items())
+        elif isinstance(node, list):
+            children = reversed(list(enumerate(node)))
+        else:
+            continue
+        for key, value in children:
+            if isinstance(value, (dict, list)):
+                records.append((rec, key))
+                stack.append((value, len(records) - 1))
+    return results, paths
+
+
+class ProductExtractor:
+    """Product extraction that remembers where products live per page shape.
+
+    The first document of a shape is searched with :func:`walk`; the paths of
+    the products it found (list indices generalized, so ``items[*]``,
+    ``edges[*].node`` and ``hero`` alike) are cached under :func:`shape_key`.
+    Later documents of the same shape follow only those paths, so the cost is
+    proportional to the number of items rather than the size of the page
+    state. The learning walk covers the whole document, so the cached paths
+    serve any later ``max_items``. When the cached paths yield no products
+    the walk runs again and re-learns them; a page with no products at all
+    leaves the learned shape in place.
+    """
+
+    def __init__(self, max_shapes: int = 64):
+        self.max_shapes = max_shapes
+        self._paths: "OrderedDict[str, Tuple[List[Path], _PathTrie]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"cached": 0, "learned": 0, "relearned": 0, "uncached": 0}
+
+    def extract(self, data: Any, base: str, max_items: int = 60) -> List[Item]:
+        key = shape_key(data)
+        with self._lock:
+            learned = self._paths.get(key)
+            if learned is not None:
+                self._paths.move_to_end(key)
+        if learned is not None:
+            items: List[Item] = []
+            _collect(data, learned[1], base, max_items, items)
+            if items:
+                self._bump("cached")
+                return items
+
+        items, found = walk(data, base)
+        if found:
+            with self._lock:
+                self._paths[key] = (found, _build_trie(found))
+                self._paths.move_to_end(key)
+                while len(self._paths) > self.max_shapes:
+                    self._paths.popitem(last=False)
+        self._bump("uncached" if not found else "relearned" if learned is not None else "learned")
+        return items[:max_items]
+
+    def _bump(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counters, "shapes": {key: [list(p) for p in paths] for key, (paths, _) in self._paths.items()}}
+
+
+_EXTRACTOR = ProductExtractor()
+
+
+def extract_products(data: Any, base: str, max_items: int = 60) -> List[Item]:
+    return _EXTRACTOR.extract(data, base, max_items)
+
+
+def stats() -> Dict[str, Any]:
+    return _EXTRACTOR.stats()
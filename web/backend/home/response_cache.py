@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import current_app
+
+from .item import dumps
+
+logger = logging.getLogger(__name__)
+
+_RESPONSE_FALLBACK: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # key -> (entry, expire_ts)
+_REVALIDATE_FALLBACK: Dict[str, float] = {}  # lock key -> expire_ts
+_FALLBACK_LOCK = threading.Lock()
+_STATS_LOCK = threading.Lock()
+_STATS: Dict[str, Dict[str, int]] = {}
+
+_KEY_PREFIX = "home:resp:"
+_REVALIDATE_LOCK_SECS = 30
+
+Payload = Tuple[dict, int]
+
+
+def cache_key(endpoint: str, params: Dict) -> str:
+    raw = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return f"{_KEY_PREFIX}{endpoint}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+def _count(endpoint: str, status: str) -> None:
+    with _STATS_LOCK:
+        counters = _STATS.setdefault(endpoint, {"HIT": 0, "STALE": 0, "MISS": 0})
+        counters[status] = counters.get(status, 0) + 1
+
+
+def _fallback_get(key: str) -> Optional[str]:
+    with _FALLBACK_LOCK:
+        val = _RESPONSE_FALLBACK.get(key)
+        if not val:
+            return None
+        raw, exp = val
+        if exp <= time.time():
+            del _RESPONSE_FALLBACK[key]
+            return None
+        _RESPONSE_FALLBACK.move_to_end(key)
+        return raw
+
+
+def _fallback_set(key: str, ttl: int, raw: str) -> None:
+    max_entries = current_app.config.get("RESPONSE_CACHE_FALLBACK_MAX", 512)
+    with _FALLBACK_LOCK:
+        _RESPONSE_FALLBACK[key] = (raw, time.time() + ttl)
+        _RESPONSE_FALLBACK.move_to_end(key)
+        while len(_RESPONSE_FALLBACK) > max_entries:
+            _RESPONSE_FALLBACK.popitem(last=False)
+
+
+def _store_get(key: str) -> Optional[str]:
+    try:
+        return current_app.redis.get(key)
+    except Exception:
+        return _fallback_get(key)
+
+
+def _store_set(key: str, ttl: int, raw: str) -> None:
+    try:
+        current_app.redis.setex(key, ttl, raw)
+    except Exception:
+        _fallback_set(key, ttl, raw)
+
+
+def _acquire_revalidation(key: str) -> bool:
+    lock_key = f"{key}:revalidate"
+    try:
+        return bool(current_app.redis.set(lock_key, "1", nx=True, ex=_REVALIDATE_LOCK_SECS))
+    except Exception:
+        now = time.time()
+        with _FALLBACK_LOCK:
+            if _REVALIDATE_FALLBACK.get(lock_key, 0) > now:
+                return False
+            _REVALIDATE_FALLBACK[lock_key] = now + _REVALIDATE_LOCK_SECS
+            return True
+
+
+def _release_revalidation(key: str) -> None:
+    lock_key = f"{key}:revalidate"
+    try:
+        current_app.redis.delete(lock_key)
+    except Exception:
+        with _FALLBACK_LOCK:
+            _REVALIDATE_FALLBACK.pop(lock_key, None)
+
+
+def _ttls(endpoint: str) -> Tuple[int, int]:
+    ttls = current_app.config.get("RESPONSE_CACHE_TTLS", {})
+    return int(ttls.get(endpoint, 60)), int(current_app.config.get("RESPONSE_CACHE_STALE_TTL", 600))
+
+
+def _cacheable(payload: dict, status: int) -> bool:
+    return status == 200 and "error" not in payload
+
+
+def _store(key: str, endpoint: str, body: bytes) -> None:
+    # "<fresh until>\n<payload json>": hits send the stored JSON as is, without decoding it.
+    fresh_ttl, stale_ttl = _ttls(endpoint)
+    _store_set(key, fresh_ttl + stale_ttl, f"{time.time() + fresh_ttl:.3f}\n{body.decode('utf-8')}")
+
+
+def _parse_entry(raw) -> Tuple[float, bytes]:
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8")
+    fresh_until, sep, body = raw.partition("\n")
+    if not sep or not body:
+        raise ValueError("malformed entry")
+    return float(fresh_until), body.encode("utf-8")
+
+
+def _revalidate_async(key: str, endpoint: str, compute: Callable[[], Payload]) -> None:
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                payload, status = compute()
+                if _cacheable(payload, status):
+                    _store(key, endpoint, dumps(payload))
+            except Exception as exc:
+                logger.warning("Background revalidation failed for %s: %s", endpoint, exc)
+            finally:
+                _release_revalidation(key)
+
+    threading.Thread(target=run, name=f"revalidate-{endpoint}", daemon=True).start()
+
+
+def has_entry(endpoint: str, params: Dict) -> bool:
+    """Whether :func:`cached_payload` would answer from the cache (fresh or stale), without counting."""
+    if not current_app.config.get("RESPONSE_CACHE_ENABLED", True):
+        return False
+    raw = _store_get(cache_key(endpoint, params))
+    try:
+        return bool(raw) and bool(_parse_entry(raw))
+    except (ValueError, UnicodeDecodeError):
+        return False
+
+
+def cached_payload(endpoint: str, params: Dict, compute: Callable[[], Payload]) -> Tuple[bytes, int, str]:
+    """Serve ``compute()`` through the shared response cache.
+
+    Returns ``(body, status, cache_status)``: ``body`` is the payload encoded
+    once with :func:`.item.dumps` (the cache stores exactly these bytes) and
+    ``cache_status`` is
+    ``HIT``, ``STALE`` (served while one worker refreshes it in the background)
+    or ``MISS``. ``compute`` must only depend on ``current_app``, never on
+    ``request``, because stale entries are recomputed outside the request.
+    """
+    if not current_app.config.get("RESPONSE_CACHE_ENABLED", True):
+        payload, status = compute()
+        return dumps(payload), status, "MISS"
+
+    key = cache_key(endpoint, params)
+    raw = _store_get(key)
+    if raw:
+        try:
+            fresh_until, body = _parse_entry(raw)
+            if fresh_until > time.time():
+                _count(endpoint, "HIT")
+                return body, 200, "HIT"
+            if _acquire_revalidation(key):
+                _revalidate_async(key, endpoint, compute)
+            _count(endpoint, "STALE")
+            return body, 200, "STALE"
+        except (ValueError, UnicodeDecodeError):
+            logger.debug("Discarding malformed cache entry %s", key)
+
+    _count(endpoint, "MISS")
+    payload, status = compute()
+    body = dumps(payload)
+    if _cacheable(payload, status):
+        _store(key, endpoint, body)
+    return body, status, "MISS"
+
+
+def stats() -> Dict[str, Dict]:
+    with _STATS_LOCK:
+        snapshot = {endpoint: dict(counters) for endpoint, counters in _STATS.items()}
+    out = {}
+    for endpoint, counters in snapshot.items():
+        total = sum(counters.values())
+        served = counters.get("HIT", 0) + counters.get("STALE", 0)
+        out[endpoint] = {**counters, "hitRate": round(served / total, 4) if total else 0.0}
+    return out
@@ -0,0 +1,283 @@
+import codecs
+import functools
+import html
+import re
+from typing import Iterable, Iterator, List, Optional
+from urllib.parse import urlencode, urljoin, urlparse
+
+# Attributes whose whole value is a single URL.
+_URL_ATTRS = {"href", "src", "action", "poster", "data-src"}
+# Attributes holding a comma separated list of "url [descriptor]" candidates.
+_SRCSET_ATTRS = {"srcset", "imagesrcset", "data-srcset"}
+# Elements whose content is raw text and must not be scanned for tags.
+_RAW_TEXT_TAGS = {"script", "style", "textarea", "title"}
+
+# Next comment opener or complete start tag (name, attribute text).
+_TOKEN_RE = re.compile(r"""<!--|<([a-zA-Z][^\s/>]*)([^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*)>""")
+_PENDING_RE = re.compile(r"<[a-zA-Z!]|<$")
+_ATTR_RE = re.compile(r"""([^\s"'<>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+)))?""")
+_CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)(.*?)\1\s*\)""", re.IGNORECASE | re.DOTALL)
+_SPECIAL_TAGS = _RAW_TEXT_TAGS | {"head"}
+# Cheap pre-filter: start tags mentioning none of these are passed through untouched.
+_ATTR_HINTS = ("src", "href", "style", "action", "poster")
+# Head elements that may precede the page's own <base> without needing one themselves.
+_BASE_DEFER_TAGS = {"meta", "title", "link", "style"}
+_HEAD_END_RE = re.compile(r"</head[\s>]", re.IGNORECASE)
+_RAW_END_RES = {tag: re.compile(rf"</{tag}[\s/>]", re.IGNORECASE) for tag in _RAW_TEXT_TAGS}
+
+# Give up waiting for the end of a tag after this many buffered characters.
+_MAX_PENDING_TAG = 64 * 1024
+
+
+@functools.lru_cache(maxsize=8192)
+def to_proxy_path(base: str, url: str) -> str:
+    """Map ``url`` (absolute, protocol-relative or root-relative) onto ``/api/home/proxy``.
+
+    URLs on other hosts, fragments and ``javascript:`` links are returned
+    unchanged. Results are memoized per ``(base, url)``.
+    """
+    if not url or url.startswith("javascript:") or url.startswith("#"):
+        return url
+    if url.startswith("//"):
+        url = "https:" + url
+    parsed = urlparse(url)
+    base_host = urlparse(base).netloc
+    if parsed.scheme in ("http", "https"):
+        if parsed.netloc and base_host.split(':')[0] not in parsed.netloc:
+            return url
+        pathq = parsed.path or "/"
+        if parsed.query:
+            pathq += "?" + parsed.query
+        return f"/api/home/proxy?" + urlencode({"path": pathq})
+    if url.startswith("/"):
+        return f"/api/home/proxy?" + urlencode({"path": url})
+    return url
+
+
+def rewrite_css(text_css: str, base: str) -> str:
+    """Rewrite every ``url(...)`` in a stylesheet in one regex pass."""
+    def repl_url(m):
+        quote, raw = m.group(1), m.group(2).strip()
+        return f"url({quote}{to_proxy_path(base, raw)}{quote})"
+    return _CSS_URL_RE.sub(repl_url, text_css)
+
+
+def _rewrite_url_value(base: str, raw: str) -> Optional[str]:
+    url = html.unescape(raw).strip()
+    proxied = to_proxy_path(base, url)
+    if proxied == url:
+        return None
+    return html.escape(proxied, quote=True)
+
+
+def _absolute_url(base: str, raw: str) -> Optional[str]:
+    url = html.unescape(raw).strip()
+    absolute = urljoin(base, url)
+    if absolute == url:
+        return None
+    return html.escape(absolute, quote=True)
+
+
+def _rewrite_srcset(base: str, raw: str) -> Optional[str]:
+    changed = False
+    candidates = []
+    for candidate in html.unescape(raw).split(","):
+        parts = candidate.strip().split(None, 1)
+        if not parts:
+            continue
+        proxied = to_proxy_path(base, parts[0])
+        changed = changed or proxied != parts[0]
+        candidates.append(" ".join([proxied] + parts[1:]))
+    if not changed:
+        return None
+    return html.escape(", ".join(candidates), quote=True)
+
+
+def _rewrite_style(base: str, raw: str) -> Optional[str]:
+    if "url(" not in raw.lower():
+        return None
+    rewritten = rewrite_css(html.unescape(raw), base)
+    return html.escape(rewritten, quote=True)
+
+
+class HtmlRewriter:
+    """Incremental, single-pass rewriter for proxied HTML.
+
+    Text is fed in arbitrary chunks; each ``feed`` returns the rewritten output
+    that is safe to emit so far, holding back only an unfinished tag (or the
+    tail of a raw-text element that may be the start of its end tag). Start
+    tags are tokenized once: URL attributes (``href``, ``src``, ``action``,
+    ``poster``, ``data-src``), ``srcset``/``imagesrcset`` candidates (as used by
+    ``<img>`` and ``<link rel=preload>``) and inline ``style`` ``url()``\\ s are
+    pointed at the proxy. ``<style>`` bodies go through :func:`rewrite_css`,
+    while ``<script>`` bodies and comments pass through untouched. A
+    ``<base href>`` pointing at the upstream origin is inserted in ``<head>``
+    so relative URLs left in scripts still resolve upstream; it is held back
+    past leading ``<meta>``/``<title>``/``<link>``/``<style>`` tags and dropped
+    if the page brings its own ``<base>``, whose href is made absolute instead.
+    """
+
+    def __init__(self, base: str):
+        self.base = base
+        self._buf = ""
+        self._raw_tag: Optional[str] = None
+        self._style_parts: List[str] = []
+        self._base_inserted = False
+        self._base_pending = False
+
+    def feed(self, text: str) -> str:
+        self._buf += text
+        return self._drain(final=False)
+
+    def close(self) -> str:
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> str:
+        buf = self._buf
+        n = len(buf)
+        pos = 0
+        out: List[str] = []
+        while pos < n:
+            if self._raw_tag is not None:
+                pos = self._drain_raw(buf, pos, out, final)
+                if self._raw_tag is not None:
+                    break
+                continue
+
+            m = _TOKEN_RE.search(buf, pos)
+            if m is None:
+                # Hold back a possibly unfinished tag or comment at the end of the buffer.
+                hold = n
+                if not final:
+                    pending = _PENDING_RE.search(buf, pos)
+                    if self._base_pending and n - pos < _MAX_PENDING_TAG:
+                        hold = pos  # the next tag decides where the held-back <base> goes
+                    elif pending is not None and n - pending.start() < _MAX_PENDING_TAG:
+                        hold = pending.start()
+                elif self._base_pending:
+                    pos = self._place_base(buf, pos, n, out)
+                out.append(buf[pos:hold])
+                pos = hold
+                break
+
+            name = m.group(1)
+            if name is None:
+                end = buf.find("-->", m.end())
+                if end == -1 and not final:
+                    out.append(buf[pos:m.start()])
+                    pos = m.start()
+                    break
+                end = n if end == -1 else end + 3
+                out.append(buf[pos:end])
+                pos = end
+                continue
+
+            name = name.lower()
+            attrs = m.group(2).lower()
+            if self._base_pending and name not in _BASE_DEFER_TAGS:
+                self._base_pending = False
+                if name != "base":
+                    pos = self._place_base(buf, pos, m.start(), out)
+            if name in _SPECIAL_TAGS or any(hint in attrs for hint in _ATTR_HINTS):
+                out.append(buf[pos:m.start()])
+                out.append(self._rewrite_start_tag(name, m.group(0), m.start(2) - m.start()))
+            else:
+                out.append(buf[pos:m.end()])
+            pos = m.end()
+
+        self._buf = buf[pos:]
+        return "".join(out)
+
+    def _place_base(self, buf: str, pos: int, end: int, out: List[str]) -> int:
+        """Emit the held-back ``<base>`` before ``end``, or before ``</head>`` if the head closes first."""
+        self._base_pending = False
+        m = _HEAD_END_RE.search(buf, pos, end)
+        at = m.start() if m is not None else end
+        out.append(buf[pos:at])
+        out.append(f"<base href=\"{self.base}\">")
+        return at
+
+    def _drain_raw(self, buf: str, pos: int, out: List[str], final: bool) -> int:
+        tag = self._raw_tag
+        m = _RAW_END_RES[tag].search(buf, pos)
+        if m is None and not final:
+            # Hold back enough characters to recognise a split "</tag".
+            safe_end = max(pos, len(buf) - len(tag) - 3)
+            self._emit_raw(buf[pos:safe_end], out, done=False)
+            return safe_end
+        end = m.start() if m is not None else len(buf)
+        self._emit_raw(buf[pos:end], out, done=True)
+        self._raw_tag = None
+        return end
+
+    def _emit_raw(self, text: str, out: List[str], done: bool) -> None:
+        if self._raw_tag != "style":
+            out.append(text)
+            return
+        # url() tokens can straddle chunks, so stylesheets are rewritten whole.
+        self._style_parts.append(text)
+        if done:
+            out.append(rewrite_css("".join(self._style_parts), self.base))
+            self._style_parts = []
+
+    def _rewrite_start_tag(self, name: str, tag: str, attrs_start: int) -> str:
+        pieces: List[str] = []
+        last = 0
+        for m in _ATTR_RE.finditer(tag, attrs_start, len(tag) - 1):
+            attr = m.group(1).lower()
+            if name == "base":
+                # Keep the page's own base pointing upstream, as the inserted one would.
+                if attr != "href":
+                    continue
+                rewrite = _absolute_url
+            elif attr in _URL_ATTRS:
+                rewrite = _rewrite_url_value
+            elif attr in _SRCSET_ATTRS:
+                rewrite = _rewrite_srcset
+            elif attr == "style":
+                rewrite = _rewrite_style
+            else:
+                continue
+            group = next((g for g in (2, 3, 4) if m.group(g) is not None), None)
+            if group is None:
+                continue
+            new_value = rewrite(self.base, m.group(group))
+            if new_value is None:
+                continue
+            start, end = m.span(group)
+            if group == 4:
+                new_value = f'"{new_value}"'
+            pieces.append(tag[last:start])
+            pieces.append(new_value)
+            last = end
+        if pieces:
+            pieces.append(tag[last:])
+            tag = "".join(pieces)
+
+        if name == "head" and not self._base_inserted:
+            self._base_inserted = self._base_pending = True
+        elif name in _RAW_TEXT_TAGS:
+            # Browsers ignore "/>" on these, so their content is raw text either way.
+            self._raw_tag = name
+        return tag
+
+
+def rewrite_html(text: str, base: str) -> str:
+    rewriter = HtmlRewriter(base)
+    return rewriter.feed(text) + rewriter.close()
+
+
+def rewrite_html_stream(chunks: Iterable[bytes], base: str, encoding: str = "utf-8") -> Iterator[bytes]:
+    """Decode, rewrite and re-encode (as UTF-8) an HTML byte stream chunk by chunk."""
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    rewriter = HtmlRewriter(base)
+    for chunk in chunks:
+        text = rewriter.feed(decoder.decode(chunk))
+        if text:
+            yield text.encode("utf-8")
+    tail = rewriter.feed(decoder.decode(b"", final=True)) + rewriter.close()
+    if tail:
+        yield tail.encode("utf-8")
@@ -0,0 +1,85 @@
+import re
+import unicodedata
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+from .item import Item
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """NFKC-fold, casefold and collapse whitespace so full-width/half-width and case variants match."""
+    if not value:
+        return ""
+    return _WS_RE.sub(" ", unicodedata.normalize("NFKC", value).casefold()).strip()
+
+
+def _bigrams(text: str) -> Iterable[str]:
+    return (text[i:i + 2] for i in range(len(text) - 1))
+
+
+class SearchIndex:
+    """Character-bigram inverted index over item titles.
+
+    Japanese titles have no word boundaries, so every title is indexed by its
+    overlapping character bigrams (plus single characters for one-letter
+    queries). A query is answered by intersecting the posting sets of its
+    bigrams, smallest first, and then confirming the substring match on the
+    normalized title, which keeps results identical to a linear
+    ``query in title`` scan.
+    """
+
+    def __init__(self, items: Sequence[Item]):
+        self.items = items
+        # Compiled catalogs expose their title column, so indexing does not materialize items.
+        titles = items.titles() if hasattr(items, "titles") else (item.title for item in items)
+        self._titles: List[str] = [normalize_text(title) for title in titles]
+        postings: Dict[str, set] = {}
+        unigrams: Dict[str, set] = {}
+        for pos, title in enumerate(self._titles):
+            for gram in _bigrams(title):
+                postings.setdefault(gram, set()).add(pos)
+            for ch in title:
+                unigrams.setdefault(ch, set()).add(pos)
+        self._postings: Dict[str, FrozenSet[int]] = {k: frozenset(v) for k, v in postings.items()}
+        self._unigrams: Dict[str, FrozenSet[int]] = {k: frozenset(v) for k, v in unigrams.items()}
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _candidates(self, query: str) -> Iterable[int]:
+        if len(query) == 1:
+            return self._unigrams.get(query, ())
+        sets = []
+        for gram in set(_bigrams(query)):
+            posting = self._postings.get(gram)
+            if not posting:
+                return ()
+            sets.append(posting)
+        sets.sort(key=len)
+        smallest, rest = sets[0], sets[1:]
+        return [pos for pos in smallest if all(pos in s for s in rest)]
+
+    def search_positions(self, query: str) -> List[int]:
+        """Return dataset positions whose title contains ``query``, best match first.
+
+        Results are ranked by how early the match occurs in the title, ties
+        keeping dataset order.
+        """
+        q = normalize_text(query)
+        if not q:
+            return []
+        titles = self._titles
+        ranked = []
+        for pos in self._candidates(q):
+            offset = titles[pos].find(q)
+            if offset != -1:
+                ranked.append((offset, pos))
+        ranked.sort()
+        return [pos for _, pos in ranked]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Item]:
+        positions = self.search_positions(query)
+        if limit is not None and limit > 0:
+            positions = positions[:limit]
+        return [self.items[pos] for pos in positions]
@@ -0,0 +1,116 @@
+import json
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+from flask import g, has_app_context
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib decoder
+    orjson = None
+
+try:
+    import lxml  # noqa: F401
+
+    _DOM_PARSER = "lxml"
+except ImportError:
+    _DOM_PARSER = "html.parser"
+
+_NEXT_DATA_OPEN_RE = re.compile(rb"""<script\b[^>]*\bid\s*=\s*["']?__NEXT_DATA__\b[^>]*>""", re.IGNORECASE)
+_SCRIPT_CLOSE_RE = re.compile(rb"</script", re.IGNORECASE)
+# Longest prefix of an opening tag that may straddle two chunks.
+_OPEN_TAG_OVERLAP = 512
+
+_STATS_LOCK = threading.Lock()
+_STAGE_SAMPLES: Dict[str, Deque[float]] = {}
+
+
+def loads(data: bytes) -> Any:
+    """Decode JSON with orjson when installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_dom(html: bytes) -> BeautifulSoup:
+    """Full DOM parse, using lxml when available."""
+    return BeautifulSoup(html, _DOM_PARSER)
+
+
+def read_next_data(chunks: Iterator[bytes]) -> Tuple[Optional[bytes], bytes]:
+    """Read ``chunks`` until the ``__NEXT_DATA__`` script has been received.
+
+    Returns ``(payload, html_read_so_far)``. Reading stops right after the
+    closing ``</script`` so the rest of the page is never downloaded; callers
+    that still need the whole document can keep draining ``chunks``.
+    ``payload`` is ``None`` when the page ended without the script.
+    """
+    buf = bytearray()
+    search_from = 0
+    payload_start = None
+    for chunk in chunks:
+        buf += chunk
+        if payload_start is None:
+            m = _NEXT_DATA_OPEN_RE.search(buf, search_from)
+            if m is None:
+                search_from = max(0, len(buf) - _OPEN_TAG_OVERLAP)
+                continue
+            payload_start = search_from = m.end()
+        end = _SCRIPT_CLOSE_RE.search(buf, search_from)
+        if end is not None:
+            return bytes(buf[payload_start:end.start()]), bytes(buf)
+        search_from = max(payload_start, len(buf) - len(b"</script"))
+    return None, bytes(buf)
+
+
+class StageTimer:
+    """Collects per-stage durations for one request and publishes them.
+
+    ``publish`` appends the stages to ``g.server_timing`` (rendered as a
+    ``Server-Timing`` header) and to the process-wide samples behind
+    :func:`stats`.
+    """
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    def publish(self) -> None:
+        with _STATS_LOCK:
+            for name, elapsed in self.stages:
+                samples = _STAGE_SAMPLES.get(name)
+                if samples is None:
+                    samples = _STAGE_SAMPLES[name] = deque(maxlen=256)
+                samples.append(elapsed)
+        if has_app_context():
+            g.setdefault("server_timing", []).extend(self.stages)
+
+
+def server_timing_header(stages: List[Tuple[str, float]]) -> str:
+    return ", ".join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in stages)
+
+
+def stats() -> Dict[str, Dict[str, Optional[float]]]:
+    def pct(samples: List[float], p: float) -> Optional[float]:
+        if not samples:
+            return None
+        return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+
+    with _STATS_LOCK:
+        snapshot = {name: sorted(samples) for name, samples in _STAGE_SAMPLES.items()}
+    return {
+        name: {"count": len(samples), "p50Ms": pct(samples, 0.5), "p95Ms": pct(samples, 0.95)}
+        for name, samples in snapshot.items()
+    }
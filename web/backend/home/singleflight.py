@@ -0,0 +1,136 @@
+import hashlib
+import json
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+
+from .item import dumps
+
+_KEY_PREFIX = "sf:"
+
+# Compare-and-delete so a leader never releases a lock that expired and was re-taken.
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_INFLIGHT: Dict[str, _Call] = {}
+_INFLIGHT_LOCK = threading.Lock()
+_STATS = {"leaders": 0, "localCoalesced": 0, "remoteCoalesced": 0, "waitTimeouts": 0}
+
+
+def flight_key(*parts) -> str:
+    raw = json.dumps(parts, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _bump(name: str) -> None:
+    with _INFLIGHT_LOCK:
+        _STATS[name] += 1
+
+
+def _run_remote(key: str, fn: Callable[[], Any]) -> Any:
+    """Coalesce across workers: one process runs ``fn``, the rest read its published result."""
+    cfg = current_app.config
+    wait = float(cfg.get("SINGLEFLIGHT_WAIT", 20))
+    result_ttl_ms = int(float(cfg.get("SINGLEFLIGHT_RESULT_TTL", 5)) * 1000)
+    poll = float(cfg.get("SINGLEFLIGHT_POLL", 0.05))
+    lock_key = f"{_KEY_PREFIX}lock:{key}"
+    result_key = f"{_KEY_PREFIX}result:{key}"
+    token = secrets.token_hex(8)
+
+    try:
+        r = current_app.redis
+        acquired = r.set(lock_key, token, nx=True, px=int(wait * 1000))
+    except Exception:
+        return fn()
+
+    if acquired:
+        try:
+            value = fn()
+            try:
+                r.set(result_key, dumps(value), px=result_ttl_ms)
+            except Exception:
+                pass
+            return value
+        finally:
+            try:
+                r.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+            except Exception:
+                pass
+
+    deadline = time.monotonic() + wait
+    try:
+        while time.monotonic() < deadline:
+            pipe = r.pipeline()
+            pipe.get(result_key)
+            pipe.exists(lock_key)
+            raw, locked = pipe.execute()
+            if raw is not None:
+                _bump("remoteCoalesced")
+                return json.loads(raw)
+            if not locked:
+                break
+            time.sleep(poll)
+        else:
+            _bump("waitTimeouts")
+    except Exception:
+        pass
+    # The remote leader failed, timed out or published nothing: fetch ourselves.
+    return fn()
+
+
+def do(key: str, fn: Callable[[], Any]) -> Any:
+    """Run ``fn`` once for all concurrent callers sharing ``key``.
+
+    Callers in the same process wait on the in-flight call; other gunicorn
+    workers wait on a Redis lock and read the leader's JSON-encoded result.
+    ``fn`` must return a value :func:`.item.dumps` can encode; results read
+    from Redis come back as plain JSON, so ``Item`` objects arrive as dicts.
+    """
+    with _INFLIGHT_LOCK:
+        call = _INFLIGHT.get(key)
+        leader = call is None
+        if leader:
+            call = _INFLIGHT[key] = _Call()
+            _STATS["leaders"] += 1
+
+    if not leader:
+        if not call.event.wait(float(current_app.config.get("SINGLEFLIGHT_WAIT", 20))):
+            _bump("waitTimeouts")
+            return fn()
+        _bump("localCoalesced")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _run_remote(key, fn)
+        return call.result
+    except BaseException as exc:
+        call.error = exc
+        raise
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+        call.event.set()
+
+
+def stats() -> Dict[str, int]:
+    with _INFLIGHT_LOCK:
+        return {**_STATS, "inflight": len(_INFLIGHT)}
@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import check_password_hash, generate_password_hash
 from ..extensions import db
 from ..models import User
-from ..auth import issue_token, is_login_locked, register_login_failure, reset_login_counters, get_client_ip
+from ..auth import (
+    issue_token, is_login_locked, register_login_failure, reset_login_counters, get_client_ip, bearer_token,
+    revoke_token, token_ttl_seconds,
+)
+from ..passwords import hash_password, rehash_password, verify_password
 from ..phone import normalize_jp_phone
 from ..auth_crypto import get_or_create_rsa_keys, decrypt_payload
 from ..config import Config
@@ -66,7 +69,7 @@ def login():
         return jsonify({"error": "電話番号/ユーザー名 と パスワードを入力してください"}), 400
 
     # Rate-limit: locked?
-    if is_login_locked(identifier):
+    if is_login_locked(identifier, client_ip):
         return jsonify({"error": "試行回数が多すぎます。しばらくしてから再度お試しください"}), 429
 
     # Hardcoded admin for testing: username 'admin' with password '123456'
@@ -76,17 +79,17 @@ def login():
         if not user:
             user = User(
                 email=admin_email,
-                password_hash=generate_password_hash("123456"),
+                password_hash=hash_password("123456"),
                 display_name="管理者",
                 status="approved",
             )
             db.session.add(user)
             db.session.commit()
-        token = issue_token(user.id)
+        token = issue_token(user.id, role="admin")
         reset_login_counters(identifier, client_ip)
         return jsonify({
             "token": token,
-            "ttlMs": 2 * 60 * 60 * 1000,
+            "ttlMs": token_ttl_seconds() * 1000,
             "user": {
                 "id": user.id,
                 "email": user.email,
@@ -102,7 +105,7 @@ def login():
     lookup = (normalized or identifier).lower()
 
     user = User.query.filter_by(email=lookup).first()
-    if not user or not check_password_hash(user.password_hash, password):
+    if not user or not verify_password(user.password_hash, password):
         register_login_failure(identifier, client_ip)
         return jsonify({"error": "電話番号/ユーザー名 または パスワードが正しくありません"}), 401
 
@@ -110,12 +113,17 @@ def login():
         register_login_failure(identifier, client_ip)
         return jsonify({"error": "アカウントは審査中です"}), 403
 
-    token = issue_token(user.id)
-    reset_login_counters(identifier, client_ip)
+    new_hash = rehash_password(user.password_hash, password)
+    if new_hash is not None:
+        user.password_hash = new_hash
+        db.session.commit()
+
     role = "admin" if user.email == "admin@local" else "user"
+    token = issue_token(user.id, role=role)
+    reset_login_counters(identifier, client_ip)
     return jsonify({
         "token": token,
-        "ttlMs": 2 * 60 * 60 * 1000,
+        "ttlMs": token_ttl_seconds() * 1000,
         "user": {
             "id": user.id,
             "email": user.email,
@@ -124,4 +132,13 @@ def login():
             "role": role,
             "status": user.status,
         },
-    }) 
\ No newline at end of file
+    })
+
+
+@login_bp.post("/logout")
+def logout():
+    token = bearer_token()
+    if not token:
+        return jsonify({"error": "認証が必要です"}), 401
+    revoke_token(token)
+    return jsonify({"message": "ログアウトしました"})
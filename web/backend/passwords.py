@@ -0,0 +1,174 @@
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app, jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordBusy(Exception):
+    """The hashing pool is saturated, or a hash did not finish within the timeout."""
+
+
+class PasswordHasher:
+    """Runs pbkdf2 password hashing off the request threads.
+
+    Hashes are computed on a process pool of ``workers`` (inline when 0), so
+    a burst of logins cannot starve the threads serving other endpoints of
+    the GIL. At most ``queue_limit`` hashes may be queued or running; beyond
+    that, or when one takes longer than ``timeout`` seconds, :class:`PasswordBusy`
+    is raised and the request is answered with 503. A hash that timed out
+    keeps its queue slot until the worker is done with it.
+    """
+
+    def __init__(self, method: str = "pbkdf2:sha256", iterations: int = 260000, salt_length: int = 16,
+                 workers: int = 2, queue_limit: int = 32, timeout: float = 5.0, latency_samples: int = 512):
+        self.method = f"{method}:{int(iterations)}" if method.startswith("pbkdf2:") and iterations else method
+        self.salt_length = int(salt_length)
+        self.workers = max(0, int(workers))
+        self.queue_limit = max(1, int(queue_limit))
+        self.timeout = float(timeout)
+        self._slots = threading.BoundedSemaphore(self.queue_limit)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._depth = 0
+        self._latencies = {"hash": deque(maxlen=latency_samples), "verify": deque(maxlen=latency_samples)}
+        self._stats = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected": 0, "timeouts": 0, "peakDepth": 0}
+
+    @classmethod
+    def from_app(cls, app) -> "PasswordHasher":
+        cfg = app.config
+        return cls(
+            method=cfg.get("PASSWORD_HASH_METHOD", "pbkdf2:sha256"),
+            iterations=cfg.get("PASSWORD_HASH_ITERATIONS", 260000),
+            salt_length=cfg.get("PASSWORD_HASH_SALT_LENGTH", 16),
+            workers=cfg.get("PASSWORD_HASH_WORKERS", 2),
+            queue_limit=cfg.get("PASSWORD_HASH_QUEUE", 32),
+            timeout=cfg.get("PASSWORD_HASH_TIMEOUT", 5.0),
+        )
+
+    def init_app(self, app) -> None:
+        app.password_hasher = self
+
+        @app.errorhandler(PasswordBusy)
+        def _password_busy(exc):
+            return jsonify({"error": "サーバーが混み合っています。しばらくしてから再度お試しください"}), 503, \
+                {"Retry-After": "1"}
+
+    def _pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers == 0:
+            return None
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: forking a threaded server process is not safe
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self._depth -= 1
+        self._slots.release()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _run(self, op: str, fn: Callable, *args) -> Any:
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise PasswordBusy(op)
+        with self._lock:
+            self._depth += 1
+            self._stats["peakDepth"] = max(self._stats["peakDepth"], self._depth)
+        start = time.perf_counter()
+        try:
+            pool = self._pool()
+            future = pool.submit(fn, *args) if pool is not None else None
+        except BrokenProcessPool as exc:
+            logger.warning("Password hashing pool broken, restarting: %s", exc)
+            with self._lock:
+                self._executor = None
+            future = None
+        except Exception:
+            self._release()
+            raise
+        if future is None:
+            try:
+                result = fn(*args)
+            finally:
+                self._release()
+        else:
+            future.add_done_callback(self._release)
+            try:
+                result = future.result(timeout=self.timeout)
+            except FutureTimeout:
+                self._count("timeouts")
+                future.cancel()
+                raise PasswordBusy(op) from None
+            except BrokenProcessPool:
+                with self._lock:
+                    self._executor = None
+                raise PasswordBusy(op) from None
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._latencies[op].append(elapsed)
+        return result
+
+    def hash(self, password: str) -> str:
+        self._count("hashed")
+        return self._run("hash", generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, stored_hash: str, password: str) -> bool:
+        self._count("verified")
+        return self._run("verify", check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        """Whether ``stored_hash`` was made with other parameters than the configured ones."""
+        return stored_hash.split("$", 1)[0] != self.method
+
+    def rehash(self, stored_hash: str, password: str) -> Optional[str]:
+        """New hash for a just-verified ``password`` if its parameters are outdated; ``None`` otherwise."""
+        if not self.needs_rehash(stored_hash):
+            return None
+        try:
+            new_hash = self.hash(password)
+        except PasswordBusy:
+            return None  # try again on the next login
+        self._count("rehashed")
+        return new_hash
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            depth = self._depth
+            stats = dict(self._stats)
+            latencies = {op: sorted(samples) for op, samples in self._latencies.items()}
+        out: Dict[str, Any] = dict(stats, method=self.method, workers=self.workers,
+                                   queueLimit=self.queue_limit, queueDepth=depth)
+        for op, ordered in latencies.items():
+            out[f"{op}LatencyMs"] = {
+                "samples": len(ordered),
+                "p50": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+                "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1) if ordered else None,
+            }
+        return out
+
+
+def hash_password(password: str) -> str:
+    return current_app.password_hasher.hash(password)
+
+
+def verify_password(stored_hash: str, password: str) -> bool:
+    return current_app.password_hasher.verify(stored_hash, password)
+
+
+def rehash_password(stored_hash: str, password: str) -> Optional[str]:
+    return current_app.password_hasher.rehash(stored_hash, password)
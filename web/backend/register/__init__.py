@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash
 from ..extensions import db
 from ..models import User
+from ..passwords import hash_password
 from ..phone import normalize_jp_phone
 
 register_bp = Blueprint("register", __name__)
@@ -30,7 +30,7 @@ def register():
 
     user = User(
         email=normalized,
-        password_hash=generate_password_hash(password),
+        password_hash=hash_password(password),
         display_name=display_name,
         status="pending",
     )
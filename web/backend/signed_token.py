@@ -0,0 +1,262 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import math
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "s1."
+
+_REVOKED_KEY = "auth:revoked:set"
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _sign(key: bytes, body: bytes) -> bytes:
+    return base64.urlsafe_b64encode(hmac.new(key, body, hashlib.sha256).digest()).rstrip(b"=")
+
+
+def is_signed(token: str) -> bool:
+    return token.startswith(PREFIX)
+
+
+def mint(key: bytes, user_id: int, role: str, ttl_seconds: int) -> str:
+    """``s1.<claims>.<hmac>`` carrying ``sub``, ``role``, ``iat``/``exp`` (ms) and a random ``jti``."""
+    now_ms = int(time.time() * 1000)
+    claims = {"sub": int(user_id), "role": role, "iat": now_ms, "exp": now_ms + ttl_seconds * 1000,
+              "jti": secrets.token_urlsafe(12)}
+    body = PREFIX + _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{body}.{_sign(key, body.encode('ascii')).decode('ascii')}"
+
+
+def verify(key: bytes, token: str) -> Optional[Dict[str, Any]]:
+    """Claims of a valid, unexpired token; ``None`` otherwise. No I/O."""
+    parts = token.split(".")
+    if len(parts) != 3 or parts[0] + "." != PREFIX:
+        return None
+    try:
+        body = f"{parts[0]}.{parts[1]}".encode("ascii")
+        if not hmac.compare_digest(parts[2].encode("ascii"), _sign(key, body)):
+            return None
+        claims = json.loads(_b64decode(parts[1]))
+        if claims["exp"] <= time.time() * 1000:
+            return None
+        int(claims["sub"])
+    except (ValueError, KeyError, TypeError):  # UnicodeError and binascii.Error are ValueErrors
+        return None
+    return claims if isinstance(claims, dict) else None
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing of one blake2b digest)."""
+
+    def __init__(self, bits: int, hashes: int):
+        self.bits = max(8, int(bits))
+        self.hashes = max(1, int(hashes))
+        self._array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, value: str) -> None:
+        new = False
+        for pos in self._positions(value):
+            mask = 1 << (pos & 7)
+            if not self._array[pos >> 3] & mask:
+                self._array[pos >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        array = self._array
+        return all(array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+    def false_positive_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+
+class RevocationSet:
+    """Revoked signed tokens (``t:<jti>``) and users (``u:<id>``, everything issued before a time).
+
+    The authoritative set is a Redis sorted set scored by revocation time;
+    each process mirrors the token members into a Bloom filter (user members
+    are rare and kept exactly, with their time), refreshed by a
+    background thread every ``sync_secs`` (recent additions) and rebuilt every
+    ``rebuild_secs`` (dropping entries older than the token lifetime). A
+    request only touches Redis when the filter reports a possible match, to
+    tell a real revocation from a false positive; if Redis cannot answer, the
+    token is treated as revoked. Without Redis, revocations are kept in the
+    local filter only.
+    """
+
+    def __init__(self, redis_getter: Callable[[], Any], max_age: int, bits: int = 1 << 20, hashes: int = 7,
+                 sync_secs: float = 2.0, rebuild_secs: float = 600.0):
+        self._redis_getter = redis_getter
+        self.max_age = int(max_age)
+        self._bloom_args = (bits, hashes)
+        self._bloom = BloomFilter(bits, hashes)
+        self._local: Dict[str, float] = {}  # revocations that could not be written to Redis
+        self._users: Dict[str, float] = {}  # "u:<id>" -> latest revocation time
+        self.sync_secs = float(sync_secs)
+        self.rebuild_secs = float(rebuild_secs)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._synced_score = 0.0
+        self._synced_at = 0.0
+        self._rebuilt_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"checks": 0, "bloomPositives": 0, "revoked": 0, "falsePositives": 0, "syncErrors": 0}
+
+    @classmethod
+    def from_app(cls, app) -> Optional["RevocationSet"]:
+        cfg = app.config
+        if cfg.get("AUTH_TOKEN_MODE", "redis") != "signed":
+            return None
+        return cls(
+            lambda: app.redis,
+            max_age=cfg.get("AUTH_TOKEN_TTL", 7200),
+            bits=cfg.get("AUTH_REVOCATION_BLOOM_BITS", 1 << 20),
+            hashes=cfg.get("AUTH_REVOCATION_BLOOM_HASHES", 7),
+            sync_secs=cfg.get("AUTH_REVOCATION_SYNC_SECS", 2.0),
+        )
+
+    def _rebuild(self) -> None:
+        now = time.time()
+        r = self._redis_getter()
+        r.zremrangebyscore(_REVOKED_KEY, "-inf", now - self.max_age)
+        members = r.zrange(_REVOKED_KEY, 0, -1, withscores=True)
+        bloom = BloomFilter(*self._bloom_args)
+        users: Dict[str, float] = {}
+        with self._lock:
+            for member, revoked_at in list(self._local.items()):
+                if revoked_at < now - self.max_age:
+                    del self._local[member]
+            for member, revoked_at in list(members) + list(self._local.items()):
+                self._add(member, revoked_at, bloom, users)
+            self._bloom = bloom
+            self._users = users
+            self._synced_score = max([score for _, score in members], default=now)
+            self._rebuilt_at = self._synced_at = now
+
+    def _sync_recent(self) -> None:
+        # Overlap by a few seconds so clock skew between writers cannot hide an entry.
+        members = self._redis_getter().zrangebyscore(_REVOKED_KEY, self._synced_score - 5, "+inf", withscores=True)
+        with self._lock:
+            for member, score in members:
+                self._add(member, score, self._bloom, self._users)
+                self._synced_score = max(self._synced_score, score)
+            self._synced_at = time.time()
+
+    @staticmethod
+    def _add(member: str, revoked_at: float, bloom: BloomFilter, users: Dict[str, float]) -> None:
+        if member.startswith("u:"):
+            users[member] = max(revoked_at, users.get(member, 0.0))
+        else:
+            bloom.add(member)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.sync_secs)
+            try:
+                if time.time() - self._rebuilt_at >= self.rebuild_secs:
+                    self._rebuild()
+                else:
+                    self._sync_recent()
+            except Exception as exc:
+                self._count("syncErrors")
+                logger.debug("Revocation set sync failed: %s", exc)
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+        try:
+            self._rebuild()
+        except Exception as exc:
+            self._count("syncErrors")
+            logger.warning("Could not load revoked tokens from Redis: %s", exc)
+        self._thread = threading.Thread(target=self._run, name="token-revocations", daemon=True)
+        self._thread.start()
+
+    def _confirm(self, member: str) -> bool:
+        if member in self._local:
+            return True
+        try:
+            return self._redis_getter().zscore(_REVOKED_KEY, member) is not None
+        except Exception:
+            return True
+
+    def _count(self, *names: str) -> None:
+        with self._lock:
+            for name in names:
+                self._stats[name] += 1
+
+    def is_revoked(self, claims: Dict[str, Any]) -> bool:
+        self._ensure_loaded()
+        user_revoked_at = self._users.get(f"u:{claims['sub']}")
+        if user_revoked_at is not None and int(claims.get("iat") or 0) <= user_revoked_at * 1000:
+            self._count("checks", "revoked")
+            return True
+        member = f"t:{claims.get('jti')}"
+        if member not in self._bloom:
+            self._count("checks")
+            return False
+        if self._confirm(member):
+            self._count("checks", "bloomPositives", "revoked")
+            return True
+        self._count("checks", "bloomPositives", "falsePositives")
+        return False
+
+    def revoke(self, members: Iterable[str]) -> None:
+        """Add ``t:<jti>``/``u:<user id>`` members; a user entry revokes tokens issued up to now."""
+        self._ensure_loaded()
+        now = time.time()
+        members = list(members)
+        with self._lock:
+            for member in members:
+                self._add(member, now, self._bloom, self._users)
+        try:
+            r = self._redis_getter()
+            pipe = r.pipeline()
+            pipe.zadd(_REVOKED_KEY, {member: now for member in members})
+            pipe.zremrangebyscore(_REVOKED_KEY, "-inf", now - self.max_age)
+            pipe.execute()
+        except Exception:
+            with self._lock:
+                for member in members:
+                    self._local[member] = now
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            bloom = self._bloom
+            stats = dict(self._stats)
+            synced_at = self._synced_at
+        stats.update({
+            "bloomBits": bloom.bits,
+            "bloomEntries": bloom.count,
+            "bloomFalsePositiveRate": round(bloom.false_positive_rate(), 6),
+            "revokedUsers": len(self._users),
+            "localOnly": len(self._local),
+            "syncedSecsAgo": round(time.time() - synced_at, 1) if synced_at else None,
+        })
+        return stats
@@ -0,0 +1,184 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "auth:revoked"
+
+_MISSING = object()
+
+
+def token_digest(token: str) -> str:
+    """Key used for a token in the local cache and in revocation messages (never the token itself)."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """Per-process TTL cache of ``token -> user id`` in front of ``auth:token:*``.
+
+    Entries live ``ttl`` seconds (unknown tokens ``negative_ttl``), at most
+    ``max_entries`` of them, least recently used evicted first. Logout and
+    revocation publish the token digest on :data:`CHANNEL`; a daemon thread
+    subscribed to it evicts the entry in every process. The cache is only
+    consulted while that subscription is up and is cleared whenever it
+    (re)connects, so a missed message can at worst outlive its revocation by
+    ``ttl`` seconds.
+    """
+
+    def __init__(self, redis_getter: Callable[[], Any], ttl: float = 30.0, negative_ttl: float = 5.0,
+                 max_entries: int = 10000, latency_samples: int = 1024):
+        self._redis_getter = redis_getter
+        self.ttl = float(ttl)
+        self.negative_ttl = float(negative_ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # digest -> (user_id or None, expires_at)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_samples)
+        self._stats = {"hits": 0, "negativeHits": 0, "misses": 0, "bypassed": 0, "evictions": 0,
+                       "invalidations": 0, "reconnects": 0}
+        self._connected = False
+        self._generation = 0  # bumped on every eviction, so a lookup racing a revocation is not cached
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_app(cls, app) -> Optional["TokenCache"]:
+        cfg = app.config
+        if not cfg.get("AUTH_TOKEN_CACHE_ENABLED", True):
+            return None
+        return cls(
+            lambda: app.redis,
+            ttl=cfg.get("AUTH_TOKEN_CACHE_TTL", 30),
+            negative_ttl=cfg.get("AUTH_TOKEN_CACHE_NEGATIVE_TTL", 5),
+            max_entries=cfg.get("AUTH_TOKEN_CACHE_MAX", 10000),
+        )
+
+    def ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._listen, name="token-cache", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _set_connected(self, connected: bool) -> None:
+        with self._lock:
+            self._connected = connected
+            self._generation += 1
+            self._entries.clear()
+
+    def _listen(self) -> None:
+        backoff = 0.5
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self._redis_getter().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                self._set_connected(True)
+                with self._lock:
+                    self._stats["reconnects"] += 1
+                backoff = 0.5
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self._evict([message["data"]])
+            except Exception as exc:
+                logger.warning("Token revocation subscription lost: %s", exc)
+            finally:
+                self._set_connected(False)
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _evict(self, digests: Iterable[Any]) -> None:
+        with self._lock:
+            self._generation += 1
+            for digest in digests:
+                if isinstance(digest, bytes):
+                    digest = digest.decode("ascii", "ignore")
+                if self._entries.pop(digest, None) is not None:
+                    self._stats["invalidations"] += 1
+
+    def _store(self, digest: str, user_id: Optional[int], now: float) -> None:
+        ttl = self.ttl if user_id is not None else self.negative_ttl
+        if ttl <= 0 or not self._connected:
+            return
+        self._entries[digest] = (user_id, now + ttl)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, token: str, loader: Callable[[str], Optional[int]]) -> Optional[int]:
+        """User id for ``token``, from the local cache or else ``loader`` (the Redis lookup)."""
+        self.ensure_started()
+        digest = token_digest(token)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(digest, _MISSING) if self._connected else _MISSING
+            if entry is not _MISSING and entry[1] > now:
+                self._entries.move_to_end(digest)
+                self._stats["hits" if entry[0] is not None else "negativeHits"] += 1
+                return entry[0]
+            self._stats["misses" if self._connected else "bypassed"] += 1
+            generation = self._generation
+        start = time.perf_counter()
+        user_id = loader(token)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._latencies.append(elapsed)
+            if generation == self._generation:
+                self._store(digest, user_id, time.monotonic())
+        return user_id
+
+    def put(self, token: str, user_id: int) -> None:
+        """Seed the entry for a token this process just issued."""
+        with self._lock:
+            self._store(token_digest(token), user_id, time.monotonic())
+
+    def revoke(self, tokens: Iterable[str]) -> None:
+        """Evict ``tokens`` here and publish their digests to every other process."""
+        digests = [token_digest(t) for t in tokens]
+        self._evict(digests)
+        if not digests:
+            return
+        try:
+            pipe = self._redis_getter().pipeline()
+            for digest in digests:
+                pipe.publish(CHANNEL, digest)
+            pipe.execute()
+        except Exception as exc:
+            logger.warning("Could not publish token revocation: %s", exc)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            samples = sorted(self._latencies)
+            size = len(self._entries)
+            connected = self._connected
+        lookups = stats["hits"] + stats["negativeHits"] + stats["misses"] + stats["bypassed"]
+        stats.update({
+            "size": size,
+            "subscribed": connected,
+            "hitRate": round((stats["hits"] + stats["negativeHits"]) / lookups, 4) if lookups else None,
+            "redisLatencyMs": {
+                "samples": len(samples),
+                "p50": round(samples[len(samples) // 2] * 1000, 3) if samples else None,
+                "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3) if samples else None,
+                "max": round(samples[-1] * 1000, 3) if samples else None,
+            },
+        })
+        return stats
@@ -0,0 +1,175 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from flask import g, jsonify, request
+
+from .auth import get_client_ip
+
+
+class RouteLimit:
+    """Token bucket per client IP plus in-flight caps for one endpoint, in this process.
+
+    ``rate`` tokens per second refill each client's bucket up to ``burst``;
+    an empty bucket sheds the request with 429. ``max_inflight`` caps the
+    endpoint's concurrent requests across all clients (503 beyond it) and
+    ``max_inflight_per_ip`` those of one client (429). A request holds its
+    in-flight slot until the response, streamed bodies included, is closed.
+    Zero disables the corresponding check.
+    """
+
+    def __init__(self, name: str, rate: float = 0.0, burst: int = 0, max_inflight: int = 0,
+                 max_inflight_per_ip: int = 0, max_clients: int = 10000):
+        self.name = name
+        self.rate = float(rate)
+        self.burst = max(1, int(burst)) if rate > 0 else 0
+        self.max_inflight = int(max_inflight)
+        self.max_inflight_per_ip = int(max_inflight_per_ip)
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # ip -> [tokens, updated_at]
+        self._inflight = 0
+        self._inflight_by_ip: Dict[str, int] = {}
+        self._stats = {"admitted": 0, "rateLimited": 0, "ipBusy": 0, "shed": 0, "peakInflight": 0}
+
+    def _take_token(self, ip: str, now: float, cost: int = 1, commit: bool = True) -> float:
+        """0 when ``cost`` tokens were taken (only checked unless ``commit``), else seconds until they are available."""
+        bucket = self._buckets.get(ip)
+        if bucket is None:
+            bucket = self._buckets[ip] = [float(self.burst), now]
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(ip)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= cost:
+            if commit:
+                bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / self.rate
+
+    def acquire(self, ip: str):
+        """``None`` if admitted (caller must :meth:`release`), else ``(status, retry_after_secs)``."""
+        with self._lock:
+            if self.max_inflight and self._inflight >= self.max_inflight:
+                self._stats["shed"] += 1
+                return 503, 1
+            held = self._inflight_by_ip.get(ip, 0)
+            if self.max_inflight_per_ip and held >= self.max_inflight_per_ip:
+                self._stats["ipBusy"] += 1
+                return 429, 1
+            if self.rate > 0:
+                wait = self._take_token(ip, time.monotonic())
+                if wait:
+                    self._stats["rateLimited"] += 1
+                    return 429, max(1, math.ceil(wait))
+            self._inflight += 1
+            self._inflight_by_ip[ip] = held + 1
+            self._stats["admitted"] += 1
+            self._stats["peakInflight"] = max(self._stats["peakInflight"], self._inflight)
+            return None
+
+    def take(self, ip: str, cost: int, commit: bool = True) -> float:
+        """Charge ``cost`` tokens without taking an in-flight slot; seconds to wait when refused, else 0.
+
+        With ``commit=False`` the tokens are only checked, not taken.
+        """
+        if self.rate <= 0 or cost <= 0:
+            return 0.0
+        if cost > self.burst:
+            return float("inf")
+        with self._lock:
+            wait = self._take_token(ip, time.monotonic(), cost, commit)
+            if wait:
+                self._stats["rateLimited"] += 1
+            return wait
+
+    def release(self, ip: str) -> None:
+        with self._lock:
+            self._inflight -= 1
+            held = self._inflight_by_ip.get(ip, 0) - 1
+            if held > 0:
+                self._inflight_by_ip[ip] = held
+            else:
+                self._inflight_by_ip.pop(ip, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, inflight=self._inflight, clients=len(self._inflight_by_ip),
+                        buckets=len(self._buckets))
+
+
+class _Slot:
+    __slots__ = ("limit", "ip", "released")
+
+    def __init__(self, limit: RouteLimit, ip: str):
+        self.limit = limit
+        self.ip = ip
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.limit.release(self.ip)
+
+
+class TrafficLimiter:
+    """``before_request`` load shedding for the endpoints in ``TRAFFIC_LIMITS``.
+
+    Limits are per worker process: they keep one client, or a burst of slow
+    upstream calls, from occupying every thread of this worker. Cross-process
+    quotas are the job of :func:`auth.rate_limit`.
+    """
+
+    def __init__(self, limits: Dict[str, RouteLimit]):
+        self.limits = limits
+
+    @classmethod
+    def from_app(cls, app) -> Optional["TrafficLimiter"]:
+        cfg = app.config
+        if not cfg.get("TRAFFIC_LIMIT_ENABLED", True):
+            return None
+        limits = {endpoint: RouteLimit(endpoint, **options)
+                  for endpoint, options in (cfg.get("TRAFFIC_LIMITS") or {}).items()}
+        return cls(limits) if limits else None
+
+    def init_app(self, app) -> None:
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    def _before(self):
+        limit = self.limits.get(request.endpoint)
+        if limit is None:
+            return None
+        ip = get_client_ip()
+        refused = limit.acquire(ip)
+        if refused is not None:
+            status, retry = refused
+            message = "サーバーが混み合っています" if status == 503 else "リクエストが多すぎます。しばらくしてから再度お試しください"
+            return jsonify({"error": message}), status, {"Retry-After": str(retry)}
+        g._traffic_slot = _Slot(limit, ip)
+        return None
+
+    def _after(self, response):
+        slot = g.pop("_traffic_slot", None)
+        if slot is not None:
+            # Streamed bodies outlive the request context; free the slot when the body is done.
+            response.call_on_close(slot.release)
+        return response
+
+    def _teardown(self, exc=None):
+        slot = g.pop("_traffic_slot", None)
+        if slot is not None:
+            slot.release()
+
+    def charge(self, endpoint: str, cost: int, commit: bool = True) -> float:
+        """Charge ``cost`` requests against ``endpoint``'s bucket for the current client (used by /batch)."""
+        limit = self.limits.get(endpoint)
+        return limit.take(get_client_ip(), cost, commit) if limit is not None else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: limit.snapshot() for name, limit in self.limits.items()}
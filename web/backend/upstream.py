@@ -0,0 +1,78 @@
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class UpstreamClient:
+    """Application-scoped HTTP client for upstream (Mercari) calls.
+
+    Wraps a single ``requests.Session`` whose adapter keeps a keep-alive
+    connection pool per host, so repeated calls to ``api.mercari.jp``,
+    ``www.mercari.com`` and ``jp.mercari.com`` reuse TCP/TLS connections.
+    Cookies are never stored: the session is shared by every visitor.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 8,
+        pool_maxsize: int = 32,
+        retries: int = 1,
+        backoff: float = 0.2,
+        connect_timeout: float = 3.05,
+        read_timeouts: Dict[str, float] = None,
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeouts = dict(read_timeouts or {})
+        self.session = requests.Session()
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        retry = Retry(
+            total=retries,
+            read=0,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def from_config(cls, config) -> "UpstreamClient":
+        return cls(
+            pool_connections=config.get("UPSTREAM_POOL_CONNECTIONS", 8),
+            pool_maxsize=config.get("UPSTREAM_POOL_MAXSIZE", 32),
+            retries=config.get("UPSTREAM_RETRIES", 1),
+            backoff=config.get("UPSTREAM_BACKOFF", 0.2),
+            connect_timeout=config.get("UPSTREAM_CONNECT_TIMEOUT", 3.05),
+            read_timeouts={
+                "api": config.get("UPSTREAM_API_TIMEOUT", 10),
+                "search": config.get("UPSTREAM_SEARCH_TIMEOUT", 15),
+                "proxy": config.get("UPSTREAM_PROXY_TIMEOUT", 12),
+            },
+        )
+
+    def timeout(self, kind: str) -> Tuple[float, float]:
+        return self.connect_timeout, self.read_timeouts.get(kind, 10)
+
+    def get(self, url: str, *, kind: str = "api", **kwargs) -> requests.Response:
+        """``Session.get`` with the configured (connect, read) timeout for ``kind``."""
+        kwargs.setdefault("timeout", self.timeout(kind))
+        return self.session.get(url, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def iter_raw(resp: requests.Response, chunk_size: int):
+    """Yield the undecoded upstream body in chunks of at most ``chunk_size`` bytes.
+
+    Content-Encoding is left intact so the bytes can be relayed together with
+    the upstream Content-Encoding/Content-Length headers.
+    """
+    if isinstance(resp, requests.Response):
+        return resp.raw.stream(chunk_size, decode_content=False)
+    return resp.iter_raw(chunk_size)